@@ -0,0 +1,638 @@
+import asyncio
+import inspect
+
+from neo4j import AsyncGraphDatabase
+
+from batching import DEFAULT_BATCH_SIZE, batchCounters, bindOptions, chunks, toRows
+from feed import FeedConfig
+from messageIds import newMessageId
+from projections import checkProjection
+from recommendations import PymkConfig
+from relationships import RelationshipModel
+from socialNetworkLegacy import (DEFAULT_MESSAGE_DEPTH, DEFAULT_PAGE_SIZE, DELETABLE_LABELS, READ_PREFIXES,
+                                 SCHEMA_STATEMENTS, TIMESTAMP_PROPERTIES, SocialNetworkAPI)
+from textSearch import DEFAULT_SEARCH_LIMIT, escapeQuery
+from timestamps import checkBucket
+
+DEFAULT_CONCURRENCY = 16
+
+# SocialNetworkAPI methods with no async counterpart, and what to use instead.
+SYNC_ONLY = {
+    "writeBehind": "its writer is a thread over sync sessions; await createMessages or createConnections instead",
+}
+
+
+class AsyncSocialNetworkAPI:
+    def __init__(self, uri, user, password, batchSize=DEFAULT_BATCH_SIZE, pymk=None, relationships=None, feed=None):
+        self.batchSize = batchSize
+        self.pymk = pymk
+        self.relationships = relationships or RelationshipModel()
+        self.feed = feed
+        try:
+            self.driver = AsyncGraphDatabase.driver(uri, auth=(user, password))
+        except Exception as e:
+            print(f"Error connecting to the database: {e}")
+
+    def _txOptions(self):
+        return {"relationships": self.relationships, "feed": self.feed}
+
+    def __getattr__(self, name):
+        # The transaction bodies, Cypher included, are SocialNetworkAPI's; here they only run on the async driver.
+        if name in SYNC_ONLY:
+            raise AttributeError(f"{type(self).__name__} does not support {name}: {SYNC_ONLY[name]}")
+        txFunction = getattr(SocialNetworkAPI, name, None) if name.startswith("_") else None
+        if not hasattr(txFunction, "runAsync"):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        return txFunction.runAsync
+
+    async def close(self):
+        try:
+            await self.driver.close()
+        except Exception as e:
+            print(f"Error closing the database connection: {e}")
+
+    def batch(self, fetchSize=None):
+        return AsyncSocialNetworkBatch(self, fetchSize)
+
+    def cacheStats(self):
+        # There is no neighbourhood cache on the async API, as on a SocialNetworkAPI built with cacheSize=0.
+        return None
+
+    async def _invalidate(self, method, args, kwargs=None):
+        # Only the stored PYMK scores follow writes here.
+        if method not in ("createConnection", "deleteConnection"):
+            return
+        if kwargs:
+            args = tuple(inspect.signature(getattr(self, method)).bind_partial(*args, **kwargs).arguments.values())
+        await self._refreshAround([args[0], args[1]])
+
+    async def ensureSchema(self, wait=False, timeout=300):
+        async with self.driver.session() as session:
+            try:
+                for statement in SCHEMA_STATEMENTS:
+                    await session.execute_write(self._runSchemaStatement, statement)
+                if wait:
+                    result = await session.run("CALL db.awaitIndexes($timeout)", timeout=timeout)
+                    await result.consume()
+                return await session.execute_read(self._getPopulatingIndexes)
+            except Exception as e:
+                print(f"Error ensuring database schema: {e}")
+
+    async def fanOut(self, method, argsList, concurrency=DEFAULT_CONCURRENCY):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(args):
+            async with semaphore:
+                return await method(*args)
+
+        return await asyncio.gather(*(call(args) for args in argsList))
+
+    async def getFriendsAndFamilyForUsers(self, userIds, concurrency=DEFAULT_CONCURRENCY):
+        userIds = list(dict.fromkeys(userIds))
+        results = await self.fanOut(self.getFriendsAndFamily, [(userId,) for userId in userIds], concurrency)
+        return dict(zip(userIds, results))
+
+    async def delete(self, batchSize=None, progress=None):
+        return {
+            "relationships": await self._runInBatches(self._deleteRelationshipsBatch, ("", ""), batchSize,
+                                                      "relationships", progress),
+            "nodes": await self._runInBatches(self._deleteNodesBatch, ("",), batchSize, "nodes", progress),
+        }
+
+    async def deleteLabel(self, label, batchSize=None, progress=None):
+        if label not in DELETABLE_LABELS:
+            raise ValueError(f"Cannot delete label {label!r}; expected one of {sorted(DELETABLE_LABELS)}")
+        deleted = {"relationships": 0}
+        for relationshipType in DELETABLE_LABELS[label]:
+            deleted["relationships"] += await self._runInBatches(
+                self._deleteRelationshipsBatch, ("", relationshipType), batchSize, relationshipType, progress)
+        deleted["relationships"] += await self._runInBatches(
+            self._deleteRelationshipsBatch, (label, ""), batchSize, "relationships", progress)
+        deleted["nodes"] = await self._runInBatches(self._deleteNodesBatch, (label,), batchSize, "nodes", progress)
+        return deleted
+
+    async def deleteUsers(self, userIds, batchSize=None, progress=None):
+        batchSize = batchSize or self.batchSize
+        deleted = {"relationships": 0, "nodes": 0}
+        for chunk in chunks(userIds, batchSize):
+            deleted["relationships"] += await self._runInBatches(
+                self._deleteUsersRelationshipsBatch, (chunk,), batchSize, "relationships", progress)
+            deleted["nodes"] += await self._runInBatches(self._deleteUsersBatch, (chunk,), batchSize, "nodes",
+                                                         progress)
+        return deleted
+
+    async def _runInBatches(self, txFunction, args, batchSize, phase, progress, action="deleting"):
+        batchSize = batchSize or self.batchSize
+        total = 0
+        async with self.driver.session() as session:
+            while True:
+                try:
+                    deleted = await session.execute_write(txFunction, *args, batchSize)
+                except Exception as e:
+                    print(f"Error {action} {phase} after {total} rows: {e}")
+                    return total
+                total += deleted
+                if progress is not None and deleted:
+                    progress(phase, total)
+                if deleted < batchSize:
+                    return total
+
+    async def migrateTimestamps(self, batchSize=None, progress=None):
+        migrated = {}
+        for phase, (pattern, name) in TIMESTAMP_PROPERTIES.items():
+            migrated[phase] = await self._runInBatches(self._migrateTimestampsBatch, (pattern, name), batchSize, phase,
+                                                       progress, "migrating")
+        migrated["participants"] = await self._runInBatches(self._backfillMessageParticipantsBatch, (), batchSize,
+                                                            "participants", progress, "migrating")
+        return migrated
+
+    async def backfillPostIds(self, batchSize=None, progress=None):
+        return await self._runInBatches(self._backfillPostIds, (), batchSize, "postIds", progress, "backfilling")
+
+    async def migrateRelationships(self, batchSize=None, progress=None):
+        return await self._runInBatches(self._migrateRelationshipsBatch, (self.relationships,), batchSize,
+                                        "relationships", progress, "migrating")
+
+    async def deleteUser(self, userId):
+        async with self.driver.session() as session:
+            try:
+                await session.execute_write(self._deleteUser, userId)
+            except Exception as e:
+                print(f"Error deleting user: {e}")
+
+    async def deleteCompany(self, companyId):
+        async with self.driver.session() as session:
+            try:
+                await session.execute_write(self._deleteCompany, companyId)
+            except Exception as e:
+                print(f"Error deleting company: {e}")
+
+    async def deleteUniversity(self, universityId):
+        async with self.driver.session() as session:
+            try:
+                await session.execute_write(self._deleteUniversity, universityId)
+            except Exception as e:
+                print(f"Error deleting university: {e}")
+
+    async def deleteConnection(self, userId1, userId2):
+        async with self.driver.session() as session:
+            try:
+                await session.execute_write(self._deleteConnection, userId1, userId2, relationships=self.relationships)
+            except Exception as e:
+                print(f"Error deleting connection: {e}")
+        await self._refreshAround([userId1, userId2])
+
+    async def deleteMessage(self, messageId):
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_write(self._deleteMessage, messageId)
+            except Exception as e:
+                print(f"Error deleting message: {e}")
+                return False
+
+    async def purgeMessagesBefore(self, timestamp, batchSize=None, progress=None):
+        return await self._runInBatches(self._purgeMessagesBatch, (timestamp,), batchSize, "messages", progress)
+
+    async def backfillMessageIds(self, batchSize=None, progress=None):
+        return await self._runInBatches(self._backfillMessageIds, (), batchSize, "messageIds", progress, "backfilling")
+
+    async def createUser(self, userId, name):
+        async with self.driver.session() as session:
+            try:
+                await session.execute_write(self._createUser, userId, name)
+            except Exception as e:
+                print(f"Error creating user: {e}")
+
+    async def createCompany(self, companyId, name):
+        async with self.driver.session() as session:
+            try:
+                await session.execute_write(self._createCompany, companyId, name)
+            except Exception as e:
+                print(f"Error creating company: {e}")
+
+    async def createUniversity(self, universityId, name):
+        async with self.driver.session() as session:
+            try:
+                await session.execute_write(self._createUniversity, universityId, name)
+            except Exception as e:
+                print(f"Error creating university: {e}")
+
+    async def createConnection(self, userId1, userId2, connectionType):
+        async with self.driver.session() as session:
+            try:
+                await session.execute_write(self._createConnection, userId1, userId2, connectionType,
+                                            relationships=self.relationships)
+            except Exception as e:
+                print(f"Error creating connection: {e}")
+        await self._refreshAround([userId1, userId2])
+
+    async def createUsers(self, users, batchSize=None):
+        rows = toRows(users, ("userId", "name"))
+        return await self._writeBatches(self._createUsersBatch, rows, batchSize, "Error creating users")
+
+    async def createCompanies(self, companies, batchSize=None):
+        rows = toRows(companies, ("userId", "name"))
+        return await self._writeBatches(self._createCompaniesBatch, rows, batchSize, "Error creating companies")
+
+    async def createUniversities(self, universities, batchSize=None):
+        rows = toRows(universities, ("userId", "name"))
+        return await self._writeBatches(self._createUniversitiesBatch, rows, batchSize, "Error creating universities")
+
+    async def createConnections(self, connections, batchSize=None):
+        rows = toRows(connections, ("userId1", "userId2", "connectionType"))
+        return await self._writeBatches(bindOptions(self._createConnectionsBatch, **self._txOptions()), rows,
+                                        batchSize, "Error creating connections", afterBatch=self._refreshConnections)
+
+    async def _refreshConnections(self, rows):
+        await self._refreshAround([userId for row in rows for userId in (row["userId1"], row["userId2"])])
+
+    async def _writeBatches(self, txFunction, rows, batchSize, errorMessage, afterBatch=None):
+        stats = []
+        async with self.driver.session() as session:
+            for index, chunk in enumerate(chunks(rows, batchSize or self.batchSize)):
+                try:
+                    counters = await session.execute_write(txFunction, chunk)
+                except Exception as e:
+                    print(f"{errorMessage} (batch {index}): {e}")
+                    counters = batchCounters(len(chunk), 0, 0)
+                if afterBatch is not None:
+                    await afterBatch(chunk)
+                counters["batch"] = index
+                stats.append(counters)
+        return stats
+
+    async def getFriendsAndFamily(self, userId, projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._getFriendsAndFamily, userId, projection,
+                                                  relationships=self.relationships)
+            except Exception as e:
+                print(f"Error retrieving friends and family: {e}")
+
+    async def getFamilyOfFamily(self, userId, projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._getFamilyOfFamily, userId, projection,
+                                                  relationships=self.relationships)
+            except Exception as e:
+                print(f"Error retrieving family of family: {e}")
+
+    async def getFriendsAndFamilyMany(self, userIds, projection=None, batchSize=None):
+        checkProjection(projection)
+        userIds = list(dict.fromkeys(userIds))
+        results = {}
+        async with self.driver.session() as session:
+            for chunk in chunks(userIds, batchSize or self.batchSize):
+                try:
+                    results.update(await session.execute_read(self._getFriendsAndFamilyMany, chunk, projection,
+                                                              relationships=self.relationships))
+                except Exception as e:
+                    print(f"Error retrieving friends and family: {e}")
+        return {userId: results.get(userId) for userId in userIds}
+
+    async def createMessage(self, senderId, receiverId, content, timestamp):
+        messageId = newMessageId(timestamp)
+        async with self.driver.session() as session:
+            try:
+                await session.execute_write(self._createMessage, senderId, receiverId, content, timestamp, messageId)
+                return messageId
+            except Exception as e:
+                print(f"Error creating message: {e}")
+
+    async def createMessages(self, messages, batchSize=None):
+        rows = toRows(messages, ("senderId", "receiverId", "content", "timestamp"))
+        return await self._writeBatches(self._createMessagesBatch, rows, batchSize, "Error creating messages")
+
+    async def getMessagesAfterDate(self, senderId, receiverId, startDate, projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._getMessagesAfterDate, senderId, receiverId, startDate, projection)
+            except Exception as e:
+                print(f"Error retrieving messages after date: {e}")
+
+    async def getMessagesAfterDatePage(self, senderId, receiverId, startDate, pageSize=DEFAULT_PAGE_SIZE, after=None,
+                                       projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(
+                    self._getMessagesAfterDatePage, senderId, receiverId, startDate, pageSize, after, projection)
+            except Exception as e:
+                print(f"Error retrieving messages after date: {e}")
+                return [], None
+
+    async def iterMessagesAfterDate(self, senderId, receiverId, startDate, pageSize=DEFAULT_PAGE_SIZE,
+                                    projection=None):
+        if checkProjection(projection) == "columns":
+            raise ValueError("iterMessagesAfterDate yields rows; use getMessagesAfterDatePage for columns")
+        cursor = None
+        while True:
+            messages, cursor = await self.getMessagesAfterDatePage(senderId, receiverId, startDate, pageSize, cursor,
+                                                                   projection)
+            for message in messages:
+                yield message
+            if cursor is None:
+                return
+
+    async def getFullConversation(self, userId1, userId2, projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._getFullConversation, userId1, userId2, projection)
+            except Exception as e:
+                print(f"Error retrieving full conversation: {e}")
+
+    async def getFullConversationMany(self, pairs, projection=None, batchSize=None):
+        checkProjection(projection)
+        pairs = [tuple(pair) for pair in pairs]
+        conversations = list(dict.fromkeys(tuple(sorted(pair)) for pair in pairs))
+        found = {}
+        async with self.driver.session() as session:
+            for chunk in chunks(conversations, batchSize or self.batchSize):
+                try:
+                    found.update(await session.execute_read(self._getFullConversationMany, chunk, projection))
+                except Exception as e:
+                    print(f"Error retrieving full conversations: {e}")
+        return SocialNetworkAPI._conversationsByPair(pairs, found)
+
+    async def getConversationPage(self, userId1, userId2, pageSize=DEFAULT_PAGE_SIZE, after=None, before=None,
+                                  newestFirst=False, projection=None):
+        descending, cursor = SocialNetworkAPI._conversationCursor(after, before, newestFirst)
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._getConversationPage, userId1, userId2, pageSize, cursor,
+                                                  descending, projection)
+            except Exception as e:
+                print(f"Error retrieving conversation page: {e}")
+                return [], None
+
+    async def iterConversation(self, userId1, userId2, pageSize=DEFAULT_PAGE_SIZE, after=None, before=None,
+                               newestFirst=False, projection=None):
+        if checkProjection(projection) == "columns":
+            raise ValueError("iterConversation yields rows; use getConversationPage for columns")
+        descending, cursor = SocialNetworkAPI._conversationCursor(after, before, newestFirst)
+        while True:
+            if descending:
+                messages, cursor = await self.getConversationPage(userId1, userId2, pageSize, before=cursor,
+                                                                  newestFirst=True, projection=projection)
+            else:
+                messages, cursor = await self.getConversationPage(userId1, userId2, pageSize, after=cursor,
+                                                                  projection=projection)
+            for message in messages:
+                yield message
+            if cursor is None:
+                return
+
+    async def getMessagesBetween(self, start, end, userId=None, projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._getMessagesBetween, start, end, userId, projection)
+            except Exception as e:
+                print(f"Error retrieving messages between dates: {e}")
+
+    async def getActivityCounts(self, userId, start, end, bucket="day"):
+        checkBucket(bucket)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._getActivityCounts, userId, start, end, bucket)
+            except Exception as e:
+                print(f"Error retrieving activity counts: {e}")
+
+    async def searchMessages(self, userId, text, limit=DEFAULT_SEARCH_LIMIT, start=None, end=None, after=None,
+                             projection=None):
+        query = escapeQuery(text)
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._searchMessages, userId, query, limit, start, end, after,
+                                                  projection)
+            except Exception as e:
+                print(f"Error searching messages: {e}")
+                return [], None
+
+    async def createPost(self, userId, title, content, timestamp):
+        postId = newMessageId(timestamp)
+        async with self.driver.session() as session:
+            try:
+                await session.execute_write(self._createPost, userId, title, content, timestamp, postId,
+                                            **self._txOptions())
+                return postId
+            except Exception as e:
+                print(f"Error creating post: {e}")
+
+    async def createPosts(self, posts, batchSize=None):
+        rows = toRows(posts, ("userId", "title", "content", "timestamp"))
+        return await self._writeBatches(bindOptions(self._createPostsBatch, **self._txOptions()), rows, batchSize,
+                                        "Error creating posts")
+
+    async def searchPosts(self, text, limit=DEFAULT_SEARCH_LIMIT, start=None, end=None, after=None, projection=None):
+        query = escapeQuery(text)
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._searchPosts, query, limit, start, end, after, projection)
+            except Exception as e:
+                print(f"Error searching posts: {e}")
+                return [], None
+
+    async def getFeed(self, userId, pageSize=DEFAULT_PAGE_SIZE, before=None, projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._getFeed, userId, pageSize, before, projection,
+                                                  relationships=self.relationships)
+            except Exception as e:
+                print(f"Error retrieving feed: {e}")
+                return [], None
+
+    async def iterFeed(self, userId, pageSize=DEFAULT_PAGE_SIZE, before=None, projection=None):
+        if checkProjection(projection) == "columns":
+            raise ValueError("iterFeed yields rows; use getFeed for columns")
+        cursor = before
+        while True:
+            posts, cursor = await self.getFeed(userId, pageSize, cursor, projection)
+            for post in posts:
+                yield post
+            if cursor is None:
+                return
+
+    async def rebuildFeeds(self, batchSize=None, startAfter="", progress=None):
+        config = self.feed or FeedConfig()
+        if not startAfter:
+            await self._runInBatches(self._markFeedHubsBatch, (config.fanOutLimit, self.relationships), batchSize,
+                                     "hubs", progress, "marking")
+        cursor = startAfter
+        rebuilt = 0
+        async with self.driver.session() as session:
+            while True:
+                try:
+                    userIds = await session.execute_read(self._getUserIdPage, cursor, batchSize or self.batchSize)
+                    if not userIds:
+                        return cursor
+                    rebuilt += await session.execute_write(self._rebuildFeedsBatch, userIds, config.timelineSize,
+                                                           relationships=self.relationships)
+                except Exception as e:
+                    print(f"Error rebuilding feeds after {cursor!r}: {e}")
+                    return cursor
+                cursor = userIds[-1]
+                if progress is not None:
+                    progress(cursor, rebuilt)
+
+    async def getUsersMentionedWithWorkRelation(self, userId, projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._getUsersMentionedWithWorkRelation, userId, projection,
+                                                  relationships=self.relationships)
+            except Exception as e:
+                print(f"Error retrieving users mentioned with work relation: {e}")
+
+    async def findConnectionsByHops(self, userId, maxHops, maxResults=None, maxFanOut=None, projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._findConnectionsByHops, userId, maxHops, maxResults, maxFanOut,
+                                                  projection, relationships=self.relationships)
+            except Exception as e:
+                print(f"Error finding new connections by hops: {e}")
+
+    async def shortestConnection(self, userId1, userId2, maxHops=None, maxFanOut=None):
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._shortestConnection, userId1, userId2, maxHops, maxFanOut,
+                                                  relationships=self.relationships)
+            except Exception as e:
+                print(f"Error finding shortest connection: {e}")
+
+    async def findConnectionsByMessages(self, userId, minMessages, maxDepth=DEFAULT_MESSAGE_DEPTH, maxFanOut=None,
+                                        projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._findConnectionsByMessages, userId, minMessages, maxDepth,
+                                                  maxFanOut, projection, relationships=self.relationships)
+            except Exception as e:
+                print(f"Error finding new connections by messages: {e}")
+
+    async def backfillMessagedEdges(self, batchSize=None, startAfter="", progress=None):
+        cursor = startAfter
+        async with self.driver.session() as session:
+            while True:
+                try:
+                    senderIds = await session.execute_read(self._getUserIdPage, cursor, batchSize or self.batchSize)
+                    if not senderIds:
+                        return cursor
+                    pairs = await session.execute_write(self._backfillMessagedEdges, senderIds)
+                except Exception as e:
+                    print(f"Error backfilling MESSAGED edges after {cursor!r}: {e}")
+                    return cursor
+                cursor = senderIds[-1]
+                if progress is not None:
+                    progress(cursor, pairs)
+
+    async def getPeopleYouMayKnow(self, userId, limit=None, projection=None):
+        checkProjection(projection)
+        async with self.driver.session() as session:
+            try:
+                return await session.execute_read(self._getPeopleYouMayKnow, userId, limit, projection)
+            except Exception as e:
+                print(f"Error retrieving people you may know: {e}")
+
+    async def refreshPeopleYouMayKnow(self, userIds, batchSize=None):
+        config = self.pymk or PymkConfig()
+        refreshed = 0
+        async with self.driver.session() as session:
+            for chunk in chunks(dict.fromkeys(userIds), batchSize or self.batchSize):
+                try:
+                    refreshed += await session.execute_write(self._refreshPeopleYouMayKnow, chunk, config.topK,
+                                                             config.scoring == "adamicAdar", config.messageWeight,
+                                                             relationships=self.relationships)
+                except Exception as e:
+                    print(f"Error refreshing people you may know: {e}")
+        return refreshed
+
+    async def rebuildPeopleYouMayKnow(self, batchSize=None, startAfter="", progress=None):
+        cursor = startAfter
+        refreshed = 0
+        async with self.driver.session() as session:
+            while True:
+                try:
+                    userIds = await session.execute_read(self._getUserIdPage, cursor, batchSize or self.batchSize)
+                except Exception as e:
+                    print(f"Error rebuilding people you may know after {cursor!r}: {e}")
+                    return cursor
+                if not userIds:
+                    return cursor
+                refreshed += await self.refreshPeopleYouMayKnow(userIds, batchSize)
+                cursor = userIds[-1]
+                if progress is not None:
+                    progress(cursor, refreshed)
+
+    async def _refreshAround(self, userIds):
+        if self.pymk is None or not userIds:
+            return
+        async with self.driver.session() as session:
+            try:
+                affected = await session.execute_read(self._getAffectedUsers, list(dict.fromkeys(userIds)),
+                                                      relationships=self.relationships)
+            except Exception as e:
+                print(f"Error finding users affected by a connection change: {e}")
+                return
+        await self.refreshPeopleYouMayKnow(affected)
+
+
+class AsyncSocialNetworkBatch:
+    # SocialNetworkBatch on the async driver: every call runs on one session and one explicit transaction,
+    # committed once on a clean exit and rolled back if the block raises. A failed commit raises too.
+    def __init__(self, api, fetchSize=None):
+        self.api = api
+        self.fetchSize = fetchSize
+        self.session = None
+        self.tx = None
+        self.committed = False
+        self.writes = []
+
+    async def __aenter__(self):
+        sessionConfig = {} if self.fetchSize is None else {"fetch_size": self.fetchSize}
+        self.session = self.api.driver.session(**sessionConfig)
+        self.tx = await self.session.begin_transaction()
+        return self
+
+    async def __aexit__(self, excType, exc, traceback):
+        try:
+            if excType is not None:
+                try:
+                    await self.tx.rollback()
+                except Exception as e:
+                    print(f"Error rolling back batch: {e}")
+                return False
+            try:
+                await self.tx.commit()
+            except Exception as e:
+                print(f"Error committing batch: {e}")
+                raise
+            self.committed = True
+            for method, args, kwargs in self.writes:
+                await self.api._invalidate(method, args, kwargs)
+        finally:
+            await self.tx.close()
+            await self.session.close()
+        return False
+
+    def __getattr__(self, name):
+        txFunction = None if name.startswith("_") else getattr(SocialNetworkAPI, "_" + name, None)
+        if not hasattr(txFunction, "runAsync"):
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        txFunction = bindOptions(txFunction.runAsync, **self.api._txOptions())
+
+        async def call(*args, **kwargs):
+            if not name.startswith(READ_PREFIXES):
+                self.writes.append((name, args, kwargs))
+            return await txFunction(self.tx, *args, **kwargs)
+
+        return call
@@ -0,0 +1,37 @@
+import inspect
+from functools import partial
+from itertools import islice
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def chunks(rows, size):
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def toRows(items, keys):
+    # Accepts {id: name} dicts, sequences of tuples or sequences of row dicts.
+    if isinstance(items, dict):
+        items = items.items()
+    for item in items:
+        if isinstance(item, dict):
+            yield item
+        else:
+            yield dict(zip(keys, item))
+
+
+def batchCounters(rows, matched, created):
+    return {"rows": rows, "created": created, "merged": matched - created, "failed": rows - matched}
+
+
+def bindOptions(txFunction, **options):
+    # Tx functions take per-API settings (the relationship model, the feed config) as keyword-only arguments;
+    # generic callers such as units of work and bulk imports bind the ones a function declares.
+    parameters = inspect.signature(txFunction).parameters
+    bound = {name: value for name, value in options.items() if name in parameters}
+    return partial(txFunction, **bound) if bound else txFunction
@@ -0,0 +1,198 @@
+"""
+Benchmark runner for the SocialNetworkAPI methods. Loads a seeded synthetic graph, calls every
+method with sampled arguments and reports p50/p95/p99 latency and throughput per method. Runs
+against the in-process InMemorySocialNetworkAPI by default, or a Neo4j server when --uri is given.
+A saved baseline is compared by p95; regressions beyond the tolerance make the run exit non-zero.
+
+    python benchmark.py --scale 10k --save baseline.json
+    python benchmark.py --scale 10k --baseline baseline.json --tolerance 0.2
+    python benchmark.py --scale 100k --uri bolt://localhost:7687 --user neo4j --password 123
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+from feed import FeedConfig
+from relationships import MODELS, RelationshipModel
+from syntheticGraph import SCALES, WORDS, SyntheticGraph
+
+DEFAULT_ITERATIONS = 200
+
+
+def readWorkloads(graph):
+    # Each workload draws its arguments from the graph's id space with the run's seeded rng.
+    def user(rng):
+        return graph.userId(rng.randrange(graph.users))
+
+    def edge(rng):
+        edges = graph.edges()
+        offset = rng.randrange(len(edges) // 2) * 2
+        return graph.userId(edges[offset]), graph.userId(edges[offset + 1])
+
+    return {
+        "getFriendsAndFamily": lambda api, rng: api.getFriendsAndFamily(user(rng)),
+        "getFamilyOfFamily": lambda api, rng: api.getFamilyOfFamily(user(rng)),
+        "getFriendsAndFamilyMany": lambda api, rng: api.getFriendsAndFamilyMany([user(rng) for _ in range(50)]),
+        "getMessagesAfterDate": lambda api, rng: api.getMessagesAfterDate(*edge(rng), "2023-06-01T00:00:00"),
+        "getFullConversation": lambda api, rng: api.getFullConversation(*edge(rng)),
+        "getFullConversationMany": lambda api, rng: api.getFullConversationMany([edge(rng) for _ in range(50)]),
+        "getConversationPage": lambda api, rng: api.getConversationPage(*edge(rng), pageSize=20),
+        "getUsersMentionedWithWorkRelation": lambda api, rng: api.getUsersMentionedWithWorkRelation(user(rng)),
+        "findConnectionsByHops": lambda api, rng: api.findConnectionsByHops(user(rng), 3, maxResults=1000),
+        "shortestConnection": lambda api, rng: api.shortestConnection(user(rng), user(rng), maxHops=6),
+        "findConnectionsByMessages": lambda api, rng: api.findConnectionsByMessages(user(rng), 2),
+        "getPeopleYouMayKnow": lambda api, rng: api.getPeopleYouMayKnow(user(rng), 10),
+        "searchMessages": lambda api, rng: api.searchMessages(user(rng), rng.choice(WORDS)),
+        "getFeed": lambda api, rng: api.getFeed(user(rng), 20),
+        "searchPosts": lambda api, rng: api.searchPosts(f"{rng.choice(WORDS)} {rng.choice(WORDS)}",
+                                                        start="2023-06-01T00:00:00"),
+        "getMessagesBetween": lambda api, rng: api.getMessagesBetween("2023-06-01T00:00:00", "2023-06-02T00:00:00"),
+        "getActivityCounts": lambda api, rng: api.getActivityCounts(user(rng), "2023-01-01T00:00:00",
+                                                                    "2024-01-01T00:00:00"),
+    }
+
+
+def writeWorkloads(graph):
+    def user(rng):
+        return graph.userId(rng.randrange(graph.users))
+
+    return {
+        "createUser": lambda api, rng: api.createUser(f"bench{rng.randrange(1 << 30)}", "Benchmark User"),
+        "createConnection": lambda api, rng: api.createConnection(user(rng), user(rng), "friend"),
+        "createMessage": lambda api, rng: api.createMessage(user(rng), user(rng), "benchmark", "2024-01-01T00:00:00"),
+        "createPost": lambda api, rng: api.createPost(user(rng), "bench", f"benchmark @{user(rng)}", "2024-01-01T00:00:00"),
+    }
+
+
+def percentile(samples, fraction):
+    # Nearest-rank percentile over sorted samples.
+    if not samples:
+        return None
+    rank = max(1, math.ceil(fraction * len(samples)))
+    return samples[min(rank, len(samples)) - 1]
+
+
+def summarise(samples, elapsed):
+    samples = sorted(samples)
+    return {
+        "calls": len(samples),
+        "p50": percentile(samples, 0.50),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99),
+        "max": samples[-1] if samples else None,
+        "throughput": len(samples) / elapsed if elapsed else None,
+    }
+
+
+def runWorkload(api, call, iterations, seed, warmup=10):
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        call(api, rng)
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call(api, rng)
+        samples.append(time.perf_counter() - start)
+    return summarise(samples, time.perf_counter() - started)
+
+
+def runBenchmark(api, graph, iterations=DEFAULT_ITERATIONS, methods=None, writes=True, load=True, batchSize=None):
+    results = {}
+    if load:
+        api.delete()
+        started = time.perf_counter()
+        rows = graph.load(api, batchSize)
+        elapsed = time.perf_counter() - started
+        results["load"] = {"rows": rows, "seconds": elapsed, "throughput": sum(rows.values()) / elapsed}
+    workloads = dict(readWorkloads(graph))
+    if writes:
+        workloads.update(writeWorkloads(graph))
+    for name, call in workloads.items():
+        if methods and name not in methods:
+            continue
+        results[name] = runWorkload(api, call, iterations, f"{graph.seed}:{name}")
+    return results
+
+
+def compareBaseline(results, baseline, tolerance):
+    # Returns (method, baseline p95, current p95) for every method slower than baseline * (1 + tolerance).
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if name == "load" or not previous or previous.get("p95") is None or current.get("p95") is None:
+            continue
+        if current["p95"] > previous["p95"] * (1 + tolerance):
+            regressions.append((name, previous["p95"], current["p95"]))
+    return regressions
+
+
+def printResults(results):
+    load = results.get("load")
+    if load:
+        print(f"load: {sum(load['rows'].values())} rows in {load['seconds']:.2f}s ({load['throughput']:.0f} rows/s)")
+    print(f"{'method':<36}{'calls':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}")
+    for name, stats in results.items():
+        if name == "load":
+            continue
+        print(f"{name:<36}{stats['calls']:>7}{stats['p50'] * 1000:>10.3f}{stats['p95'] * 1000:>10.3f}"
+              f"{stats['p99'] * 1000:>10.3f}{stats['throughput']:>10.0f}")
+
+
+def createApi(args):
+    if args.uri:
+        from socialNetworkLegacy import SocialNetworkAPI
+        return SocialNetworkAPI(args.uri, args.user, args.password, ensureSchema=True,
+                                relationships=RelationshipModel(args.relationships), feed=FeedConfig())
+    from inMemoryGraph import InMemorySocialNetworkAPI
+    return InMemorySocialNetworkAPI()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SocialNetworkAPI methods on a synthetic graph.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--users", type=int, help="overrides --scale with an exact user count")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--methods", nargs="*", help="only run these methods")
+    parser.add_argument("--no-writes", action="store_true", help="skip the single-row write methods")
+    parser.add_argument("--no-load", action="store_true", help="reuse a graph already loaded with the same seed")
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--uri", help="Neo4j bolt URI; the in-memory backend is used when omitted")
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--relationships", choices=MODELS, default="property",
+                        help="how the Neo4j backend stores connections")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed p95 slowdown before failing")
+    parser.add_argument("--save", help="write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    graph = SyntheticGraph(args.users, seed=args.seed) if args.users else SyntheticGraph.atScale(args.scale, args.seed)
+    api = createApi(args)
+    try:
+        results = runBenchmark(api, graph, args.iterations, args.methods, not args.no_writes, not args.no_load,
+                               args.batch_size)
+    finally:
+        api.close()
+    printResults(results)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compareBaseline(results, json.load(file), args.tolerance)
+        for name, previous, current in regressions:
+            print(f"REGRESSION {name}: p95 {previous * 1000:.3f} ms -> {current * 1000:.3f} ms")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
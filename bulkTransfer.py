@@ -0,0 +1,298 @@
+"""
+Streaming bulk import and export. Every section is a CSV (with a header row) or JSONL file named after
+the section, e.g. users.csv or messages.jsonl. Imports stream rows through generators into UNWIND
+batches written by parallel worker sessions; each worker owns a bounded queue and every row is
+routed by one of its nodes, so all the rows sharing that node go through the same worker instead of
+contending for its lock. Connections lock both endpoints but are routed by one, so two workers can
+still meet on the other and deadlock; those batches are retried. Exports stream each section out of
+Neo4j row by row, in the same format, so a snapshot can be reloaded with import. Memory stays constant
+in both directions.
+
+    python bulkTransfer.py import seed/ --uri bolt://localhost:7687 --user neo4j --password 123 --workers 4
+    python bulkTransfer.py export snapshot/ --format jsonl --uri bolt://localhost:7687 --user neo4j --password 123
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import zlib
+
+from batching import DEFAULT_BATCH_SIZE, batchCounters, bindOptions
+from relationships import MODELS, RelationshipModel
+from timestamps import toDateTime
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 4
+FORMATS = ("csv", "jsonl")
+DEADLOCK_RETRIES = 3
+DEADLOCK_DETECTED = "Neo.TransientError.Transaction.DeadlockDetected"
+
+# section: (columns, partition column, bulk writer, batch tx function), in load order. Connections are
+# partitioned by userId2 because companies, universities and popular users gather on that side; their
+# userId1 endpoint is not partitioned, so a hub that also appears as userId1 is written by several workers.
+SECTIONS = {
+    "users": (("userId", "name"), "userId", "createUsers", "_createUsersBatch"),
+    "companies": (("userId", "name"), "userId", "createCompanies", "_createCompaniesBatch"),
+    "universities": (("userId", "name"), "userId", "createUniversities", "_createUniversitiesBatch"),
+    "connections": (("userId1", "userId2", "connectionType"), "userId2", "createConnections",
+                    "_createConnectionsBatch"),
+    "messages": (("messageId", "senderId", "receiverId", "content", "timestamp"), "senderId", "createMessages",
+                 "_createMessagesBatch"),
+    "posts": (("postId", "userId", "title", "content", "timestamp"), "userId", "createPosts", "_createPostsBatch"),
+}
+
+EXPORT_QUERIES = {
+    "users": (
+        "MATCH (user:User) WHERE NOT user:Company AND NOT user:University "
+        "RETURN user.userId AS userId, user.name AS name"
+    ),
+    "companies": "MATCH (user:User:Company) RETURN user.userId AS userId, user.name AS name",
+    "universities": "MATCH (user:User:University) RETURN user.userId AS userId, user.name AS name",
+    # Filled in with the API's relationship model: the connection pattern and the type expression.
+    "connections": (
+        "MATCH (user1:User)-%s->(user2:User) "
+        "RETURN user1.userId AS userId1, user2.userId AS userId2, %s AS connectionType"
+    ),
+    "messages": (
+        "MATCH (sender:User)-[:SENT]->(message:Message)-[:RECEIVED]->(receiver:User) "
+        "RETURN message.messageId AS messageId, sender.userId AS senderId, receiver.userId AS receiverId, "
+        "message.content AS content, message.timestamp AS timestamp"
+    ),
+    "posts": (
+        "MATCH (user:User)-[:POSTED]->(post:Post) "
+        "RETURN post.postId AS postId, user.userId AS userId, post.title AS title, post.content AS content, "
+        "post.timestamp AS timestamp"
+    ),
+}
+
+
+def sectionPath(directory, section):
+    # The first of <section>.csv / <section>.jsonl that exists, or None.
+    for fileFormat in FORMATS:
+        path = os.path.join(directory, f"{section}.{fileFormat}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def readRows(path):
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, newline="", encoding="utf-8") as file:
+            yield from csv.DictReader(file)
+
+
+def writeRows(path, columns, rows):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        if path.endswith(".jsonl"):
+            for row in rows:
+                file.write(json.dumps(dict(zip(columns, row))) + "\n")
+                count += 1
+        else:
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+    return count
+
+
+def partition(value, workers):
+    # Stable across processes, unlike hash(), so reruns route every node to the same worker.
+    return zlib.crc32(str(value).encode("utf-8")) % workers
+
+
+def addCounters(total, counters):
+    for key in ("rows", "created", "merged", "failed"):
+        total[key] += counters[key]
+    return total
+
+
+def importRows(api, section, rows, workers=DEFAULT_WORKERS, batchSize=None, queueSize=DEFAULT_QUEUE_SIZE):
+    _, partitionColumn, bulkWriter, txName = SECTIONS[section]
+    total = batchCounters(0, 0, 0)
+    if not hasattr(api, "_session"):
+        # Backends without sessions (the in-memory API) take the rows through their own bulk writer.
+        for counters in getattr(api, bulkWriter)(rows, batchSize) or []:
+            addCounters(total, counters)
+        return total
+    batchSize = batchSize or api.batchSize
+    txFunction = bindOptions(getattr(api, txName), **api._txOptions())
+    afterBatch = api._invalidateConnections if section == "connections" else None
+    queues = [queue.Queue(queueSize) for _ in range(workers)]
+    results = [batchCounters(0, 0, 0) for _ in range(workers)]
+    threads = [threading.Thread(target=_importWorker,
+                                args=(api, txFunction, queues[index], results[index], afterBatch, section),
+                                name=f"import-{section}-{index}", daemon=True)
+               for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    buffers = [[] for _ in range(workers)]
+    try:
+        for row in rows:
+            index = partition(row[partitionColumn], workers)
+            buffers[index].append(row)
+            if len(buffers[index]) >= batchSize:
+                # Blocks while that worker is queueSize batches behind, which bounds memory.
+                queues[index].put(buffers[index])
+                buffers[index] = []
+    finally:
+        for index in range(workers):
+            if buffers[index]:
+                queues[index].put(buffers[index])
+            queues[index].put(None)
+        for thread in threads:
+            thread.join()
+    for result in results:
+        addCounters(total, result)
+    return total
+
+
+def _importWorker(api, txFunction, batches, result, afterBatch, section):
+    # Failures are reported and counted, never raised: a dead worker would stop draining its queue and leave
+    # the producer blocked on put() for good. The worker only returns at the None sentinel.
+    session = None
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            try:
+                if session is None:
+                    session = api._session()
+                counters = _writeBatch(session, txFunction, batch)
+            except Exception as e:
+                api._reportError(f"Error importing {section}", e)
+                counters = batchCounters(len(batch), 0, 0)
+            else:
+                if afterBatch is not None:
+                    try:
+                        afterBatch(batch)
+                    except Exception as e:
+                        api._reportError(f"Error after importing a batch of {section}", e)
+            addCounters(result, counters)
+    finally:
+        if session is not None:
+            session.close()
+
+
+def _writeBatch(session, txFunction, batch):
+    # execute_write retries transient errors for the driver's retry time; a deadlock that outlasts it (two
+    # workers locking the same unpartitioned endpoint) gets the whole batch a few more attempts.
+    attempt = 0
+    while True:
+        try:
+            return session.execute_write(txFunction, batch)
+        except Exception as e:
+            attempt += 1
+            if getattr(e, "code", None) != DEADLOCK_DETECTED or attempt > DEADLOCK_RETRIES:
+                raise
+
+
+def importDirectory(api, directory, sections=None, workers=DEFAULT_WORKERS, batchSize=None,
+                    queueSize=DEFAULT_QUEUE_SIZE, progress=None):
+    # Sections load in SECTIONS order, each finishing before the next, so relationships find their nodes.
+    results = {}
+    for section in SECTIONS:
+        if sections and section not in sections:
+            continue
+        path = sectionPath(directory, section)
+        if path is None:
+            continue
+        results[section] = importRows(api, section, readRows(path), workers, batchSize, queueSize)
+        if progress is not None:
+            progress(section, results[section])
+    return results
+
+
+def exportRows(api, section, fetchSize=None):
+    # Streams one section as tuples in SECTIONS column order; temporal values become ISO strings.
+    columns = SECTIONS[section][0]
+    query = EXPORT_QUERIES[section]
+    if section == "connections":
+        query %= (api.relationships.connected("connection"), api.relationships.typeOf("connection"))
+    sessionConfig = {} if fetchSize is None else {"fetch_size": fetchSize}
+    with api._session(**sessionConfig) as session:
+        for record in session.run(query):
+            yield tuple(_exportValue(record[column]) for column in columns)
+
+
+def _exportValue(value):
+    if hasattr(value, "to_native"):
+        return toDateTime(value).isoformat()
+    return value
+
+
+def exportDirectory(api, directory, sections=None, fileFormat="csv", fetchSize=None, progress=None):
+    if fileFormat not in FORMATS:
+        raise ValueError(f"Unknown format {fileFormat!r}, expected one of {FORMATS}")
+    os.makedirs(directory, exist_ok=True)
+    results = {}
+    for section, (columns, _, _, _) in SECTIONS.items():
+        if sections and section not in sections:
+            continue
+        path = os.path.join(directory, f"{section}.{fileFormat}")
+        try:
+            results[section] = writeRows(path, columns, exportRows(api, section, fetchSize))
+        except Exception as e:
+            api._reportError(f"Error exporting {section}", e)
+            continue
+        if progress is not None:
+            progress(section, results[section])
+    return results
+
+
+def printProgress(section, result):
+    if isinstance(result, dict):
+        print(f"{section}: {result['rows']} rows, {result['created']} created, {result['merged']} merged, "
+              f"{result['failed']} failed")
+    else:
+        print(f"{section}: {result} rows")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a social network into or out of Neo4j.")
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("directory", help="holds one <section>.csv or <section>.jsonl file per section")
+    parser.add_argument("--sections", nargs="*", choices=list(SECTIONS), help="only these sections")
+    parser.add_argument("--uri", required=True)
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="batches buffered per worker")
+    parser.add_argument("--format", choices=FORMATS, default="csv", help="export file format")
+    parser.add_argument("--fetch-size", type=int, help="records fetched per round trip while exporting")
+    parser.add_argument("--relationships", choices=MODELS, default="property", help="how connections are stored")
+    args = parser.parse_args(argv)
+
+    from socialNetworkLegacy import SocialNetworkAPI
+    api = SocialNetworkAPI(args.uri, args.user, args.password, batchSize=args.batch_size,
+                           maxConnectionPoolSize=max(args.workers, 1) + 1, ensureSchema=args.command == "import",
+                           relationships=RelationshipModel(args.relationships))
+    try:
+        if args.command == "import":
+            results = importDirectory(api, args.directory, args.sections, args.workers, args.batch_size,
+                                      args.queue_size, printProgress)
+        else:
+            results = exportDirectory(api, args.directory, args.sections, args.format, args.fetch_size,
+                                      printProgress)
+    finally:
+        api.close()
+    if not results:
+        print(f"No sections found in {args.directory}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+Home feed: the posts of a user's connections, newest first, built by hybrid fan-out. When a normal author
+posts, the postId is pushed into the timeline of every person connected to them, in the same transaction
+as the post. A timeline is the feedIds list on the User node, kept newest first and cut to timelineSize.
+Authors with more than fanOutLimit connections (companies, universities, very popular users) are
+labelled :FeedHub the first time they post and never fan out; readers merge the latest posts of the hubs
+they are connected to at read time. A hub stays a hub, so no post falls between the two paths. Post ids
+are ULIDs like message ids, so feeds are ordered and paged by postId alone.
+"""
+
+from dataclasses import dataclass
+
+DEFAULT_TIMELINE_SIZE = 500
+DEFAULT_FAN_OUT_LIMIT = 1000
+HUB_LABEL = "FeedHub"
+
+
+@dataclass(frozen=True, slots=True)
+class FeedConfig:
+    timelineSize: int = DEFAULT_TIMELINE_SIZE
+    fanOutLimit: int = DEFAULT_FAN_OUT_LIMIT
+
+    def __post_init__(self):
+        if self.timelineSize < 1:
+            raise ValueError("timelineSize must be at least 1")
+        if self.fanOutLimit < 0:
+            raise ValueError("fanOutLimit must not be negative")
@@ -0,0 +1,125 @@
+"""
+Level-by-level frontier expansion shared by every backend. The searches are generators that yield
+the frontier to expand and receive back (sourceId, neighbourId) pairs, so the same engine runs over
+Cypher round trips, the async driver or the in-memory CSR adjacency. maxFanOut caps how many
+neighbours of any one node are followed, so a supernode costs at most maxFanOut per visit; expanders
+given the cap should apply it at the source as well, so the rest are never fetched.
+"""
+
+
+def hopSearch(startId, maxHops, maxResults=None, maxFanOut=None):
+    # Returns (userId, hops) for every user at a true minimum distance of 2..maxHops, nearest first.
+    distances = {startId: 0}
+    frontier = [startId]
+    found = []
+    for hops in range(1, maxHops + 1):
+        if not frontier:
+            break
+        edges = yield frontier
+        nextFrontier = []
+        for _, neighbourId in capFanOut(edges, maxFanOut):
+            if neighbourId in distances:
+                continue
+            distances[neighbourId] = hops
+            nextFrontier.append(neighbourId)
+            if hops >= 2:
+                found.append((neighbourId, hops))
+                if maxResults is not None and len(found) >= maxResults:
+                    return found
+        frontier = nextFrontier
+    return found
+
+
+def reachableSearch(startId, maxDepth, maxFanOut=None):
+    # Returns {userId: hops} for every user within maxDepth hops, excluding the start.
+    distances = {startId: 0}
+    frontier = [startId]
+    for hops in range(1, maxDepth + 1):
+        if not frontier:
+            break
+        edges = yield frontier
+        nextFrontier = []
+        for _, neighbourId in capFanOut(edges, maxFanOut):
+            if neighbourId not in distances:
+                distances[neighbourId] = hops
+                nextFrontier.append(neighbourId)
+        frontier = nextFrontier
+    del distances[startId]
+    return distances
+
+
+def shortestPathSearch(sourceId, targetId, maxHops=None, maxFanOut=None):
+    # Bidirectional BFS: always expands the smaller frontier by one full level and, once the two
+    # sides meet, returns the shortest userId path from sourceId to targetId (None if none exists).
+    if sourceId == targetId:
+        return [sourceId]
+    visited = ({sourceId: (None, 0)}, {targetId: (None, 0)})
+    frontiers = [[sourceId], [targetId]]
+    depth = 0
+    while frontiers[0] and frontiers[1] and (maxHops is None or depth < maxHops):
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        own, other = visited[side], visited[1 - side]
+        edges = yield frontiers[side]
+        nextFrontier = []
+        meeting, meetingLength = None, None
+        for parentId, neighbourId in capFanOut(edges, maxFanOut):
+            if neighbourId in own:
+                continue
+            own[neighbourId] = (parentId, own[parentId][1] + 1)
+            nextFrontier.append(neighbourId)
+            if neighbourId in other:
+                length = own[neighbourId][1] + other[neighbourId][1]
+                if meetingLength is None or length < meetingLength:
+                    meeting, meetingLength = neighbourId, length
+        depth += 1
+        if meeting is not None:
+            return _joinPath(visited, meeting)
+        frontiers[side] = nextFrontier
+    return None
+
+
+def capFanOut(edges, maxFanOut):
+    # The first maxFanOut edges of each source, visited neighbours included, as a LIMIT at the source would give.
+    if maxFanOut is None:
+        return edges
+    counts = {}
+    capped = []
+    for sourceId, neighbourId in edges:
+        count = counts.get(sourceId, 0)
+        if count < maxFanOut:
+            counts[sourceId] = count + 1
+            capped.append((sourceId, neighbourId))
+    return capped
+
+
+def _joinPath(visited, meeting):
+    path = []
+    node = meeting
+    while node is not None:
+        path.append(node)
+        node = visited[0][node][0]
+    path.reverse()
+    node = visited[1][meeting][0]
+    while node is not None:
+        path.append(node)
+        node = visited[1][node][0]
+    return path
+
+
+def runSearch(search, expand):
+    try:
+        frontier = next(search)
+        while True:
+            frontier = search.send(expand(frontier))
+    except StopIteration as stop:
+        return stop.value
+
+
+def runSearchSteps(search, expand):
+    # For transaction bodies (see transactions.py): expand is itself a body, so the search runs inside one.
+    try:
+        frontier = next(search)
+        while True:
+            frontier = search.send((yield from expand(frontier)))
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,291 @@
+"""
+On-disk CSR snapshot of the connection graph for offline analytics. A snapshot directory holds
+offsets.npy, neighbours.npy and edgeTypes.npy (the undirected adjacency, each edge listed under both
+endpoints), userIds.npy (the sorted userId intern table; node i is userIds[i]), labels.npy (Company /
+University bits) and meta.json (the connection type names). Every array loads memory-mapped, and the
+batch routines below expand whole frontiers with NumPy instead of walking users one by one, so nightly
+jobs over the full user base never touch the database.
+
+    python graphSnapshot.py export snapshot/ --uri bolt://localhost:7687 --user neo4j --password 123
+    python graphSnapshot.py stats snapshot/ --hops 2
+"""
+
+import argparse
+import json
+import os
+import sys
+from array import array
+
+import numpy as np
+
+from relationships import MODELS, RelationshipModel
+
+ARRAYS = ("offsets", "neighbours", "edgeTypes", "userIds", "labels")
+LABEL_BITS = {"Company": 1, "University": 2}
+DEFAULT_SOURCE_BATCH = 4096
+
+USERS_QUERY = (
+    "MATCH (user:User) "
+    "RETURN user.userId AS userId, user:Company AS company, user:University AS university"
+)
+# Filled in with the API's relationship model: the connection pattern and the type expression.
+CONNECTIONS_QUERY = (
+    "MATCH (user1:User)-%s->(user2:User) "
+    "RETURN user1.userId AS userId1, user2.userId AS userId2, %s AS connectionType"
+)
+
+
+class GraphSnapshot:
+    def __init__(self, offsets, neighbours, edgeTypes, userIds, labels, types):
+        self.offsets = offsets
+        self.neighbours = neighbours
+        self.edgeTypes = edgeTypes
+        self.userIds = userIds
+        self.labels = labels
+        self.types = list(types)
+        self._views = {None: self}
+
+    @property
+    def nodeCount(self):
+        return len(self.userIds)
+
+    @classmethod
+    def build(cls, users, connections):
+        # users: (userId, label bits); connections: (userId1, userId2, connectionType). Connections to
+        # unknown users are skipped, as the MATCH in createConnection would skip them.
+        users = sorted(users)
+        userIds = np.array([userId for userId, _ in users], dtype=str)
+        labels = np.array([bits for _, bits in users], dtype=np.int8)
+        index = {userId: node for node, (userId, _) in enumerate(users)}
+        types, typeCodes = [], {}
+        sources, targets, codes = array("q"), array("q"), array("b")
+        for userId1, userId2, connectionType in connections:
+            node1, node2 = index.get(userId1), index.get(userId2)
+            if node1 is None or node2 is None:
+                continue
+            if connectionType not in typeCodes:
+                typeCodes[connectionType] = len(types)
+                types.append(connectionType)
+            sources.append(node1)
+            targets.append(node2)
+            codes.append(typeCodes[connectionType])
+        sources, targets = np.frombuffer(sources, np.int64), np.frombuffer(targets, np.int64)
+        codes = np.frombuffer(codes, np.int8)
+        offsets, neighbours, edgeTypes = _csr(np.concatenate((sources, targets)), np.concatenate((targets, sources)),
+                                              np.concatenate((codes, codes)), len(users))
+        return cls(offsets, neighbours, edgeTypes, userIds, labels, types)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "meta.json"), "w") as file:
+            json.dump({"types": self.types, "users": self.nodeCount, "edges": len(self.neighbours) // 2}, file)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+                  for name in ARRAYS}
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+        return cls(types=meta["types"], **arrays)
+
+    def indexOf(self, userIds):
+        # Node indexes for userIds through the sorted intern table; -1 for unknown ids.
+        userIds = np.asarray(userIds, dtype=str)
+        if not self.nodeCount:
+            return np.full(len(userIds), -1)
+        positions = np.minimum(np.searchsorted(self.userIds, userIds), self.nodeCount - 1)
+        return np.where(self.userIds[positions] == userIds, positions, -1)
+
+    def ofType(self, connectionType):
+        # CSR restricted to one connection type, built once per type and cached.
+        view = self._views.get(connectionType)
+        if view is None:
+            code = self.types.index(connectionType) if connectionType in self.types else -1
+            keep = np.asarray(self.edgeTypes) == code
+            owners = np.repeat(np.arange(self.nodeCount), np.diff(self.offsets))
+            offsets = np.zeros(self.nodeCount + 1, dtype=np.int64)
+            np.cumsum(np.bincount(owners[keep], minlength=self.nodeCount), out=offsets[1:])
+            view = GraphSnapshot(offsets, np.asarray(self.neighbours)[keep], np.asarray(self.edgeTypes)[keep],
+                                 self.userIds, self.labels, self.types)
+            self._views[connectionType] = view
+        return view
+
+    def degrees(self, connectionType=None):
+        return np.diff(self.ofType(connectionType).offsets)
+
+    def degreeDistribution(self, connectionType=None):
+        # distribution[d] is the number of users with degree d.
+        return np.bincount(self.degrees(connectionType))
+
+    def expand(self, owners, nodes):
+        # One vectorised hop: every (owner, neighbour) pair for the given (owner, node) frontier.
+        nodes = np.asarray(nodes, dtype=np.int64)
+        starts = np.asarray(self.offsets[nodes])
+        lengths = np.asarray(self.offsets[nodes + 1]) - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.repeat(owners, lengths), np.asarray(self.neighbours[positions], dtype=np.int64)
+
+    def kHop(self, sources, k, connectionType=None):
+        # Nodes within k hops of each source (excluding the source) and their hop distance, grouped by
+        # source as (offsets, nodes, hops): source i owns nodes[offsets[i]:offsets[i + 1]].
+        graph = self.ofType(connectionType)
+        sources = np.asarray(sources, dtype=np.int64)
+        width = max(self.nodeCount, 1)
+        owners, frontier = np.arange(len(sources)), sources
+        visited = np.sort(owners * width + sources)
+        found = []
+        for hop in range(1, k + 1):
+            if not len(frontier):
+                break
+            owners, reached = graph.expand(owners, frontier)
+            keys = np.unique(owners * width + reached)
+            keys = keys[~np.isin(keys, visited, assume_unique=True)]
+            visited = np.union1d(visited, keys)
+            owners, frontier = keys // width, keys % width
+            found.append((owners, frontier, np.full(len(keys), hop, dtype=np.int8)))
+        return _grouped(len(sources), found)
+
+    def kHopCounts(self, k, connectionType=None, batchSize=DEFAULT_SOURCE_BATCH):
+        # Size of every user's k-hop neighbourhood, e.g. friend-of-friend counts with k=2.
+        counts = np.zeros(self.nodeCount, dtype=np.int64)
+        for start in range(0, self.nodeCount, batchSize):
+            sources = np.arange(start, min(start + batchSize, self.nodeCount))
+            offsets, _, _ = self.kHop(sources, k, connectionType)
+            counts[sources] = np.diff(offsets)
+        return counts
+
+    def familyOfFamily(self, sources, connectionType="family"):
+        # Distinct nodes two family edges away from each source, the source itself excluded, grouped
+        # as (offsets, nodes); the set form of getFamilyOfFamily for a whole batch at once.
+        graph = self.ofType(connectionType)
+        sources = np.asarray(sources, dtype=np.int64)
+        width = max(self.nodeCount, 1)
+        owners, middle = graph.expand(np.arange(len(sources)), sources)
+        owners, reached = graph.expand(owners, middle)
+        keys = np.unique(owners * width + reached)
+        owners, reached = keys // width, keys % width
+        keep = reached != sources[owners]
+        offsets, nodes = _grouped(len(sources), [(owners[keep], reached[keep])])
+        return offsets, nodes
+
+    def commonNeighbours(self, nodes1, nodes2, connectionType=None):
+        # Shared-neighbour count for each (nodes1[i], nodes2[i]) pair.
+        graph = self.ofType(connectionType)
+        width = max(self.nodeCount, 1)
+        pairs = np.arange(len(nodes1))
+        owners1, neighbours1 = graph.expand(pairs, nodes1)
+        owners2, neighbours2 = graph.expand(pairs, nodes2)
+        shared = np.intersect1d(np.unique(owners1 * width + neighbours1), np.unique(owners2 * width + neighbours2),
+                                assume_unique=True)
+        return np.bincount(shared // width, minlength=len(pairs))
+
+    def iterCommonNeighbourCounts(self, connectionType=None, batchSize=DEFAULT_SOURCE_BATCH, excludeConnected=True):
+        # Yields (sources, candidates, counts) per batch of users: every node two hops from a source and the
+        # number of neighbours they share. Direct neighbours are dropped unless excludeConnected is False.
+        graph = self.ofType(connectionType)
+        width = max(self.nodeCount, 1)
+        for start in range(0, self.nodeCount, batchSize):
+            sources = np.arange(start, min(start + batchSize, self.nodeCount))
+            owners, neighbours = graph.expand(sources - start, sources)
+            direct = np.unique(owners * width + neighbours)
+            owners, reached = graph.expand(direct // width, direct % width)
+            keys, counts = np.unique(owners * width + reached, return_counts=True)
+            owners, candidates = keys // width, keys % width
+            keep = candidates != sources[owners]
+            if excludeConnected:
+                keep &= ~np.isin(keys, direct, assume_unique=True)
+            yield sources[owners[keep]], candidates[keep], counts[keep]
+
+
+def _csr(sources, targets, codes, nodeCount):
+    order = np.lexsort((targets, sources))
+    offsets = np.zeros(nodeCount + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=nodeCount), out=offsets[1:])
+    neighbourType = np.int32 if nodeCount < 2 ** 31 else np.int64
+    return offsets, targets[order].astype(neighbourType), codes[order]
+
+
+def _grouped(count, parts):
+    # Concatenates (owners, *columns) parts and orders them by owner into CSR form.
+    if not parts:
+        return (np.zeros(count + 1, dtype=np.int64),) + tuple(np.zeros(0, dtype=np.int64) for _ in range(2))
+    owners = np.concatenate([part[0] for part in parts])
+    order = np.argsort(owners, kind="stable")
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owners, minlength=count), out=offsets[1:])
+    return (offsets,) + tuple(np.concatenate([part[column] for part in parts])[order]
+                              for column in range(1, len(parts[0])))
+
+
+def labelBits(labels):
+    return sum(bit for label, bit in LABEL_BITS.items() if label in labels)
+
+
+def exportNeo4j(api, directory, fetchSize=None):
+    # Streams users and connections out of Neo4j; only the compact edge arrays are held in memory.
+    sessionConfig = {} if fetchSize is None else {"fetch_size": fetchSize}
+    with api._session(**sessionConfig) as session:
+        users = [(record["userId"], LABEL_BITS["Company"] * record["company"]
+                  + LABEL_BITS["University"] * record["university"]) for record in session.run(USERS_QUERY)]
+        connections = ((record["userId1"], record["userId2"], record["connectionType"])
+                       for record in session.run(CONNECTIONS_QUERY % (api.relationships.connected("connection"),
+                                                                       api.relationships.typeOf("connection"))))
+        snapshot = GraphSnapshot.build(users, connections)
+    snapshot.save(directory)
+    return snapshot
+
+
+def exportInMemory(api, directory):
+    records = api._users
+    users = [(record.userId, labelBits(record.labels)) for record in records if record is not None]
+    connections = ((records[node1].userId, records[node2].userId, api._types[typeCode])
+                   for node1, node2, typeCode in api._edges)
+    snapshot = GraphSnapshot.build(users, connections)
+    snapshot.save(directory)
+    return snapshot
+
+
+def printStats(snapshot, hops):
+    degrees = snapshot.degrees()
+    print(f"users: {snapshot.nodeCount}, connections: {len(snapshot.neighbours) // 2}")
+    if snapshot.nodeCount:
+        print(f"degree p50/p95/p99/max: {np.percentile(degrees, 50):.0f}/{np.percentile(degrees, 95):.0f}/"
+              f"{np.percentile(degrees, 99):.0f}/{degrees.max()}")
+        counts = snapshot.kHopCounts(hops)
+        print(f"{hops}-hop neighbourhood mean/max: {counts.mean():.1f}/{counts.max()}")
+    for connectionType in snapshot.types:
+        print(f"{connectionType}: {int(snapshot.degrees(connectionType).sum()) // 2} connections")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or inspect a CSR snapshot of the connection graph.")
+    parser.add_argument("command", choices=("export", "stats"))
+    parser.add_argument("directory")
+    parser.add_argument("--uri")
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--fetch-size", type=int)
+    parser.add_argument("--relationships", choices=MODELS, default="property", help="how connections are stored")
+    parser.add_argument("--hops", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        if not args.uri:
+            parser.error("export needs --uri")
+        from socialNetworkLegacy import SocialNetworkAPI
+        api = SocialNetworkAPI(args.uri, args.user, args.password,
+                               relationships=RelationshipModel(args.relationships))
+        try:
+            snapshot = exportNeo4j(api, args.directory, args.fetch_size)
+        finally:
+            api.close()
+    else:
+        snapshot = GraphSnapshot.load(args.directory)
+    printStats(snapshot, args.hops)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
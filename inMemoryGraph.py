@@ -0,0 +1,706 @@
+"""
+In-process stand-in for SocialNetworkAPI. Users are interned to integer ids, CONNECTED_TO edges
+live in a lazily rebuilt CSR adjacency and records use __slots__, so neighbour queries never leave
+the process. Used for tests, benchmarks and read-heavy services that do not need a Neo4j server.
+"""
+
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from math import log
+
+from batching import toRows
+from frontierSearch import hopSearch, reachableSearch, runSearch, shortestPathSearch
+from mentions import parseMentions
+from messageIds import newMessageId
+from projections import MessageSummary, PostSummary, UserSummary, checkProjection, shape, shapePairs
+from recommendations import PymkConfig
+from textSearch import DEFAULT_SEARCH_LIMIT, escapeQuery, searchTerms, splitCursor
+from timestamps import checkBucket, toDateTime, truncate
+
+DELETABLE_LABELS = ("User", "Company", "University", "Message", "Post")
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MESSAGE_DEPTH = 3
+
+
+class UserRecord:
+    __slots__ = ("userId", "name", "labels")
+
+    def __init__(self, userId, name, labels):
+        self.userId = userId
+        self.name = name
+        self.labels = labels
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        return f"UserRecord(userId={self.userId!r}, name={self.name!r})"
+
+
+class MessageRecord:
+    __slots__ = ("messageId", "sender", "receiver", "content", "timestamp")
+
+    def __init__(self, messageId, sender, receiver, content, timestamp):
+        self.messageId = messageId
+        self.sender = sender
+        self.receiver = receiver
+        self.content = content
+        self.timestamp = timestamp
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __repr__(self):
+        return f"MessageRecord(messageId={self.messageId!r}, timestamp={self.timestamp!r})"
+
+
+class PostRecord:
+    __slots__ = ("postId", "author", "title", "content", "timestamp", "mentions")
+
+    def __init__(self, postId, author, title, content, timestamp, mentions):
+        self.postId = postId
+        self.author = author
+        self.title = title
+        self.content = content
+        self.timestamp = timestamp
+        self.mentions = mentions
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+def _messageKey(message):
+    return message.messageId
+
+
+def _conversationCursor(after, before, newestFirst):
+    # Same rules as SocialNetworkAPI._conversationCursor.
+    if after is not None and before is not None:
+        raise ValueError("Pass either an after or a before cursor, not both")
+    if after is not None and newestFirst:
+        raise ValueError("An after cursor pages oldest first; pass before with newestFirst=True")
+    descending = newestFirst or before is not None
+    return descending, before if descending else after
+
+
+def _timeKey(message):
+    return message.timestamp, message.messageId
+
+
+class InMemorySocialNetworkAPI:
+    def __init__(self, pymk=None, feed=None):
+        self.pymk = pymk
+        self.feed = feed
+        self._reset()
+
+    def close(self):
+        pass
+
+    def ensureSchema(self, wait=False, timeout=300):
+        return []
+
+    @contextmanager
+    def batch(self, fetchSize=None):
+        # Writes are applied immediately; there is no transaction to roll back.
+        yield self
+
+    def delete(self, batchSize=None, progress=None):
+        deleted = {"relationships": self._relationshipCount(),
+                   "nodes": len(self._index) + len(self._messages) + len(self._posts)}
+        self._reset()
+        return deleted
+
+    def _reset(self):
+        self._index = {}
+        self._users = []
+        self._types = []
+        self._typeCodes = {}
+        self._edges = {}
+        self._dirty = True
+        self._offsets = array("q", [0])
+        self._neighbours = array("q")
+        self._edgeTypes = array("b")
+        self._edgeIds = array("q")
+        self._messages = {}
+        self._timeline = None
+        self._sent = {}
+        self._messaged = {}
+        self._posts = []
+        self._posted = {}
+
+    def _relationshipCount(self):
+        mentioned = {(post.author, mentionedNode) for post in self._posts for mentionedNode in post.mentions}
+        return (len(self._edges) + 2 * len(self._messages) + sum(map(len, self._messaged.values()))
+                + sum(1 + len(post.mentions) for post in self._posts) + len(mentioned))
+
+    def deleteLabel(self, label, batchSize=None, progress=None):
+        if label not in DELETABLE_LABELS:
+            raise ValueError(f"Cannot delete label {label!r}; expected one of {sorted(DELETABLE_LABELS)}")
+        if label == "Message":
+            deleted = {"relationships": 2 * len(self._messages) + sum(map(len, self._messaged.values())),
+                       "nodes": len(self._messages)}
+            self._messages, self._sent, self._messaged = {}, {}, {}
+            self._timeline = None
+            return deleted
+        if label == "Post":
+            before = self._relationshipCount()
+            deleted = {"nodes": len(self._posts)}
+            self._posts, self._posted = [], {}
+            deleted["relationships"] = before - self._relationshipCount()
+            return deleted
+        return self._deleteNodes({node for node, record in enumerate(self._users)
+                                  if record is not None and label in record.labels})
+
+    def deleteUsers(self, userIds, batchSize=None, progress=None):
+        return self._deleteNodes({self._index[userId] for userId in userIds if userId in self._index})
+
+    def deleteUser(self, userId):
+        self._deleteNode(userId, "User")
+
+    def deleteCompany(self, companyId):
+        self._deleteNode(companyId, "Company")
+
+    def deleteUniversity(self, universityId):
+        self._deleteNode(universityId, "University")
+
+    def deleteConnection(self, userId1, userId2):
+        node1, node2 = self._index.get(userId1), self._index.get(userId2)
+        if node1 is None or node2 is None:
+            return
+        for edge in [edge for edge in self._edges if {edge[0], edge[1]} == {node1, node2}]:
+            del self._edges[edge]
+        self._dirty = True
+
+    def deleteMessage(self, messageId):
+        message = self._messages.pop(messageId, None)
+        if message is None:
+            return False
+        self._timeline = None
+        self._sent[message.sender].remove(message)
+        receivers = self._messaged[message.sender]
+        receivers[message.receiver] -= 1
+        if not receivers[message.receiver]:
+            del receivers[message.receiver]
+        return True
+
+    def purgeMessagesBefore(self, timestamp, batchSize=None, progress=None):
+        byTime, _ = self._timelines()
+        expired = [message.messageId for message in byTime[:self._timeIndex(byTime, timestamp)]]
+        for messageId in expired:
+            self.deleteMessage(messageId)
+        if progress is not None and expired:
+            progress("messages", len(expired))
+        return len(expired)
+
+    def backfillMessageIds(self, batchSize=None, progress=None):
+        # Every in-memory message gets its id at creation.
+        return 0
+
+    def backfillPostIds(self, batchSize=None, progress=None):
+        return 0
+
+    def migrateTimestamps(self, batchSize=None, progress=None):
+        # Timestamps are converted to UTC datetimes as they are written.
+        return {"Message": 0, "Post": 0, "MESSAGED": 0, "participants": 0}
+
+    def _deleteNode(self, userId, label):
+        node = self._index.get(userId)
+        if node is None or label not in self._users[node].labels:
+            return
+        self._deleteNodes({node})
+
+    def _deleteNodes(self, nodes):
+        # Detaches a set of user nodes in one pass over the edge and message maps.
+        if not nodes:
+            return {"relationships": 0, "nodes": 0}
+        before = self._relationshipCount()
+        for node in nodes:
+            del self._index[self._users[node].userId]
+            self._users[node] = None
+        self._edges = {edge: None for edge in self._edges if edge[0] not in nodes and edge[1] not in nodes}
+        self._dirty = True
+        self._messages = {
+            messageId: message for messageId, message in self._messages.items()
+            if message.sender not in nodes and message.receiver not in nodes
+        }
+        self._timeline = None
+        self._sent = {sender: [message for message in messages if message.receiver not in nodes]
+                      for sender, messages in self._sent.items() if sender not in nodes}
+        self._messaged = {sender: {receiver: count for receiver, count in receivers.items() if receiver not in nodes}
+                          for sender, receivers in self._messaged.items() if sender not in nodes}
+        for node in nodes:
+            self._posted.pop(node, None)
+        return {"relationships": before - self._relationshipCount(), "nodes": len(nodes)}
+
+    def createUser(self, userId, name):
+        self._mergeNode(userId, name, ("User",))
+
+    def createCompany(self, companyId, name):
+        self._mergeNode(companyId, name, ("User", "Company"))
+
+    def createUniversity(self, universityId, name):
+        self._mergeNode(universityId, name, ("User", "University"))
+
+    def createConnection(self, userId1, userId2, connectionType):
+        self._mergeEdge(userId1, userId2, connectionType)
+
+    def createUsers(self, users, batchSize=None):
+        return self._writeRows(toRows(users, ("userId", "name")),
+                               lambda row: self._mergeNode(row["userId"], row["name"], ("User",)))
+
+    def createCompanies(self, companies, batchSize=None):
+        return self._writeRows(toRows(companies, ("userId", "name")),
+                               lambda row: self._mergeNode(row["userId"], row["name"], ("User", "Company")))
+
+    def createUniversities(self, universities, batchSize=None):
+        return self._writeRows(toRows(universities, ("userId", "name")),
+                               lambda row: self._mergeNode(row["userId"], row["name"], ("User", "University")))
+
+    def createConnections(self, connections, batchSize=None):
+        return self._writeRows(toRows(connections, ("userId1", "userId2", "connectionType")),
+                               lambda row: self._mergeEdge(row["userId1"], row["userId2"], row["connectionType"]))
+
+    @staticmethod
+    def _writeRows(rows, write):
+        counters = {"rows": 0, "created": 0, "merged": 0, "failed": 0, "batch": 0}
+        for row in rows:
+            counters["rows"] += 1
+            outcome = write(row)
+            counters["failed" if outcome is None else "created" if outcome else "merged"] += 1
+        return [counters]
+
+    def _mergeNode(self, userId, name, labels):
+        node = self._index.get(userId)
+        if node is not None:
+            record = self._users[node]
+            record.name = name
+            record.labels = tuple(dict.fromkeys(record.labels + labels))
+            return False
+        self._index[userId] = len(self._users)
+        self._users.append(UserRecord(userId, name, labels))
+        # The CSR must cover every node, so the next read rebuilds it.
+        self._dirty = True
+        return True
+
+    def _mergeEdge(self, userId1, userId2, connectionType):
+        node1, node2 = self._index.get(userId1), self._index.get(userId2)
+        if node1 is None or node2 is None:
+            return None
+        typeCode = self._typeCodes.get(connectionType)
+        if typeCode is None:
+            typeCode = self._typeCodes[connectionType] = len(self._types)
+            self._types.append(connectionType)
+        edge = (node1, node2, typeCode)
+        if edge in self._edges:
+            return False
+        self._edges[edge] = None
+        self._dirty = True
+        return True
+
+    def _adjacency(self):
+        # Undirected CSR view of CONNECTED_TO: each edge is listed under both endpoints.
+        if self._dirty:
+            nodeCount = len(self._users)
+            degrees = [0] * nodeCount
+            for source, target, _ in self._edges:
+                degrees[source] += 1
+                degrees[target] += 1
+            offsets = array("q", [0]) * (nodeCount + 1)
+            for node in range(nodeCount):
+                offsets[node + 1] = offsets[node] + degrees[node]
+            cursor = array("q", offsets[:-1])
+            neighbours = array("q", [0]) * offsets[-1]
+            edgeTypes = array("b", [0]) * offsets[-1]
+            edgeIds = array("q", [0]) * offsets[-1]
+            for edgeId, (source, target, typeCode) in enumerate(self._edges):
+                for node, other in ((source, target), (target, source)):
+                    position = cursor[node]
+                    neighbours[position] = other
+                    edgeTypes[position] = typeCode
+                    edgeIds[position] = edgeId
+                    cursor[node] = position + 1
+            self._offsets, self._neighbours, self._edgeTypes, self._edgeIds = offsets, neighbours, edgeTypes, edgeIds
+            self._dirty = False
+        return self._offsets, self._neighbours, self._edgeTypes, self._edgeIds
+
+    def _neighbourNodes(self, node):
+        offsets, neighbours, _, _ = self._adjacency()
+        return neighbours[offsets[node]:offsets[node + 1]]
+
+    def _projectUsers(self, nodes, projection):
+        if projection is None:
+            return [self._users[node] for node in nodes]
+        return shape([(self._users[node].userId, self._users[node].name) for node in nodes], projection, UserSummary)
+
+    def _projectMessages(self, messages, projection):
+        if projection is None:
+            return messages
+        users = self._users
+        rows = [(message.messageId, users[message.sender].userId, users[message.receiver].userId, message.content,
+                 message.timestamp)
+                for message in messages]
+        return shape(rows, projection, MessageSummary)
+
+    def getFriendsAndFamily(self, userId, projection=None):
+        checkProjection(projection)
+        node = self._index.get(userId)
+        if node is None:
+            return self._projectUsers([], projection)
+        return self._projectUsers(self._neighbourNodes(node), projection)
+
+    def getFamilyOfFamily(self, userId, projection=None):
+        checkProjection(projection)
+        node = self._index.get(userId)
+        family = self._typeCodes.get("family")
+        if node is None or family is None:
+            return self._projectUsers([], projection)
+        offsets, neighbours, edgeTypes, edgeIds = self._adjacency()
+        result = []
+        for first in range(offsets[node], offsets[node + 1]):
+            if edgeTypes[first] != family:
+                continue
+            middle = neighbours[first]
+            for second in range(offsets[middle], offsets[middle + 1]):
+                if edgeTypes[second] == family and edgeIds[second] != edgeIds[first]:
+                    result.append(neighbours[second])
+        return self._projectUsers(result, projection)
+
+    def getFriendsAndFamilyMany(self, userIds, projection=None, batchSize=None):
+        checkProjection(projection)
+        return {userId: self.getFriendsAndFamily(userId, projection) for userId in dict.fromkeys(userIds)}
+
+    def createMessage(self, senderId, receiverId, content, timestamp):
+        return self._addMessage(senderId, receiverId, content, timestamp)
+
+    def createMessages(self, messages, batchSize=None):
+        rows = toRows(messages, ("senderId", "receiverId", "content", "timestamp"))
+        return self._writeRows(rows, lambda row: self._addMessage(
+            row["senderId"], row["receiverId"], row["content"], row["timestamp"], row.get("messageId")))
+
+    def _addMessage(self, senderId, receiverId, content, timestamp, messageId=None):
+        sender, receiver = self._index.get(senderId), self._index.get(receiverId)
+        if sender is None or receiver is None:
+            return None
+        timestamp = toDateTime(timestamp)
+        message = MessageRecord(messageId or newMessageId(timestamp), sender, receiver, content, timestamp)
+        self._messages[message.messageId] = message
+        self._timeline = None
+        self._sent.setdefault(sender, []).append(message)
+        receivers = self._messaged.setdefault(sender, {})
+        receivers[receiver] = receivers.get(receiver, 0) + 1
+        return message.messageId
+
+    def getMessagesAfterDate(self, senderId, receiverId, startDate, projection=None):
+        checkProjection(projection)
+        sender, receiver = self._index.get(senderId), self._index.get(receiverId)
+        startDate = toDateTime(startDate)
+        return self._projectMessages(sorted((message for message in self._sent.get(sender, ())
+                                             if message.receiver == receiver and message.timestamp > startDate),
+                                            key=_messageKey), projection)
+
+    def iterMessagesAfterDate(self, senderId, receiverId, startDate, pageSize=DEFAULT_PAGE_SIZE, projection=None):
+        if checkProjection(projection) == "columns":
+            raise ValueError("iterMessagesAfterDate yields rows; use getMessagesAfterDate for columns")
+        return iter(self.getMessagesAfterDate(senderId, receiverId, startDate, projection))
+
+    def _timelines(self):
+        # Messages by (timestamp, messageId), overall and per participant: the in-process counterpart of the
+        # timestamp range indexes, rebuilt lazily after message writes like the CSR adjacency.
+        if self._timeline is None:
+            byTime = sorted(self._messages.values(), key=_timeKey)
+            byUser = {}
+            for message in byTime:
+                byUser.setdefault(message.sender, []).append(message)
+                if message.receiver != message.sender:
+                    byUser.setdefault(message.receiver, []).append(message)
+            self._timeline = byTime, byUser
+        return self._timeline
+
+    @staticmethod
+    def _timeIndex(messages, timestamp):
+        return bisect_left(messages, (toDateTime(timestamp), ""), key=_timeKey)
+
+    def _window(self, start, end, userId=None):
+        # A bound of None leaves that side of the window open.
+        byTime, byUser = self._timelines()
+        if userId is not None:
+            node = self._index.get(userId)
+            byTime = byUser.get(node, []) if node is not None else []
+        return byTime[None if start is None else self._timeIndex(byTime, start):
+                      None if end is None else self._timeIndex(byTime, end)]
+
+    def getMessagesBetween(self, start, end, userId=None, projection=None):
+        checkProjection(projection)
+        return self._projectMessages(self._window(start, end, userId), projection)
+
+    def getActivityCounts(self, userId, start, end, bucket="day"):
+        checkBucket(bucket)
+        node = self._index.get(userId)
+        counts = {}
+        for message in self._window(start, end, userId):
+            bucketStart = truncate(message.timestamp, bucket)
+            sent, received = counts.get(bucketStart, (0, 0))
+            counts[bucketStart] = (sent + (message.sender == node), received + (message.receiver == node))
+        return [(bucketStart, sent, received) for bucketStart, (sent, received) in sorted(counts.items())]
+
+    def searchMessages(self, userId, text, limit=DEFAULT_SEARCH_LIMIT, start=None, end=None, after=None,
+                       projection=None):
+        # Scored on read by query-term occurrences instead of Lucene relevance; paged by the same (score, key) cursor.
+        escapeQuery(text)
+        checkProjection(projection)
+        terms = set(searchTerms(text))
+        hits = [(self._textScore(terms, message.content), message.messageId, message)
+                for message in self._window(start, end, userId)]
+        users = self._users
+        return self._searchPage(hits, limit, after, projection, MessageSummary,
+                                lambda message: (message.messageId, users[message.sender].userId,
+                                                 users[message.receiver].userId, message.content, message.timestamp))
+
+    @staticmethod
+    def _textScore(terms, *texts):
+        return float(sum(token in terms for text in texts for token in searchTerms(text)))
+
+    @staticmethod
+    def _searchPage(hits, limit, after, projection, recordType, row):
+        afterScore, afterKey = splitCursor(after)
+        hits = sorted(((score, key, item) for score, key, item in hits
+                       if score > 0 and (afterScore is None or score < afterScore
+                                         or (score == afterScore and key > afterKey))),
+                      key=lambda hit: (-hit[0], hit[1]))[:limit]
+        if projection is None:
+            page = [(item, score) for score, _, item in hits]
+        else:
+            page = shapePairs([(row(item), score) for score, _, item in hits], projection, recordType, "score")
+        if len(hits) < limit:
+            return page, None
+        return page, (hits[-1][0], hits[-1][1])
+
+    def getFullConversation(self, userId1, userId2, projection=None):
+        checkProjection(projection)
+        node1, node2 = self._index.get(userId1), self._index.get(userId2)
+        if node1 is None or node2 is None:
+            return self._projectMessages([], projection)
+        return self._projectMessages(
+            sorted([message for message in self._sent.get(node1, ()) if message.receiver == node2]
+                   + [message for message in self._sent.get(node2, ()) if message.receiver == node1], key=_messageKey),
+            projection)
+
+    def getFullConversationMany(self, pairs, projection=None, batchSize=None):
+        checkProjection(projection)
+        return {tuple(pair): self.getFullConversation(*pair, projection) for pair in pairs}
+
+    def getConversationPage(self, userId1, userId2, pageSize=DEFAULT_PAGE_SIZE, after=None, before=None,
+                            newestFirst=False, projection=None):
+        descending, cursor = _conversationCursor(after, before, newestFirst)
+        checkProjection(projection)
+        messages = self.getFullConversation(userId1, userId2)
+        if descending:
+            messages.reverse()
+            if cursor is not None:
+                messages = [message for message in messages if message.messageId < cursor]
+        elif cursor is not None:
+            messages = [message for message in messages if message.messageId > cursor]
+        page = messages[:pageSize]
+        if len(page) < pageSize:
+            return self._projectMessages(page, projection), None
+        return self._projectMessages(page, projection), _messageKey(page[-1])
+
+    def iterConversation(self, userId1, userId2, pageSize=DEFAULT_PAGE_SIZE, after=None, before=None,
+                         newestFirst=False, projection=None):
+        if checkProjection(projection) == "columns":
+            raise ValueError("iterConversation yields rows; use getConversationPage for columns")
+        descending, cursor = _conversationCursor(after, before, newestFirst)
+        while True:
+            if descending:
+                messages, cursor = self.getConversationPage(userId1, userId2, pageSize, before=cursor, newestFirst=True,
+                                                            projection=projection)
+            else:
+                messages, cursor = self.getConversationPage(userId1, userId2, pageSize, after=cursor,
+                                                            projection=projection)
+            yield from messages
+            if cursor is None:
+                return
+
+    def createPost(self, userId, title, content, timestamp):
+        post = self._addPost(userId, title, content, timestamp)
+        return post.postId if post is not None else None
+
+    def createPosts(self, posts, batchSize=None):
+        rows = toRows(posts, ("userId", "title", "content", "timestamp"))
+        return self._writeRows(rows, lambda row: self._addPost(row["userId"], row["title"], row["content"],
+                                                               row["timestamp"], row.get("postId")))
+
+    def _addPost(self, userId, title, content, timestamp, postId=None):
+        node = self._index.get(userId)
+        if node is None:
+            return None
+        mentions = [self._index[mentionedId] for mentionedId in parseMentions(content) if mentionedId in self._index]
+        post = PostRecord(postId or newMessageId(timestamp), userId, title, content, toDateTime(timestamp), mentions)
+        self._posts.append(post)
+        self._posted.setdefault(node, []).append(post)
+        return post
+
+    def searchPosts(self, text, limit=DEFAULT_SEARCH_LIMIT, start=None, end=None, after=None, projection=None):
+        escapeQuery(text)
+        checkProjection(projection)
+        terms = set(searchTerms(text))
+        start = None if start is None else toDateTime(start)
+        end = None if end is None else toDateTime(end)
+        hits = [(self._textScore(terms, post.title, post.content), post.postId, post)
+                for post in self._posts
+                if (start is None or post.timestamp >= start) and (end is None or post.timestamp < end)]
+        return self._searchPage(hits, limit, after, projection, PostSummary,
+                                lambda post: (post.postId, post.author, post.title, post.content, post.timestamp))
+
+    def getFeed(self, userId, pageSize=DEFAULT_PAGE_SIZE, before=None, projection=None):
+        # In process there are no stored timelines: the feed is merged on read from the neighbours' posts.
+        checkProjection(projection)
+        node = self._index.get(userId)
+        posts = [] if node is None else sorted(
+            (post for neighbour in set(self._neighbourNodes(node)) for post in self._posted.get(neighbour, ())
+             if before is None or post.postId < before),
+            key=lambda post: post.postId, reverse=True)
+        page = posts[:pageSize]
+        cursor = page[-1].postId if len(page) == pageSize else None
+        if projection is None:
+            return page, cursor
+        return shape([(post.postId, post.author, post.title, post.content, post.timestamp) for post in page],
+                     projection, PostSummary), cursor
+
+    def iterFeed(self, userId, pageSize=DEFAULT_PAGE_SIZE, before=None, projection=None):
+        if checkProjection(projection) == "columns":
+            raise ValueError("iterFeed yields rows; use getFeed for columns")
+        cursor = before
+        while True:
+            posts, cursor = self.getFeed(userId, pageSize, cursor, projection)
+            yield from posts
+            if cursor is None:
+                return
+
+    def rebuildFeeds(self, batchSize=None, startAfter="", progress=None):
+        return startAfter
+
+    def getUsersMentionedWithWorkRelation(self, userId, projection=None):
+        checkProjection(projection)
+        node = self._index.get(userId)
+        if node is None:
+            return self._projectUsers([], projection)
+        mentioned = dict.fromkeys(mentionedNode for post in self._posted.get(node, ()) for mentionedNode in post.mentions
+                                  if self._users[mentionedNode] is not None)
+        work = self._typeCodes.get("work")
+        offsets, neighbours, edgeTypes, _ = self._adjacency()
+
+        def workNeighbours(member):
+            return {neighbours[position] for position in range(offsets[member], offsets[member + 1])
+                    if edgeTypes[position] == work}
+
+        colleagues = workNeighbours(node)
+        companies = {member for member in colleagues if "Company" in self._users[member].labels}
+        for company in companies:
+            colleagues |= workNeighbours(company)
+        return self._projectUsers([mentionedNode for mentionedNode in mentioned if mentionedNode in colleagues],
+                                  projection)
+
+    def _projectUserPairs(self, pairs, projection, extraField):
+        if projection is None:
+            return [(self._users[node], extra) for node, extra in pairs]
+        rows = [((self._users[node].userId, self._users[node].name), extra) for node, extra in pairs]
+        return shapePairs(rows, projection, UserSummary, extraField)
+
+    def findConnectionsByHops(self, userId, maxHops, maxResults=None, maxFanOut=None, projection=None):
+        checkProjection(projection)
+        start = self._index.get(userId)
+        if start is None:
+            return self._projectUserPairs([], projection, "hops")
+        found = runSearch(hopSearch(start, maxHops, maxResults, maxFanOut),
+                          lambda frontier: self._expandFrontier(frontier, maxFanOut))
+        return self._projectUserPairs(found, projection, "hops")
+
+    def shortestConnection(self, userId1, userId2, maxHops=None, maxFanOut=None):
+        node1, node2 = self._index.get(userId1), self._index.get(userId2)
+        if node1 is None or node2 is None:
+            return None
+        path = runSearch(shortestPathSearch(node1, node2, maxHops, maxFanOut),
+                         lambda frontier: self._expandFrontier(frontier, maxFanOut))
+        return None if path is None else [self._users[node].userId for node in path]
+
+    def _expandFrontier(self, frontier, maxFanOut=None):
+        offsets, neighbours, _, _ = self._adjacency()
+        return [(node, neighbours[position]) for node in frontier
+                for position in range(offsets[node], offsets[node + 1] if maxFanOut is None
+                                      else min(offsets[node + 1], offsets[node] + maxFanOut))]
+
+    def findConnectionsByMessages(self, userId, minMessages, maxDepth=DEFAULT_MESSAGE_DEPTH, maxFanOut=None,
+                                  projection=None):
+        checkProjection(projection)
+        start = self._index.get(userId)
+        if start is None:
+            return self._projectUserPairs([], projection, "messageCount")
+        reachable = runSearch(reachableSearch(start, maxDepth, maxFanOut),
+                              lambda frontier: self._expandFrontier(frontier, maxFanOut))
+        direct = set(self._neighbourNodes(start))
+        senders = {}
+        for sender in reachable:
+            for receiver in self._messaged.get(sender, ()):
+                if receiver != start and receiver not in direct:
+                    senders[receiver] = senders.get(receiver, 0) + 1
+        counts = [(receiver, count) for receiver, count in senders.items() if count >= minMessages]
+        return self._projectUserPairs(sorted(counts, key=lambda item: item[1], reverse=True), projection, "messageCount")
+
+    def backfillMessagedEdges(self, batchSize=None, startAfter="", progress=None):
+        return startAfter
+
+    def getPeopleYouMayKnow(self, userId, limit=None, projection=None):
+        # In process the scores are computed on read from the CSR adjacency instead of being stored.
+        checkProjection(projection)
+        node = self._index.get(userId)
+        config = self.pymk or PymkConfig()
+        scores = self._scorePeopleYouMayKnow(node, config) if node is not None else {}
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self._users[item[0]].userId))[:config.topK]
+        return self._projectUserPairs(ranked[:limit], projection, "score")
+
+    def refreshPeopleYouMayKnow(self, userIds, batchSize=None):
+        return 0
+
+    def rebuildPeopleYouMayKnow(self, batchSize=None, startAfter="", progress=None):
+        return startAfter
+
+    def _isPerson(self, node):
+        labels = self._users[node].labels
+        return "Company" not in labels and "University" not in labels
+
+    def _scorePeopleYouMayKnow(self, node, config):
+        if not self._isPerson(node):
+            return {}
+        offsets, neighbours, _, _ = self._adjacency()
+        direct = set(neighbours[offsets[node]:offsets[node + 1]])
+        scores = {}
+        for middle in direct:
+            degree = offsets[middle + 1] - offsets[middle]
+            if degree < 2:
+                # Only the user is on the far side, and log(1) = 0 would be the Adamic-Adar denominator.
+                continue
+            weight = 1.0 / log(degree) if config.scoring == "adamicAdar" else 1.0
+            for candidate in set(neighbours[offsets[middle]:offsets[middle + 1]]):
+                if candidate != node and candidate not in direct and self._isPerson(candidate):
+                    scores[candidate] = scores.get(candidate, 0.0) + weight
+        if config.messageWeight > 0:
+            messages = dict(self._messaged.get(node, {}))
+            for sender, receivers in self._messaged.items():
+                if node in receivers and sender != node:
+                    messages[sender] = messages.get(sender, 0) + receivers[node]
+            for candidate, count in messages.items():
+                if candidate != node and candidate not in direct and self._isPerson(candidate):
+                    scores[candidate] = scores.get(candidate, 0.0) + config.messageWeight * log(1 + count)
+        return scores
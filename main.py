@@ -5,7 +5,7 @@ if __name__ == "__main__":
     username = "neo4j"
     password = "123"
 
-    api = SocialNetworkAPI(uri, username, password)
+    api = SocialNetworkAPI(uri, username, password, ensureSchema=True)
 
     try:
         api.delete()
@@ -78,31 +78,31 @@ if __name__ == "__main__":
         api.createMessages(messages)
 
         # Fetch and print friends and family of user1
-        friendsAndFamilyUser1 = api.getFriendsAndFamily("user1")
+        friendsAndFamilyUser1 = api.getFriendsAndFamily("user1", projection="record")
         print("Friends and family of user1:")
-        print("\n".join(friendsAndFamilyUser1))
+        print("\n".join(map(str, friendsAndFamilyUser1)))
 
         print('\n')
 
         # Fetch and print family of friends of user1
-        familyOfFriendsUser1 = api.getFamilyOfFamily("user1")
+        familyOfFriendsUser1 = api.getFamilyOfFamily("user1", projection="record")
         print("Family of friends of user1:")
-        print("\n".join(familyOfFriendsUser1))
+        print("\n".join(map(str, familyOfFriendsUser1)))
 
         print('\n')
 
         # Fetch and print messages after a specific date
-        messagesAfterDateUser1User2 = api.getMessagesAfterDate(senderId='user1', receiverId='user2', startDate='2023-01-01T00:00:00')
+        messagesAfterDateUser1User2 = api.getMessagesAfterDate(senderId='user1', receiverId='user2', startDate='2023-01-01T00:00:00', projection="record")
         print("Messages after the specified date between user1 and user2:")
-        print("\n".join(messagesAfterDateUser1User2))
+        print("\n".join(map(str, messagesAfterDateUser1User2)))
 
         print('\n')
 
         # Fetch and print full conversation between two users
-        fullConversationUser1User2 = api.getFullConversation(userId1='user1', userId2='user2')
+        fullConversationUser1User2 = api.getFullConversation(userId1='user1', userId2='user2', projection="record")
         if fullConversationUser1User2:
             print("Full conversation between user1 and user2:")
-            print("\n".join(fullConversationUser1User2))
+            print("\n".join(map(str, fullConversationUser1User2)))
         else:
             print("Conversation not found between user1 and user2.")
 
@@ -112,14 +112,14 @@ if __name__ == "__main__":
         api.createPost(userId='user1', title='Hello World', content='Excited to connect with everyone! @user2 @user3', timestamp='2023-01-02T15:30:00')
 
         # Fetch and print users mentioned with work relation
-        mentionedUsersUser1 = api.getUsersMentionedWithWorkRelation(userId='user1')
+        mentionedUsersUser1 = api.getUsersMentionedWithWorkRelation(userId='user1', projection="record")
         print("Users mentioned with work relation by user1:")
-        print("\n".join(mentionedUsersUser1))
+        print("\n".join(map(str, mentionedUsersUser1)))
 
         print('\n')
 
         # Fetch and print new connections by hops
-        connectionsByHopsUser1 = api.findConnectionsByHops(userId='user1', maxHops=3)
+        connectionsByHopsUser1 = api.findConnectionsByHops(userId='user1', maxHops=3, projection="record")
         print("New connections by hops from user1:")
         for user, hops in connectionsByHopsUser1:
             print(f"User: {user}, Number of Hops: {hops}")
@@ -127,7 +127,7 @@ if __name__ == "__main__":
         print('\n')
 
         # Fetch and print new connections by messages
-        connectionsByMessagesUser1 = api.findConnectionsByMessages(userId='user1', minMessages=2)
+        connectionsByMessagesUser1 = api.findConnectionsByMessages(userId='user1', minMessages=2, projection="record")
         print("New connections by messages from user1:")
         for user, messageCount in connectionsByMessagesUser1:
             print(f"User: {user}, Number of Messages: {messageCount}")
@@ -0,0 +1,8 @@
+import re
+
+# "@user2," and "@user2." both mention user2; dots are only kept inside an id.
+MENTION_PATTERN = re.compile(r"(?<![\w@])@([\w-]+(?:\.[\w-]+)*)")
+
+
+def parseMentions(content):
+    return list(dict.fromkeys(MENTION_PATTERN.findall(content or "")))
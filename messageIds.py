@@ -0,0 +1,49 @@
+"""
+ULID message ids: 48 bits of milliseconds since the epoch followed by 80 random bits, written as
+26 Crockford base32 characters. The time part is taken from the message timestamp, so ids sort in
+message order and can serve as the pagination key on their own.
+"""
+
+import os
+import threading
+from datetime import datetime, timezone
+
+from timestamps import toDateTime
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last = [None, 0]
+
+
+def timestampMillis(timestamp=None):
+    value = datetime.now(timezone.utc) if timestamp is None else toDateTime(timestamp)
+    return int(value.timestamp() * 1000)
+
+
+def newMessageId(timestamp=None):
+    millis = timestampMillis(timestamp)
+    with _lock:
+        # Monotonic within a millisecond: ids minted for the same instant keep their creation order.
+        if _last[0] == millis and _last[1] < (1 << RANDOM_BITS) - 1:
+            randomPart = _last[1] + 1
+        else:
+            randomPart = int.from_bytes(os.urandom(RANDOM_BITS // 8), "big")
+        _last[0], _last[1] = millis, randomPart
+    return encode((millis << RANDOM_BITS) | randomPart)
+
+
+def encode(value):
+    characters = []
+    for _ in range(26):
+        characters.append(ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(characters))
+
+
+def messageIdMillis(messageId):
+    value = 0
+    for character in messageId[:10]:
+        value = (value << 5) | ALPHABET.index(character)
+    return value
@@ -0,0 +1,223 @@
+"""
+Pluggable instrumentation for SocialNetworkAPI. A hook receives the wall-clock latency of every
+public method, the ResultSummary of every query it ran (server timings and update counters), the
+errors it swallowed and, in PROFILE sampling mode, the query plans of 1-in-N calls.
+"""
+
+import functools
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_currentMethod = ContextVar("currentMethod", default=None)
+
+SUMMARY_COUNTERS = (
+    "nodes_created", "nodes_deleted", "relationships_created", "relationships_deleted",
+    "properties_set", "labels_added", "labels_removed", "indexes_added", "constraints_added",
+)
+
+# Schema and admin statements cannot be prefixed with PROFILE.
+_UNPROFILABLE = ("CREATE CONSTRAINT", "CREATE INDEX", "CREATE FULLTEXT", "CREATE RANGE", "DROP ", "SHOW ", "CALL DB.")
+
+
+def currentMethod():
+    return _currentMethod.get()
+
+
+@contextmanager
+def measure(hook, method):
+    token = _currentMethod.set(method)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        hook.observeLatency(method, time.perf_counter() - start)
+        _currentMethod.reset(token)
+
+
+def instrumented(function):
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics is None or _currentMethod.get() is not None:
+            return function(self, *args, **kwargs)
+        with measure(self.metrics, function.__name__):
+            return function(self, *args, **kwargs)
+    return wrapper
+
+
+class MetricsHook:
+    def observeLatency(self, method, seconds):
+        pass
+
+    def observeSummary(self, method, summary):
+        pass
+
+    def observeError(self, method, error):
+        pass
+
+    def observeProfile(self, method, query, profile):
+        pass
+
+    def shouldProfile(self, method):
+        return False
+
+
+class LatencyHistogram:
+    # Log-scale buckets from 0.1 ms doubling up to ~52 s, plus an overflow bucket.
+    BOUNDS = tuple(0.0001 * 2 ** exponent for exponent in range(20))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(self.BOUNDS) and seconds > self.BOUNDS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank.
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, bucketCount in enumerate(self.counts):
+            seen += bucketCount
+            if seen >= rank:
+                return min(self.BOUNDS[index], self.max) if index < len(self.BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class InMemoryMetrics(MetricsHook):
+    def __init__(self, profileEvery=0, maxProfiles=100):
+        self.profileEvery = profileEvery
+        self.latency = {}
+        self.serverAvailable = {}
+        self.serverConsumed = {}
+        self.counters = {}
+        self.errors = {}
+        self.calls = {}
+        self.profiles = deque(maxlen=maxProfiles)
+
+    def observeLatency(self, method, seconds):
+        self.latency.setdefault(method, LatencyHistogram()).observe(seconds)
+
+    def observeSummary(self, method, summary):
+        if summary.result_available_after is not None:
+            self.serverAvailable.setdefault(method, LatencyHistogram()).observe(summary.result_available_after / 1000)
+        if summary.result_consumed_after is not None:
+            self.serverConsumed.setdefault(method, LatencyHistogram()).observe(summary.result_consumed_after / 1000)
+        counters = self.counters.setdefault(method, dict.fromkeys(SUMMARY_COUNTERS, 0))
+        for name in SUMMARY_COUNTERS:
+            counters[name] += getattr(summary.counters, name, 0)
+
+    def observeError(self, method, error):
+        errors = self.errors.setdefault(method, {})
+        errors[type(error).__name__] = errors.get(type(error).__name__, 0) + 1
+
+    def observeProfile(self, method, query, profile):
+        self.profiles.append({"method": method, "query": query, "profile": profile})
+
+    def shouldProfile(self, method):
+        # PROFILE sampling: one call in every profileEvery per method.
+        if not self.profileEvery:
+            return False
+        self.calls[method] = self.calls.get(method, 0) + 1
+        return self.calls[method] % self.profileEvery == 0
+
+    def snapshot(self):
+        return {
+            method: {
+                "latency": histogram.snapshot(),
+                "serverAvailable": self.serverAvailable[method].snapshot() if method in self.serverAvailable else None,
+                "serverConsumed": self.serverConsumed[method].snapshot() if method in self.serverConsumed else None,
+                "counters": self.counters.get(method, {}),
+                "errors": self.errors.get(method, {}),
+            }
+            for method, histogram in self.latency.items()
+        }
+
+
+class InstrumentedTransaction:
+    # Wraps a driver transaction, remembers every result it produced and reports their summaries.
+    def __init__(self, tx, hook, profile=False):
+        self._tx = tx
+        self._hook = hook
+        self._profile = profile
+        self._results = []
+
+    def run(self, query, parameters=None, **kwargs):
+        if self._profile and not query.lstrip().upper().startswith(_UNPROFILABLE):
+            query = "PROFILE " + query
+        result = self._tx.run(query, parameters, **kwargs)
+        self._results.append((currentMethod() or "unknown", query, result))
+        return result
+
+    def report(self):
+        results, self._results = self._results, []
+        for method, query, result in results:
+            summary = result.consume()
+            self._hook.observeSummary(method, summary)
+            if summary.profile is not None:
+                self._hook.observeProfile(method, query, summary.profile)
+
+    def commit(self):
+        self.report()
+        return self._tx.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._tx, name)
+
+
+class InstrumentedSession:
+    def __init__(self, session, hook):
+        self._session = session
+        self._hook = hook
+
+    def __enter__(self):
+        self._session.__enter__()
+        return self
+
+    def __exit__(self, *excInfo):
+        return self._session.__exit__(*excInfo)
+
+    def execute_read(self, txFunction, *args, **kwargs):
+        return self._session.execute_read(self._wrap(txFunction), *args, **kwargs)
+
+    def execute_write(self, txFunction, *args, **kwargs):
+        return self._session.execute_write(self._wrap(txFunction), *args, **kwargs)
+
+    def begin_transaction(self, *args, **kwargs):
+        profile = self._hook.shouldProfile(currentMethod() or "batch")
+        return InstrumentedTransaction(self._session.begin_transaction(*args, **kwargs), self._hook, profile)
+
+    def _wrap(self, txFunction):
+        profile = self._hook.shouldProfile(currentMethod() or "unknown")
+
+        def wrapped(tx, *args, **kwargs):
+            instrumentedTx = InstrumentedTransaction(tx, self._hook, profile)
+            value = txFunction(instrumentedTx, *args, **kwargs)
+            instrumentedTx.report()
+            return value
+
+        return wrapped
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class NeighbourhoodCache:
+    # Bounded LRU with a per-entry TTL. Every entry records two dependency sets:
+    # the users whose incident edges shape the result (edge dependencies) and every
+    # user that appears in it (node dependencies), so writes can drop exactly the
+    # entries they affect. Every public method holds the lock: the write-behind writer
+    # and bulk import workers invalidate from their own threads while callers read.
+    def __init__(self, maxSize=10000, ttl=60.0, clock=time.monotonic):
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._edgeDependents = {}
+        self._nodeDependents = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            if entry[0] <= self.clock():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, edgeDependencies, nodeDependencies, connectionTypes=None):
+        # connectionTypes limits which new or deleted edge types can change the entry (None means any).
+        edgeDependencies = frozenset(edgeDependencies)
+        nodeDependencies = frozenset(nodeDependencies) | edgeDependencies
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self.clock() + self.ttl, value, edgeDependencies, nodeDependencies, connectionTypes)
+            for userId in edgeDependencies:
+                self._edgeDependents.setdefault(userId, set()).add(key)
+            for userId in nodeDependencies:
+                self._nodeDependents.setdefault(userId, set()).add(key)
+            while len(self._entries) > self.maxSize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidateConnection(self, userId1, userId2, connectionType=None):
+        with self._lock:
+            for userId in (userId1, userId2):
+                for key in list(self._edgeDependents.get(userId, ())):
+                    connectionTypes = self._entries[key][4]
+                    if connectionType is None or connectionTypes is None or connectionType in connectionTypes:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def invalidateUser(self, userId):
+        with self._lock:
+            for key in list(self._nodeDependents.get(userId, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._edgeDependents.clear()
+            self._nodeDependents.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxSize": self.maxSize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        # Callers hold the lock.
+        _, _, edgeDependencies, nodeDependencies, _ = self._entries.pop(key)
+        for dependents, userIds in ((self._edgeDependents, edgeDependencies), (self._nodeDependents, nodeDependencies)):
+            for userId in userIds:
+                keys = dependents.get(userId)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del dependents[userId]
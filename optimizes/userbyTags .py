@@ -1,10 +1,32 @@
+import re
+from itertools import islice
+
 from neo4j import GraphDatabase
 
 """
 This code optimizes the social network API by incorporating tags to categorize users by interests and attributes. 
 It uses Neo4j to enhance search and organization, streamlining user, connection, and message management.
+Tags are stored as indexed (:Tag {name}) nodes linked by TAGGED relationships, so every tag query is a
+constant, parameterised Cypher statement, and each Tag keeps a userCount for cheap counts.
 """
 
+TAG_SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT user_userId IF NOT EXISTS FOR (u:User) REQUIRE u.userId IS UNIQUE",
+    "CREATE CONSTRAINT tag_name IF NOT EXISTS FOR (t:Tag) REQUIRE t.name IS UNIQUE",
+]
+
+# Only used to migrate legacy label tags, where the tag has to be spliced into the query text.
+LABEL_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+RESERVED_LABELS = {"User", "Company", "University", "Message", "Post", "Tag"}
+
+
+def validateTags(tags):
+    tags = [tag.strip() if isinstance(tag, str) else tag for tag in (tags or [])]
+    for tag in tags:
+        if not isinstance(tag, str) or not tag:
+            raise ValueError(f"Invalid tag: {tag!r}")
+    return list(dict.fromkeys(tags))
+
 class SocialNetworkAPI:
     def __init__(self, uri, user, password):
         try:
@@ -18,6 +40,18 @@ class SocialNetworkAPI:
         except Exception as e:
             print(f"Error closing the database connection: {e}")
     
+    def ensureSchema(self):
+        with self.driver.session() as session:
+            try:
+                for statement in TAG_SCHEMA_STATEMENTS:
+                    session.execute_write(self._runSchemaStatement, statement)
+            except Exception as e:
+                print(f"Error creating the tag schema: {e}")
+
+    @staticmethod
+    def _runSchemaStatement(tx, statement):
+        tx.run(statement).consume()
+
     def deleteAll(self):
         with self.driver.session() as session:
             try:
@@ -67,17 +101,41 @@ class SocialNetworkAPI:
 
     @staticmethod
     def _deleteUser(tx, userId):
-        query = "MATCH (u:User {userId: $userId}) DETACH DELETE u"
+        query = (
+            """
+            MATCH (u:User {userId: $userId})
+            OPTIONAL MATCH (u)-[:TAGGED]->(t:Tag)
+            SET t.userCount = t.userCount - 1
+            WITH DISTINCT u
+            DETACH DELETE u
+            """
+        )
         tx.run(query, userId=userId)
 
     @staticmethod
     def _deleteCompany(tx, userId):
-        query = "MATCH (u:User:Company {userId: $userId}) DETACH DELETE u"
+        query = (
+            """
+            MATCH (u:User:Company {userId: $userId})
+            OPTIONAL MATCH (u)-[:TAGGED]->(t:Tag)
+            SET t.userCount = t.userCount - 1
+            WITH DISTINCT u
+            DETACH DELETE u
+            """
+        )
         tx.run(query, userId=userId)
 
     @staticmethod
     def _deleteUniversity(tx, userId):
-        query = "MATCH (u:User:University {userId: $userId}) DETACH DELETE u"
+        query = (
+            """
+            MATCH (u:User:University {userId: $userId})
+            OPTIONAL MATCH (u)-[:TAGGED]->(t:Tag)
+            SET t.userCount = t.userCount - 1
+            WITH DISTINCT u
+            DETACH DELETE u
+            """
+        )
         tx.run(query, userId=userId)
 
     @staticmethod
@@ -100,6 +158,7 @@ class SocialNetworkAPI:
         tx.run(query, messageId=messageId)
     
     def createUser(self, userId, name, tags=None):
+        tags = validateTags(tags)
         with self.driver.session() as session:
             try:
                 session.execute_write(self._createUser, userId, name, tags)
@@ -144,10 +203,9 @@ class SocialNetworkAPI:
     @staticmethod
     def _createUser(tx, userId, name, tags):
         query = "MERGE (u:User {userId: $userId, name: $name})"
-        if tags:
-            for tag in tags:
-                query += f" SET u:{tag}"
         tx.run(query, userId=userId, name=name)
+        if tags:
+            SocialNetworkAPI._addTagsToUser(tx, userId, tags)
 
     @staticmethod
     def _createCompany(tx, userId, name):
@@ -250,13 +308,27 @@ class SocialNetworkAPI:
         return [record["message"] for record in result]
 
     def getUsersByTag(self, tag):
+        return self.getUsersByTags(all=[tag])
+
+    def getUsersByTags(self, all=None, any=None, none=None):
+        allTags, anyTags, noneTags = validateTags(all), validateTags(any), validateTags(none)
+        if not allTags and not anyTags:
+            raise ValueError("getUsersByTags needs at least one 'all' or 'any' tag")
         with self.driver.session() as session:
             try:
-                return session.execute_read(self._getUsersByTag, tag)
+                return session.execute_read(self._getUsersByTags, allTags, anyTags, noneTags)
             except Exception as e:
-                print(f"Error retrieving users by tag: {e}")
+                print(f"Error retrieving users by tags: {e}")
+
+    def getTagCounts(self, tags=None):
+        with self.driver.session() as session:
+            try:
+                return session.execute_read(self._getTagCounts, None if tags is None else validateTags(tags))
+            except Exception as e:
+                print(f"Error retrieving tag counts: {e}")
 
     def addTagsToUser(self, userId, tags):
+        tags = validateTags(tags)
         with self.driver.session() as session:
             try:
                 session.execute_write(self._addTagsToUser, userId, tags)
@@ -264,28 +336,136 @@ class SocialNetworkAPI:
                 print(f"Error adding tags to user: {e}")
 
     def removeTagsFromUser(self, userId, tags):
+        tags = validateTags(tags)
         with self.driver.session() as session:
             try:
                 session.execute_write(self._removeTagsFromUser, userId, tags)
             except Exception as e:
                 print(f"Error removing tags from user: {e}")
 
+    def bulkTagUsers(self, assignments, batchSize=1000):
+        # assignments: {userId: [tags]} or an iterable of (userId, tags) pairs.
+        if isinstance(assignments, dict):
+            assignments = assignments.items()
+        rows = ({"userId": userId, "tags": validateTags(tags)} for userId, tags in assignments)
+        tagged = 0
+        with self.driver.session() as session:
+            while True:
+                batch = list(islice(rows, batchSize))
+                if not batch:
+                    return tagged
+                try:
+                    tagged += session.execute_write(self._bulkTagUsers, batch)
+                except Exception as e:
+                    print(f"Error tagging users: {e}")
+
+    def migrateLabelTags(self, tags):
+        # Converts tags stored by older versions as dynamic labels into Tag nodes.
+        with self.driver.session() as session:
+            for tag in validateTags(tags):
+                if not LABEL_PATTERN.match(tag) or tag in RESERVED_LABELS:
+                    raise ValueError(f"Not a migratable tag label: {tag!r}")
+                try:
+                    session.execute_write(self._migrateLabelTag, tag)
+                except Exception as e:
+                    print(f"Error migrating tag label {tag}: {e}")
+
     @staticmethod
-    def _getUsersByTag(tx, tag):
-        query = "MATCH (u:User) WHERE u:%s RETURN u" % tag
-        result = tx.run(query)
+    def _getUsersByTags(tx, allTags, anyTags, noneTags):
+        counts = dict(SocialNetworkAPI._getTagCounts(tx, allTags))
+        if any(not counts.get(tag) for tag in allTags):
+            return []
+        if allTags:
+            # Start from the rarest required tag and check the rest in ascending cardinality.
+            ordered = sorted(allTags, key=counts.get)
+            query = (
+                """
+                MATCH (:Tag {name: $seed})<-[:TAGGED]-(u:User)
+                WHERE all(tagName IN $rest WHERE EXISTS { MATCH (u)-[:TAGGED]->(:Tag {name: tagName}) })
+                AND (size($any) = 0 OR EXISTS { MATCH (u)-[:TAGGED]->(t:Tag) WHERE t.name IN $any })
+                AND NOT EXISTS { MATCH (u)-[:TAGGED]->(t:Tag) WHERE t.name IN $none }
+                RETURN u
+                """
+            )
+            result = tx.run(query, seed=ordered[0], rest=ordered[1:], any=anyTags, none=noneTags)
+        else:
+            query = (
+                """
+                MATCH (t:Tag)<-[:TAGGED]-(u:User)
+                WHERE t.name IN $any
+                WITH DISTINCT u
+                WHERE NOT EXISTS { MATCH (u)-[:TAGGED]->(n:Tag) WHERE n.name IN $none }
+                RETURN u
+                """
+            )
+            result = tx.run(query, any=anyTags, none=noneTags)
         return [record["u"] for record in result]
 
+    @staticmethod
+    def _getTagCounts(tx, tags):
+        query = (
+            """
+            MATCH (t:Tag)
+            WHERE $tags IS NULL OR t.name IN $tags
+            RETURN t.name AS name, t.userCount AS userCount
+            ORDER BY userCount DESC
+            """
+        )
+        result = tx.run(query, tags=tags)
+        return [(record["name"], record["userCount"]) for record in result]
+
     @staticmethod
     def _addTagsToUser(tx, userId, tags):
-        query = "MATCH (u:User {userId: $userId})"
-        for tag in tags:
-            query += f" SET u:{tag}"
-        tx.run(query, userId=userId)
+        query = (
+            """
+            MATCH (u:User {userId: $userId})
+            UNWIND $tags AS tagName
+            MERGE (t:Tag {name: tagName})
+            ON CREATE SET t.userCount = 0
+            MERGE (u)-[:TAGGED]->(t)
+            ON CREATE SET t.userCount = t.userCount + 1
+            """
+        )
+        tx.run(query, userId=userId, tags=tags)
 
     @staticmethod
     def _removeTagsFromUser(tx, userId, tags):
-        query = "MATCH (u:User {userId: $userId})"
-        for tag in tags:
-            query += f" REMOVE u:{tag}"
-        tx.run(query, userId=userId)
+        query = (
+            """
+            MATCH (u:User {userId: $userId})-[tagged:TAGGED]->(t:Tag)
+            WHERE t.name IN $tags
+            DELETE tagged
+            SET t.userCount = t.userCount - 1
+            """
+        )
+        tx.run(query, userId=userId, tags=tags)
+
+    @staticmethod
+    def _bulkTagUsers(tx, rows):
+        query = (
+            """
+            UNWIND $rows AS row
+            MATCH (u:User {userId: row.userId})
+            UNWIND row.tags AS tagName
+            MERGE (t:Tag {name: tagName})
+            ON CREATE SET t.userCount = 0
+            MERGE (u)-[:TAGGED]->(t)
+            ON CREATE SET t.userCount = t.userCount + 1
+            """
+        )
+        return tx.run(query, rows=rows).consume().counters.relationships_created
+
+    @staticmethod
+    def _migrateLabelTag(tx, tag):
+        query = (
+            """
+            MATCH (u:User:`%s`)
+            MERGE (t:Tag {name: $tag})
+            ON CREATE SET t.userCount = 0
+            MERGE (u)-[:TAGGED]->(t)
+            ON CREATE SET t.userCount = t.userCount + 1
+            REMOVE u:`%s`
+            """
+            % (tag, tag)
+        )
+        tx.run(query, tag=tag)
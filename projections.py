@@ -0,0 +1,102 @@
+"""
+Lightweight result shapes for the hot read methods. With projection=None a read returns driver
+Nodes as before; otherwise the Cypher returns only the listed fields and each row is decoded as
+"record" (a __slots__ dataclass), "tuple" (a plain tuple in field order) or "columns" (one list per
+field, for bulk consumers).
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+PROJECTIONS = (None, "record", "tuple", "columns")
+
+
+@dataclass(frozen=True, slots=True)
+class UserSummary:
+    userId: str
+    name: str
+
+    def __str__(self):
+        return self.name if self.name is not None else self.userId
+
+
+@dataclass(frozen=True, slots=True)
+class MessageSummary:
+    messageId: str
+    senderId: str
+    receiverId: str
+    content: str
+    timestamp: datetime
+
+    def __str__(self):
+        return f"[{self.timestamp}] {self.senderId} -> {self.receiverId}: {self.content}"
+
+
+@dataclass(frozen=True, slots=True)
+class PostSummary:
+    postId: str
+    userId: str
+    title: str
+    content: str
+    timestamp: datetime
+
+    def __str__(self):
+        return f"[{self.timestamp}] {self.userId}: {self.title}"
+
+
+def checkProjection(projection):
+    if projection not in PROJECTIONS:
+        raise ValueError(f"Unknown projection {projection!r}, expected one of {PROJECTIONS}")
+    return projection
+
+
+def userFields(variable):
+    return f"{variable}.userId AS userId, {variable}.name AS name"
+
+
+def messageFields(variable, senderId, receiverId):
+    return (f"{variable}.messageId AS messageId, {senderId} AS senderId, {receiverId} AS receiverId, "
+            f"{variable}.content AS content, {variable}.timestamp AS timestamp")
+
+
+def postFields(variable, userId):
+    return (f"{variable}.postId AS postId, {userId} AS userId, {variable}.title AS title, "
+            f"{variable}.content AS content, {variable}.timestamp AS timestamp")
+
+
+def shape(rows, projection, recordType):
+    # rows are tuples in the field order of recordType.
+    if projection == "tuple":
+        return rows
+    if projection == "record":
+        return [recordType(*row) for row in rows]
+    return {field: [row[index] for row in rows] for index, field in enumerate(recordType.__slots__)}
+
+
+def shapePairs(pairs, projection, recordType, extraField):
+    # For (row, extra) results such as (user, hops): the extra value becomes one more column.
+    if projection == "tuple":
+        return [(row, extra) for row, extra in pairs]
+    if projection == "record":
+        return [(recordType(*row), extra) for row, extra in pairs]
+    columns = shape([row for row, _ in pairs], projection, recordType)
+    columns[extraField] = [extra for _, extra in pairs]
+    return columns
+
+
+def fieldValues(result, projection, recordType, field):
+    # Reads one field back out of a shaped (or unprojected) result.
+    if projection == "columns":
+        return result[field]
+    if projection == "tuple":
+        index = recordType.__slots__.index(field)
+        return [row[index] for row in result]
+    if projection == "record":
+        return [getattr(row, field) for row in result]
+    return [row[field] for row in result]
+
+
+def copyResult(result):
+    if isinstance(result, dict):
+        return {field: list(values) for field, values in result.items()}
+    return list(result)
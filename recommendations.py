@@ -0,0 +1,26 @@
+"""
+"People you may know" settings. Candidates are the people two CONNECTED_TO hops away that the user
+is not connected to yet, scored by common neighbours or by Adamic-Adar (each shared neighbour weighs
+1 / log(its degree), so a shared employer with thousands of staff counts for little). With
+messageWeight > 0, people the user exchanged messages with are also candidates and every candidate
+gains messageWeight * log(1 + messages exchanged). Each user's top-K is stored on the User node as
+the parallel lists pymkIds / pymkScores and refreshed only for the users a connection write affects.
+"""
+
+from dataclasses import dataclass
+
+SCORINGS = ("commonNeighbours", "adamicAdar")
+DEFAULT_TOP_K = 20
+
+
+@dataclass(frozen=True, slots=True)
+class PymkConfig:
+    topK: int = DEFAULT_TOP_K
+    scoring: str = "commonNeighbours"
+    messageWeight: float = 0.0
+
+    def __post_init__(self):
+        if self.scoring not in SCORINGS:
+            raise ValueError(f"Unknown scoring {self.scoring!r}, expected one of {SCORINGS}")
+        if self.topK < 1:
+            raise ValueError("topK must be at least 1")
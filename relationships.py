@@ -0,0 +1,67 @@
+"""
+How connections are stored. The "property" model is the original one: every connection is a
+CONNECTED_TO relationship with a type property, so a query that wants only family edges still loads and
+filters every relationship of every node it touches, company and university hubs included. In the
+"typed" model the connection type is the relationship type (FRIEND, FAMILY, WORK, ACADEMIC) and the store
+follows only the relationship chains a query names. Queries build their connection patterns through a
+RelationshipModel, so the API answers the same way on either model; migrateRelationships converts the
+stored edges from one model to the other.
+"""
+
+from dataclasses import dataclass
+
+MODELS = ("property", "typed")
+LEGACY_TYPE = "CONNECTED_TO"
+CONNECTION_TYPES = {"friend": "FRIEND", "family": "FAMILY", "work": "WORK", "academic": "ACADEMIC"}
+
+
+@dataclass(frozen=True, slots=True)
+class RelationshipModel:
+    mode: str = "property"
+
+    def __post_init__(self):
+        if self.mode not in MODELS:
+            raise ValueError(f"Unknown relationship model {self.mode!r}, expected one of {MODELS}")
+
+    @property
+    def typed(self):
+        return self.mode == "typed"
+
+    def connected(self, variable="", connectionType=None):
+        # Relationship pattern for one connection type, or for any connection when connectionType is None.
+        if not self.typed:
+            if connectionType is None:
+                return f"[{variable}:{LEGACY_TYPE}]"
+            return f"[{variable}:{LEGACY_TYPE} {{type: '{connectionType}'}}]"
+        if connectionType is None:
+            return f"[{variable}:{'|'.join(CONNECTION_TYPES.values())}]"
+        return f"[{variable}:{relationshipType(connectionType)}]"
+
+    def typeOf(self, variable):
+        # Cypher expression for the lower-case connection type of a relationship bound to variable.
+        return f"toLower(type({variable}))" if self.typed else f"{variable}.type"
+
+    def merge(self, start, end, typeExpression):
+        # MERGE clause for a connection whose type is the Cypher expression typeExpression. Relationship
+        # types cannot be parameters, so the typed model picks the type with one FOREACH per known type.
+        if not self.typed:
+            return f"MERGE ({start})-[:{LEGACY_TYPE} {{type: {typeExpression}}}]->({end})"
+        return " ".join(
+            f"FOREACH (ignored IN CASE WHEN {typeExpression} = '{connectionType}' THEN [1] ELSE [] END | "
+            f"MERGE ({start})-[:{name}]->({end}))"
+            for connectionType, name in CONNECTION_TYPES.items()
+        )
+
+    def checkTypes(self, connectionTypes):
+        # The property model stores any type string; the typed model only the ones it has relationship types for.
+        if self.typed:
+            for connectionType in connectionTypes:
+                relationshipType(connectionType)
+
+
+def relationshipType(connectionType):
+    try:
+        return CONNECTION_TYPES[connectionType]
+    except KeyError:
+        raise ValueError(f"Unknown connection type {connectionType!r}, expected one of {sorted(CONNECTION_TYPES)}")
+
@@ -1,307 +1,1799 @@
+import inspect
+
 from neo4j import GraphDatabase
 
+from batching import DEFAULT_BATCH_SIZE, batchCounters, bindOptions, chunks, toRows
+from feed import HUB_LABEL, FeedConfig
+from frontierSearch import hopSearch, reachableSearch, runSearchSteps, shortestPathSearch
+from mentions import parseMentions
+from messageIds import newMessageId
+from metrics import InstrumentedSession, currentMethod, instrumented, measure
+from neighbourhoodCache import MISSING, NeighbourhoodCache
+from projections import (MessageSummary, PostSummary, UserSummary, checkProjection, copyResult, fieldValues,
+                         messageFields, postFields, shape, shapePairs, userFields)
+from recommendations import PymkConfig
+from relationships import CONNECTION_TYPES, RelationshipModel
+from textSearch import DEFAULT_SEARCH_LIMIT, MESSAGE_INDEX, POST_INDEX, escapeQuery, splitCursor
+from timestamps import checkBucket, toDateTime
+from transactions import transaction
+from writeBehind import DEFAULT_FLUSH_INTERVAL, DEFAULT_FLUSH_SIZE, DEFAULT_QUEUE_SIZE, WriteBehindWriter
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MESSAGE_DEPTH = 3
+
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT user_userId IF NOT EXISTS FOR (u:User) REQUIRE u.userId IS UNIQUE",
+    "CREATE CONSTRAINT message_messageId IF NOT EXISTS FOR (m:Message) REQUIRE m.messageId IS UNIQUE",
+    "CREATE CONSTRAINT post_postId IF NOT EXISTS FOR (p:Post) REQUIRE p.postId IS UNIQUE",
+    "CREATE INDEX message_timestamp IF NOT EXISTS FOR (m:Message) ON (m.timestamp)",
+    "CREATE INDEX message_sender_timestamp IF NOT EXISTS FOR (m:Message) ON (m.senderId, m.timestamp)",
+    "CREATE INDEX message_receiver_timestamp IF NOT EXISTS FOR (m:Message) ON (m.receiverId, m.timestamp)",
+    "CREATE INDEX post_timestamp IF NOT EXISTS FOR (p:Post) ON (p.timestamp)",
+    f"CREATE FULLTEXT INDEX {MESSAGE_INDEX} IF NOT EXISTS FOR (m:Message) ON EACH [m.content]",
+    f"CREATE FULLTEXT INDEX {POST_INDEX} IF NOT EXISTS FOR (p:Post) ON EACH [p.title, p.content]",
+]
+
+# Labels that deleteLabel may wipe, with the derived relationship types that go with them.
+DELETABLE_LABELS = {
+    "User": (),
+    "Company": (),
+    "University": (),
+    "Message": ("MESSAGED",),
+    "Post": ("MENTIONED",),
+}
+
+# Properties that held ISO strings before timestamps were stored as DATETIME: pattern binding n, property.
+TIMESTAMP_PROPERTIES = {
+    "Message": ("(n:Message)", "timestamp"),
+    "Post": ("(n:Post)", "timestamp"),
+    "MESSAGED": ("()-[n:MESSAGED]->()", "lastTimestamp"),
+}
+
+# Unit-of-work methods with these prefixes only read, so they are not replayed for cache invalidation.
+READ_PREFIXES = ("get", "find", "search", "shortest", "expand")
+
+
 class SocialNetworkAPI:
-    def __init__(self, uri, user, password):
+    def __init__(self, uri, user, password, batchSize=DEFAULT_BATCH_SIZE, ensureSchema=False,
+                 maxConnectionPoolSize=None, fetchSize=None, cacheSize=0, cacheTtl=60.0, metrics=None, pymk=None,
+                 relationships=None, feed=None):
+        self.batchSize = batchSize
+        self.metrics = metrics
+        # How connections are stored; see relationships.py. Every connection query is built from it.
+        self.relationships = relationships or RelationshipModel()
+        # With a FeedConfig, every post is fanned out to its author's connections as it is written.
+        self.feed = feed
+        # With a PymkConfig, every connection write refreshes the stored top-K of the users it affects.
+        self.pymk = pymk
+        self.cache = NeighbourhoodCache(cacheSize, cacheTtl) if cacheSize else None
+        self.driverConfig = {}
+        if maxConnectionPoolSize is not None:
+            self.driverConfig["max_connection_pool_size"] = maxConnectionPoolSize
+        if fetchSize is not None:
+            self.driverConfig["fetch_size"] = fetchSize
         try:
-            self.driver = GraphDatabase.driver(uri, auth=(user, password))
+            self.driver = GraphDatabase.driver(uri, auth=(user, password), **self.driverConfig)
         except Exception as e:
-            print(f"Error connecting to the database: {e}")
+            self._reportError("Error connecting to the database", e)
+        if ensureSchema:
+            self.ensureSchema()
 
     def close(self):
         try:
             self.driver.close()
         except Exception as e:
-            print(f"Error closing the database connection: {e}")
+            self._reportError("Error closing the database connection", e)
 
-    def delete(self):
-        with self.driver.session() as session:
+    def _session(self, **config):
+        session = self.driver.session(**config)
+        return session if self.metrics is None else InstrumentedSession(session, self.metrics)
+
+    def _txOptions(self):
+        return {"relationships": self.relationships, "feed": self.feed}
+
+    def _reportError(self, message, error):
+        print(f"{message}: {error}")
+        if self.metrics is not None:
+            self.metrics.observeError(currentMethod() or "unknown", error)
+
+    def batch(self, fetchSize=None):
+        return SocialNetworkBatch(self, fetchSize)
+
+    def writeBehind(self, maxQueueSize=DEFAULT_QUEUE_SIZE, flushSize=DEFAULT_FLUSH_SIZE,
+                    flushInterval=DEFAULT_FLUSH_INTERVAL, putTimeout=None):
+        return WriteBehindWriter(self, maxQueueSize, flushSize, flushInterval, putTimeout)
+
+    def cacheStats(self):
+        return self.cache.stats() if self.cache is not None else None
+
+    def _invalidate(self, method, args, kwargs=None):
+        if kwargs:
+            # Unit-of-work calls may name their arguments; put them back in signature order.
+            args = tuple(inspect.signature(getattr(self, method)).bind_partial(*args, **kwargs).arguments.values())
+        if method in ("createConnection", "deleteConnection"):
+            self._refreshAround([args[0], args[1]])
+        if self.cache is None:
+            return
+        if method == "delete" or (method == "deleteLabel" and args[0] in ("User", "Company", "University")):
+            self.cache.clear()
+        elif method in ("deleteUser", "deleteCompany", "deleteUniversity"):
+            self.cache.invalidateUser(args[0])
+        elif method == "deleteUsers":
+            for userId in args[0]:
+                self.cache.invalidateUser(userId)
+        elif method == "createConnection":
+            self.cache.invalidateConnection(args[0], args[1], args[2])
+        elif method == "deleteConnection":
+            self.cache.invalidateConnection(args[0], args[1])
+
+    @instrumented
+    def ensureSchema(self, wait=False, timeout=300):
+        with self._session() as session:
             try:
-                session.execute_write(self._delete)
+                for statement in SCHEMA_STATEMENTS:
+                    session.execute_write(self._runSchemaStatement, statement)
+                if wait:
+                    session.run("CALL db.awaitIndexes($timeout)", timeout=timeout).consume()
+                return session.execute_read(self._getPopulatingIndexes)
             except Exception as e:
-                print(f"Error deleting database content: {e}")
+                self._reportError("Error ensuring database schema", e)
 
+    @staticmethod
+    @transaction
+    def _runSchemaStatement(statement):
+        yield statement, {}
+
+    @staticmethod
+    @transaction
+    def _getPopulatingIndexes():
+        query = (
+            "SHOW INDEXES YIELD name, state, populationPercent "
+            "WHERE state <> 'ONLINE' "
+            "RETURN name, state, populationPercent"
+        )
+        records, _ = yield query, {}
+        return [(record["name"], record["state"], record["populationPercent"]) for record in records]
+
+    @instrumented
+    def delete(self, batchSize=None, progress=None):
+        # Deletes relationships and then nodes in committed batches of batchSize, so no single
+        # transaction holds the whole graph. Interrupted runs resume by calling delete() again.
+        deleted = {
+            "relationships": self._runInBatches(self._deleteRelationshipsBatch, ("", ""), batchSize,
+                                                "relationships", progress),
+            "nodes": self._runInBatches(self._deleteNodesBatch, ("",), batchSize, "nodes", progress),
+        }
+        self._invalidate("delete", ())
+        return deleted
+
+    @instrumented
+    def deleteLabel(self, label, batchSize=None, progress=None):
+        # Label-scoped wipe, e.g. deleteLabel("Message"); derived aggregates of the label go with it.
+        if label not in DELETABLE_LABELS:
+            raise ValueError(f"Cannot delete label {label!r}; expected one of {sorted(DELETABLE_LABELS)}")
+        deleted = {"relationships": 0}
+        for relationshipType in DELETABLE_LABELS[label]:
+            deleted["relationships"] += self._runInBatches(
+                self._deleteRelationshipsBatch, ("", relationshipType), batchSize, relationshipType, progress)
+        deleted["relationships"] += self._runInBatches(
+            self._deleteRelationshipsBatch, (label, ""), batchSize, "relationships", progress)
+        deleted["nodes"] = self._runInBatches(self._deleteNodesBatch, (label,), batchSize, "nodes", progress)
+        self._invalidate("deleteLabel", (label,))
+        return deleted
+
+    @instrumented
+    def deleteUsers(self, userIds, batchSize=None, progress=None):
+        # Deletes the users in chunks of batchSize ids, detaching their relationships batch by batch first.
+        batchSize = batchSize or self.batchSize
+        deleted = {"relationships": 0, "nodes": 0}
+        for chunk in chunks(userIds, batchSize):
+            deleted["relationships"] += self._runInBatches(
+                self._deleteUsersRelationshipsBatch, (chunk,), batchSize, "relationships", progress)
+            deleted["nodes"] += self._runInBatches(self._deleteUsersBatch, (chunk,), batchSize, "nodes", progress)
+            self._invalidate("deleteUsers", (chunk,))
+        return deleted
+
+    def _runInBatches(self, txFunction, args, batchSize, phase, progress, action="deleting"):
+        batchSize = batchSize or self.batchSize
+        total = 0
+        with self._session() as session:
+            while True:
+                try:
+                    deleted = session.execute_write(txFunction, *args, batchSize)
+                except Exception as e:
+                    self._reportError(f"Error {action} {phase} after {total} rows", e)
+                    return total
+                total += deleted
+                if progress is not None and deleted:
+                    progress(phase, total)
+                if deleted < batchSize:
+                    return total
+
+    @instrumented
+    def migrateTimestamps(self, batchSize=None, progress=None):
+        # One-off migration for data written before timestamps were DATETIMEs: converts the string timestamps
+        # (parsed client-side, like new writes), then fills the senderId/receiverId keys of the per-user time
+        # indexes on old messages. Idempotent; re-running resumes. Returns the rows changed per phase. Strings that
+        # do not parse are moved to <name>Raw (e.g. message.timestampRaw) for manual repair.
+        migrated = {}
+        for phase, (pattern, name) in TIMESTAMP_PROPERTIES.items():
+            migrated[phase] = self._runInBatches(self._migrateTimestampsBatch, (pattern, name), batchSize, phase,
+                                                 progress, "migrating")
+        migrated["participants"] = self._runInBatches(self._backfillMessageParticipantsBatch, (), batchSize,
+                                                      "participants", progress, "migrating")
+        return migrated
+
+    @instrumented
+    def backfillPostIds(self, batchSize=None, progress=None):
+        # Assigns ULIDs to posts created before postIds existed; their time part is the post timestamp.
+        return self._runInBatches(self._backfillPostIds, (), batchSize, "postIds", progress, "backfilling")
+
+    @instrumented
+    def migrateRelationships(self, batchSize=None, progress=None):
+        # Rewrites the stored connections into this API's relationship model (CONNECTED_TO {type} to typed
+        # relationships or back), batchSize edges per transaction. Idempotent; re-running resumes. Run it before
+        # serving reads with the new model: until it finishes, edges still in the old model are invisible.
+        # Under the typed model, CONNECTED_TO edges whose type has no relationship type are left in place.
+        return self._runInBatches(self._migrateRelationshipsBatch, (self.relationships,), batchSize,
+                                  "relationships", progress, "migrating")
+
+    @instrumented
     def deleteUser(self, userId):
-        with self.driver.session() as session:
+        with self._session() as session:
             try:
                 session.execute_write(self._deleteUser, userId)
             except Exception as e:
-                print(f"Error deleting user: {e}")
+                self._reportError("Error deleting user", e)
+        self._invalidate("deleteUser", (userId,))
 
+    @instrumented
     def deleteCompany(self, companyId):
-        with self.driver.session() as session:
+        with self._session() as session:
             try:
                 session.execute_write(self._deleteCompany, companyId)
             except Exception as e:
-                print(f"Error deleting company: {e}")
+                self._reportError("Error deleting company", e)
+        self._invalidate("deleteCompany", (companyId,))
 
+    @instrumented
     def deleteUniversity(self, universityId):
-        with self.driver.session() as session:
+        with self._session() as session:
             try:
                 session.execute_write(self._deleteUniversity, universityId)
             except Exception as e:
-                print(f"Error deleting university: {e}")
+                self._reportError("Error deleting university", e)
+        self._invalidate("deleteUniversity", (universityId,))
 
+    @instrumented
     def deleteConnection(self, userId1, userId2):
-        with self.driver.session() as session:
+        with self._session() as session:
             try:
-                session.execute_write(self._deleteConnection, userId1, userId2)
+                session.execute_write(self._deleteConnection, userId1, userId2, relationships=self.relationships)
             except Exception as e:
-                print(f"Error deleting connection: {e}")
+                self._reportError("Error deleting connection", e)
+        self._invalidate("deleteConnection", (userId1, userId2))
 
+    @instrumented
     def deleteMessage(self, messageId):
-        with self.driver.session() as session:
+        with self._session() as session:
             try:
-                session.execute_write(self._deleteMessage, messageId)
+                return session.execute_write(self._deleteMessage, messageId)
             except Exception as e:
-                print(f"Error deleting message and its connections: {e}")
+                self._reportError("Error deleting message", e)
+                return False
+
+    @instrumented
+    def purgeMessagesBefore(self, timestamp, batchSize=None, progress=None):
+        # Retention job: deletes messages older than timestamp in committed batches, oldest first via the
+        # timestamp index, and keeps the MESSAGED aggregates in step. Re-running resumes an interrupted purge.
+        return self._runInBatches(self._purgeMessagesBatch, (timestamp,), batchSize, "messages", progress)
+
+    @instrumented
+    def backfillMessageIds(self, batchSize=None, progress=None):
+        # Assigns ULIDs to messages created before messageIds existed; their time part is the message timestamp.
+        return self._runInBatches(self._backfillMessageIds, (), batchSize, "messageIds", progress, "backfilling")
+
+    @staticmethod
+    @transaction
+    def _delete():
+        yield "MATCH (n) DETACH DELETE n", {}
+
+    @staticmethod
+    @transaction
+    def _deleteRelationshipsBatch(label, relationshipType, batchSize):
+        # label and relationshipType come from DELETABLE_LABELS, never from callers.
+        query = (
+            "MATCH (n%s)-[r%s]-() "
+            "WITH DISTINCT r LIMIT $batchSize "
+            "DELETE r "
+            "RETURN count(r) AS deleted"
+            % (":" + label if label else "", ":" + relationshipType if relationshipType else "")
+        )
+        records, _ = yield query, {"batchSize": batchSize}
+        return records[0]["deleted"]
+
+    @staticmethod
+    @transaction
+    def _deleteNodesBatch(label, batchSize):
+        query = (
+            "MATCH (n%s) "
+            "WITH n LIMIT $batchSize "
+            "DETACH DELETE n "
+            "RETURN count(n) AS deleted"
+            % (":" + label if label else "")
+        )
+        records, _ = yield query, {"batchSize": batchSize}
+        return records[0]["deleted"]
+
+    @staticmethod
+    @transaction
+    def _deleteUsersRelationshipsBatch(userIds, batchSize):
+        query = (
+            "UNWIND $userIds AS userId "
+            "MATCH (:User {userId: userId})-[r]-() "
+            "WITH DISTINCT r LIMIT $batchSize "
+            "DELETE r "
+            "RETURN count(r) AS deleted"
+        )
+        records, _ = yield query, {"userIds": userIds, "batchSize": batchSize}
+        return records[0]["deleted"]
 
     @staticmethod
-    def _delete(tx):
-        query = "MATCH (n) DETACH DELETE n"
-        tx.run(query)
+    @transaction
+    def _deleteUsersBatch(userIds, batchSize):
+        query = (
+            "UNWIND $userIds AS userId "
+            "MATCH (u:User {userId: userId}) "
+            "WITH u LIMIT $batchSize "
+            "DETACH DELETE u "
+            "RETURN count(u) AS deleted"
+        )
+        records, _ = yield query, {"userIds": userIds, "batchSize": batchSize}
+        return records[0]["deleted"]
 
     @staticmethod
-    def _deleteUser(tx, userId):
+    @transaction
+    def _deleteUser(userId):
         query = "MATCH (u:User {userId: $userId}) DETACH DELETE u"
-        tx.run(query, userId=userId)
+        yield query, {"userId": userId}
 
     @staticmethod
-    def _deleteCompany(tx, companyId):
+    @transaction
+    def _deleteCompany(companyId):
         query = "MATCH (u:User:Company {userId: $companyId}) DETACH DELETE u"
-        tx.run(query, companyId=companyId)
+        yield query, {"companyId": companyId}
 
     @staticmethod
-    def _deleteUniversity(tx, universityId):
+    @transaction
+    def _deleteUniversity(universityId):
         query = "MATCH (u:User:University {userId: $universityId}) DETACH DELETE u"
-        tx.run(query, universityId=universityId)
+        yield query, {"universityId": universityId}
+
+    @staticmethod
+    @transaction
+    def _deleteConnection(userId1, userId2, *, relationships):
+        query = (
+            "MATCH (u1:User {userId: $userId1})-%s-(u2:User {userId: $userId2}) "
+            "DELETE connection" % relationships.connected("connection")
+        )
+        yield query, {"userId1": userId1, "userId2": userId2}
+
+    @staticmethod
+    @transaction
+    def _deleteMessage(messageId):
+        # Only the message and its SENT/RECEIVED edges go; the MESSAGED aggregate is decremented.
+        query = (
+            "MATCH (message:Message {messageId: $messageId}) "
+            "OPTIONAL MATCH (sender:User)-[:SENT]->(message)-[:RECEIVED]->(receiver:User) "
+            "OPTIONAL MATCH (sender)-[messaged:MESSAGED]->(receiver) "
+            "SET messaged.count = messaged.count - 1 "
+            "DETACH DELETE message "
+            "WITH messaged WHERE messaged.count <= 0 "
+            "DELETE messaged"
+        )
+        _, counters = yield query, {"messageId": messageId}
+        return counters.nodes_deleted > 0
+
+    @staticmethod
+    @transaction
+    def _purgeMessagesBatch(timestamp, batchSize):
+        timestamp = toDateTime(timestamp)
+        query = (
+            "MATCH (message:Message) "
+            "WHERE message.timestamp < $timestamp "
+            "WITH message ORDER BY message.timestamp LIMIT $batchSize "
+            "OPTIONAL MATCH (sender:User)-[:SENT]->(message)-[:RECEIVED]->(receiver:User) "
+            "DETACH DELETE message "
+            "WITH sender, receiver, count(*) AS removed "
+            "WHERE sender IS NOT NULL "
+            "MATCH (sender)-[messaged:MESSAGED]->(receiver) "
+            "SET messaged.count = messaged.count - removed "
+            "WITH messaged WHERE messaged.count <= 0 "
+            "DELETE messaged"
+        )
+        _, counters = yield query, {"timestamp": timestamp, "batchSize": batchSize}
+        return counters.nodes_deleted
+
+    @staticmethod
+    @transaction
+    def _backfillMessageIds(batchSize):
+        query = (
+            "MATCH (message:Message) WHERE message.messageId IS NULL "
+            "RETURN elementId(message) AS key, message.timestamp AS timestamp "
+            "LIMIT $batchSize"
+        )
+        records, _ = yield query, {"batchSize": batchSize}
+        rows = [{"key": record["key"], "messageId": newMessageId(record["timestamp"])} for record in records]
+        query = (
+            "UNWIND $rows AS row "
+            "MATCH (message:Message) WHERE elementId(message) = row.key "
+            "SET message.messageId = row.messageId"
+        )
+        yield query, {"rows": rows}
+        return len(rows)
+
+    @staticmethod
+    @transaction
+    def _backfillPostIds(batchSize):
+        query = (
+            "MATCH (post:Post) WHERE post.postId IS NULL "
+            "RETURN elementId(post) AS key, post.timestamp AS timestamp "
+            "LIMIT $batchSize"
+        )
+        records, _ = yield query, {"batchSize": batchSize}
+        rows = [{"key": record["key"], "postId": newMessageId(record["timestamp"])} for record in records]
+        query = "UNWIND $rows AS row MATCH (post:Post) WHERE elementId(post) = row.key SET post.postId = row.postId"
+        yield query, {"rows": rows}
+        return len(rows)
+
+    @staticmethod
+    @transaction
+    def _migrateTimestampsBatch(pattern, name, batchSize):
+        # pattern and name come from TIMESTAMP_PROPERTIES, never from callers.
+        query = (
+            "MATCH %s WHERE n.%s IS :: STRING NOT NULL "
+            "RETURN elementId(n) AS key, n.%s AS timestamp "
+            "LIMIT $batchSize"
+            % (pattern, name, name)
+        )
+        records, _ = yield query, {"batchSize": batchSize}
+        rows, unparsed = [], []
+        for record in records:
+            try:
+                rows.append({"key": record["key"], "timestamp": toDateTime(record["timestamp"])})
+            except ValueError:
+                unparsed.append(record["key"])
+        query = "UNWIND $rows AS row MATCH %s WHERE elementId(n) = row.key SET n.%s = row.timestamp" % (pattern, name)
+        yield query, {"rows": rows}
+        if unparsed:
+            # Moved aside so the string filter above stops selecting them; otherwise every rerun would hit them first.
+            query = ("UNWIND $keys AS key MATCH %s WHERE elementId(n) = key SET n.%sRaw = n.%s REMOVE n.%s"
+                     % (pattern, name, name, name))
+            yield query, {"keys": unparsed}
+        return len(records)
 
     @staticmethod
-    def _deleteConnection(tx, userId1, userId2):
+    @transaction
+    def _migrateRelationshipsBatch(target, batchSize):
+        source = RelationshipModel("property" if target.typed else "typed")
         query = (
-            "MATCH (u1:User {userId: $userId1})-[connection:CONNECTED_TO]-(u2:User {userId: $userId2}) "
-            "DELETE connection"
+            "MATCH (u1:User)-%s->(u2:User) "
+            "WITH u1, u2, old, %s AS connectionType "
+            "WHERE connectionType IN $connectionTypes "
+            "WITH u1, u2, old, connectionType LIMIT $batchSize "
+            "%s "
+            "DELETE old "
+            "RETURN count(*) AS migrated"
+            % (source.connected("old"), source.typeOf("old"), target.merge("u1", "u2", "connectionType"))
         )
-        tx.run(query, userId1=userId1, userId2=userId2)
+        records, _ = yield query, {"connectionTypes": list(CONNECTION_TYPES), "batchSize": batchSize}
+        return records[0]["migrated"]
 
     @staticmethod
-    def _deleteMessage(tx, messageId):
+    @transaction
+    def _backfillMessageParticipantsBatch(batchSize):
         query = (
-            "MATCH (message:Message)-[:SENT]->(sender:User)-[outgoing:CONNECTED_TO]->(receiver:User)<-[:RECEIVED]-(message) "
-            "WHERE id(message) = $messageId "
-            "DELETE outgoing, message"
+            "MATCH (sender:User)-[:SENT]->(message:Message)-[:RECEIVED]->(receiver:User) "
+            "WHERE message.senderId IS NULL "
+            "WITH sender, message, receiver LIMIT $batchSize "
+            "SET message.senderId = sender.userId, message.receiverId = receiver.userId "
+            "RETURN count(message) AS updated"
         )
-        tx.run(query, messageId=messageId)
+        records, _ = yield query, {"batchSize": batchSize}
+        return records[0]["updated"]
 
+    @instrumented
     def createUser(self, userId, name):
-        with self.driver.session() as session:
+        with self._session() as session:
             try:
                 session.execute_write(self._createUser, userId, name)
             except Exception as e:
-                print(f"Error creating user: {e}")
+                self._reportError("Error creating user", e)
 
+    @instrumented
     def createCompany(self, companyId, name):
-        with self.driver.session() as session:
+        with self._session() as session:
             try:
                 session.execute_write(self._createCompany, companyId, name)
             except Exception as e:
-                print(f"Error creating company: {e}")
+                self._reportError("Error creating company", e)
 
+    @instrumented
     def createUniversity(self, universityId, name):
-        with self.driver.session() as session:
+        with self._session() as session:
             try:
                 session.execute_write(self._createUniversity, universityId, name)
             except Exception as e:
-                print(f"Error creating university: {e}")
+                self._reportError("Error creating university", e)
 
+    @instrumented
     def createConnection(self, userId1, userId2, connectionType):
-        with self.driver.session() as session:
+        with self._session() as session:
             try:
-                session.execute_write(self._createConnection, userId1, userId2, connectionType)
+                session.execute_write(self._createConnection, userId1, userId2, connectionType,
+                                      relationships=self.relationships)
             except Exception as e:
-                print(f"Error creating connection: {e}")
+                self._reportError("Error creating connection", e)
+        self._invalidate("createConnection", (userId1, userId2, connectionType))
+
+    @instrumented
+    def createUsers(self, users, batchSize=None):
+        rows = toRows(users, ("userId", "name"))
+        return self._writeBatches(self._createUsersBatch, rows, batchSize, "Error creating users")
+
+    @instrumented
+    def createCompanies(self, companies, batchSize=None):
+        rows = toRows(companies, ("userId", "name"))
+        return self._writeBatches(self._createCompaniesBatch, rows, batchSize, "Error creating companies")
+
+    @instrumented
+    def createUniversities(self, universities, batchSize=None):
+        rows = toRows(universities, ("userId", "name"))
+        return self._writeBatches(self._createUniversitiesBatch, rows, batchSize, "Error creating universities")
+
+    @instrumented
+    def createConnections(self, connections, batchSize=None):
+        rows = toRows(connections, ("userId1", "userId2", "connectionType"))
+        return self._writeBatches(bindOptions(self._createConnectionsBatch, **self._txOptions()), rows, batchSize,
+                                  "Error creating connections", afterBatch=self._invalidateConnections)
+
+    def _invalidateConnections(self, rows):
+        if self.cache is not None:
+            for row in rows:
+                self.cache.invalidateConnection(row["userId1"], row["userId2"], row["connectionType"])
+        self._refreshAround([userId for row in rows for userId in (row["userId1"], row["userId2"])])
 
-    def getFriendsAndFamily(self, userId):
-        with self.driver.session() as session:
+    def _writeBatches(self, txFunction, rows, batchSize, errorMessage, afterBatch=None):
+        stats = []
+        with self._session() as session:
+            for index, chunk in enumerate(chunks(rows, batchSize or self.batchSize)):
+                try:
+                    counters = session.execute_write(txFunction, chunk)
+                except Exception as e:
+                    self._reportError(f"{errorMessage} (batch {index})", e)
+                    counters = batchCounters(len(chunk), 0, 0)
+                if afterBatch is not None:
+                    afterBatch(chunk)
+                counters["batch"] = index
+                stats.append(counters)
+        return stats
+
+    @instrumented
+    def getFriendsAndFamily(self, userId, projection=None):
+        key = ("getFriendsAndFamily", userId, checkProjection(projection))
+        connections = self.cache.get(key) if self.cache is not None else MISSING
+        if connections is not MISSING:
+            return copyResult(connections)
+        with self._session() as session:
             try:
-                return session.execute_read(self._getFriendsAndFamily, userId)
+                connections = session.execute_read(self._getFriendsAndFamily, userId, projection,
+                                                   relationships=self.relationships)
             except Exception as e:
-                print(f"Error retrieving friends and family: {e}")
+                self._reportError("Error retrieving friends and family", e)
+                return None
+        if self.cache is None:
+            return connections
+        # The caller gets a copy, as on a hit, so mutating it cannot change what later hits return.
+        self.cache.put(key, connections, {userId}, fieldValues(connections, projection, UserSummary, "userId"))
+        return copyResult(connections)
 
-    def getFamilyOfFamily(self, userId):
-        with self.driver.session() as session:
+    @instrumented
+    def getFamilyOfFamily(self, userId, projection=None):
+        checkProjection(projection)
+        if self.cache is None:
+            with self._session() as session:
+                try:
+                    return session.execute_read(self._getFamilyOfFamily, userId, projection,
+                                                relationships=self.relationships)
+                except Exception as e:
+                    self._reportError("Error retrieving family of family", e)
+                    return None
+        key = ("getFamilyOfFamily", userId, projection)
+        familyOfFamily = self.cache.get(key)
+        if familyOfFamily is not MISSING:
+            return copyResult(familyOfFamily)
+        with self._session() as session:
             try:
-                return session.execute_read(self._getFamilyOfFamily, userId)
+                familyOfFamily, familyIds = session.execute_read(self._getFamilyOfFamilyTracked, userId, projection,
+                                                                  relationships=self.relationships)
             except Exception as e:
-                print(f"Error retrieving family of family: {e}")
+                self._reportError("Error retrieving family of family", e)
+                return None
+        # Any family edge added or removed at the user or at one of its family members changes the result.
+        self.cache.put(key, familyOfFamily, {userId} | familyIds,
+                       fieldValues(familyOfFamily, projection, UserSummary, "userId"), connectionTypes={"family"})
+        return copyResult(familyOfFamily)
+
+    @instrumented
+    def getFriendsAndFamilyMany(self, userIds, projection=None, batchSize=None):
+        # {userId: getFriendsAndFamily(userId)} for every distinct id, with cache hits served locally and the
+        # rest fetched in one UNWIND round trip per chunk of batchSize ids. Ids in a failed chunk map to None.
+        checkProjection(projection)
+        userIds = list(dict.fromkeys(userIds))
+        results, missing = {}, []
+        for userId in userIds:
+            cached = self.cache.get(("getFriendsAndFamily", userId, projection)) if self.cache is not None else MISSING
+            if cached is MISSING:
+                missing.append(userId)
+            else:
+                results[userId] = copyResult(cached)
+        with self._session() as session:
+            for chunk in chunks(missing, batchSize or self.batchSize):
+                try:
+                    found = session.execute_read(self._getFriendsAndFamilyMany, chunk, projection,
+                                                 relationships=self.relationships)
+                except Exception as e:
+                    self._reportError("Error retrieving friends and family", e)
+                    continue
+                for userId, connections in found.items():
+                    if self.cache is None:
+                        results[userId] = connections
+                        continue
+                    self.cache.put(("getFriendsAndFamily", userId, projection), connections, {userId},
+                                   fieldValues(connections, projection, UserSummary, "userId"))
+                    results[userId] = copyResult(connections)
+        return {userId: results.get(userId) for userId in userIds}
 
     @staticmethod
-    def _createUser(tx, userId, name):
+    @transaction
+    def _createUser(userId, name):
         query = "MERGE (u:User {userId: $userId}) SET u.name = $name"
-        tx.run(query, userId=userId, name=name)
+        yield query, {"userId": userId, "name": name}
 
     @staticmethod
-    def _createCompany(tx, companyId, name):
+    @transaction
+    def _createCompany(companyId, name):
         query = "MERGE (u:User:Company {userId: $companyId}) SET u.name = $name"
-        tx.run(query, companyId=companyId, name=name)
+        yield query, {"companyId": companyId, "name": name}
 
     @staticmethod
-    def _createUniversity(tx, universityId, name):
+    @transaction
+    def _createUniversity(universityId, name):
         query = "MERGE (u:User:University {userId: $universityId}) SET u.name = $name"
-        tx.run(query, universityId=universityId, name=name)
+        yield query, {"universityId": universityId, "name": name}
 
     @staticmethod
-    def _createConnection(tx, userId1, userId2, connectionType):
+    @transaction
+    def _createConnection(userId1, userId2, connectionType, *, relationships):
+        relationships.checkTypes([connectionType])
         query = (
             "MATCH (u1:User {userId: $userId1}), (u2:User {userId: $userId2}) "
-            "MERGE (u1)-[:CONNECTED_TO {type: $connectionType}]->(u2)"
+            + relationships.merge("u1", "u2", "$connectionType")
+        )
+        yield query, {"userId1": userId1, "userId2": userId2, "connectionType": connectionType}
+
+    @staticmethod
+    @transaction
+    def _createUsersBatch(rows):
+        query = "UNWIND $rows AS row MERGE (u:User {userId: row.userId}) SET u.name = row.name"
+        _, counters = yield query, {"rows": rows}
+        return batchCounters(len(rows), len(rows), counters.nodes_created)
+
+    @staticmethod
+    @transaction
+    def _createCompaniesBatch(rows):
+        query = "UNWIND $rows AS row MERGE (u:User:Company {userId: row.userId}) SET u.name = row.name"
+        _, counters = yield query, {"rows": rows}
+        return batchCounters(len(rows), len(rows), counters.nodes_created)
+
+    @staticmethod
+    @transaction
+    def _createUniversitiesBatch(rows):
+        query = "UNWIND $rows AS row MERGE (u:User:University {userId: row.userId}) SET u.name = row.name"
+        _, counters = yield query, {"rows": rows}
+        return batchCounters(len(rows), len(rows), counters.nodes_created)
+
+    @staticmethod
+    @transaction
+    def _createConnectionsBatch(rows, *, relationships):
+        matched, created = yield from SocialNetworkAPI._writeConnectionsBatch.steps(rows, relationships=relationships)
+        return batchCounters(len(rows), len(matched), created)
+
+    @staticmethod
+    @transaction
+    def _writeConnectionsBatch(rows, *, relationships):
+        # Returns the positions of the rows whose users both exist and how many edges were new.
+        relationships.checkTypes(row["connectionType"] for row in rows)
+        query = (
+            "UNWIND range(0, size($rows) - 1) AS index "
+            "WITH index, $rows[index] AS row "
+            "MATCH (u1:User {userId: row.userId1}), (u2:User {userId: row.userId2}) "
+            "%s "
+            "RETURN collect(index) AS matched" % relationships.merge("u1", "u2", "row.connectionType")
+        )
+        records, counters = yield query, {"rows": rows}
+        return records[0]["matched"], counters.relationships_created
+
+    @staticmethod
+    @transaction
+    def _getFriendsAndFamily(userId, projection=None, *, relationships):
+        query = (
+            "MATCH (user:User {userId: $userId})-%s-(connection) "
+            "RETURN %s" % (relationships.connected(), "connection" if projection is None else userFields("connection"))
+        )
+        records, _ = yield query, {"userId": userId}
+        return SocialNetworkAPI._decode(records, projection, "connection", UserSummary)
+
+    @staticmethod
+    @transaction
+    def _getFriendsAndFamilyMany(userIds, projection=None, *, relationships):
+        query = (
+            "UNWIND $userIds AS userId "
+            "CALL { "
+            "WITH userId "
+            "MATCH (:User {userId: userId})-%s-(connection) "
+            "RETURN collect(%s) AS connections "
+            "} "
+            "RETURN userId, connections"
+            % (relationships.connected(),
+               "connection" if projection is None else "[connection.userId, connection.name]")
         )
-        tx.run(query, userId1=userId1, userId2=userId2, connectionType=connectionType)
+        records, _ = yield query, {"userIds": userIds}
+        if projection is None:
+            return {record["userId"]: record["connections"] for record in records}
+        return {record["userId"]: shape([tuple(row) for row in record["connections"]], projection, UserSummary)
+                for record in records}
 
     @staticmethod
-    def _getFriendsAndFamily(tx, userId):
+    @transaction
+    def _getFamilyOfFamily(userId, projection=None, *, relationships):
+        family = relationships.connected("", "family")
         query = (
-            "MATCH (user:User {userId: $userId})-[:CONNECTED_TO]-(connection) "
-            "RETURN connection"
+            "MATCH (user:User {userId: $userId})-%s-(family)-%s-(familyOfFamily) "
+            "RETURN %s" % (family, family, "familyOfFamily" if projection is None else userFields("familyOfFamily"))
         )
-        result = tx.run(query, userId=userId)
-        return [record["connection"] for record in result]
+        records, _ = yield query, {"userId": userId}
+        return SocialNetworkAPI._decode(records, projection, "familyOfFamily", UserSummary)
 
     @staticmethod
-    def _getFamilyOfFamily(tx, userId):
+    @transaction
+    def _getFamilyOfFamilyTracked(userId, projection=None, *, relationships):
         query = (
-            "MATCH (user:User {userId: $userId})-[:CONNECTED_TO {type: 'family'}]-(family)-[:CONNECTED_TO {type: 'family'}]-(familyOfFamily) "
-            "RETURN familyOfFamily"
+            "MATCH (user:User {userId: $userId})-%s-(family) "
+            "OPTIONAL MATCH (family)-%s-(familyOfFamily) "
+            "WHERE second <> first "
+            "RETURN family.userId AS familyId, %s"
+            % (relationships.connected("first", "family"), relationships.connected("second", "family"),
+               "familyOfFamily" if projection is None else userFields("familyOfFamily"))
         )
-        result = tx.run(query, userId=userId)
-        return [record["familyOfFamily"] for record in result]
+        records, _ = yield query, {"userId": userId}
+        familyOfFamily, familyIds = [], set()
+        for record in records:
+            familyIds.add(record["familyId"])
+            if projection is None:
+                if record["familyOfFamily"] is not None:
+                    familyOfFamily.append(record["familyOfFamily"])
+            elif record["userId"] is not None:
+                familyOfFamily.append(tuple(record.values("userId", "name")))
+        if projection is None:
+            return familyOfFamily, familyIds
+        return shape(familyOfFamily, projection, UserSummary), familyIds
+
+    @staticmethod
+    def _decode(records, projection, variable, recordType):
+        # Unprojected reads return the driver Node; projected ones only the recordType fields.
+        if projection is None:
+            return [record[variable] for record in records]
+        return shape([tuple(record.values(*recordType.__slots__)) for record in records], projection, recordType)
 
+    @instrumented
     def createMessage(self, senderId, receiverId, content, timestamp):
-        with self.driver.session() as session:
+        messageId = newMessageId(timestamp)
+        with self._session() as session:
+            try:
+                session.execute_write(self._createMessage, senderId, receiverId, content, timestamp, messageId)
+                return messageId
+            except Exception as e:
+                self._reportError("Error creating message", e)
+
+    @instrumented
+    def createMessages(self, messages, batchSize=None):
+        rows = toRows(messages, ("senderId", "receiverId", "content", "timestamp"))
+        return self._writeBatches(self._createMessagesBatch, rows, batchSize, "Error creating messages")
+
+    @instrumented
+    def getMessagesAfterDate(self, senderId, receiverId, startDate, projection=None):
+        checkProjection(projection)
+        with self._session() as session:
+            try:
+                return session.execute_read(self._getMessagesAfterDate, senderId, receiverId, startDate, projection)
+            except Exception as e:
+                self._reportError("Error retrieving messages after date", e)
+
+    @instrumented
+    def getFullConversation(self, userId1, userId2, projection=None):
+        checkProjection(projection)
+        with self._session() as session:
+            try:
+                return session.execute_read(self._getFullConversation, userId1, userId2, projection)
+            except Exception as e:
+                self._reportError("Error retrieving full conversation", e)
+
+    @instrumented
+    def getFullConversationMany(self, pairs, projection=None, batchSize=None):
+        # {(userId1, userId2): getFullConversation(userId1, userId2)} for every pair. (a, b) and (b, a) are the
+        # same conversation and are fetched once; each chunk of distinct pairs is one UNWIND round trip.
+        checkProjection(projection)
+        pairs = [tuple(pair) for pair in pairs]
+        conversations = list(dict.fromkeys(tuple(sorted(pair)) for pair in pairs))
+        found = {}
+        with self._session() as session:
+            for chunk in chunks(conversations, batchSize or self.batchSize):
+                try:
+                    found.update(session.execute_read(self._getFullConversationMany, chunk, projection))
+                except Exception as e:
+                    self._reportError("Error retrieving full conversations", e)
+        return SocialNetworkAPI._conversationsByPair(pairs, found)
+
+    @staticmethod
+    def _conversationsByPair(pairs, found):
+        # Maps each requested orientation to its conversation; the second orientation gets its own copy.
+        results, served = {}, set()
+        for pair in pairs:
+            if pair in results:
+                continue
+            key = tuple(sorted(pair))
+            messages = found.get(key)
+            results[pair] = copyResult(messages) if key in served and messages is not None else messages
+            served.add(key)
+        return results
+
+    @instrumented
+    def getConversationPage(self, userId1, userId2, pageSize=DEFAULT_PAGE_SIZE, after=None, before=None,
+                            newestFirst=False, projection=None):
+        # Cursors are the messageId of the last message on a previous page; "before" pages run newest first.
+        descending, cursor = self._conversationCursor(after, before, newestFirst)
+        checkProjection(projection)
+        with self._session() as session:
+            try:
+                return session.execute_read(self._getConversationPage, userId1, userId2, pageSize, cursor,
+                                            descending, projection)
+            except Exception as e:
+                self._reportError("Error retrieving conversation page", e)
+                return [], None
+
+    def iterConversation(self, userId1, userId2, pageSize=DEFAULT_PAGE_SIZE, after=None, before=None,
+                         newestFirst=False, projection=None):
+        # Columnar pages do not stream row by row, so only record and tuple projections are accepted.
+        if checkProjection(projection) == "columns":
+            raise ValueError("iterConversation yields rows; use getConversationPage for columns")
+        descending, cursor = self._conversationCursor(after, before, newestFirst)
+        while True:
+            if descending:
+                messages, cursor = self.getConversationPage(userId1, userId2, pageSize, before=cursor, newestFirst=True,
+                                                            projection=projection)
+            else:
+                messages, cursor = self.getConversationPage(userId1, userId2, pageSize, after=cursor,
+                                                            projection=projection)
+            yield from messages
+            if cursor is None:
+                return
+
+    @staticmethod
+    def _conversationCursor(after, before, newestFirst):
+        # (descending, cursor) for a conversation read; a cursor that runs against the requested order is refused
+        # rather than ignored, which would silently restart at the first page.
+        if after is not None and before is not None:
+            raise ValueError("Pass either an after or a before cursor, not both")
+        if after is not None and newestFirst:
+            raise ValueError("An after cursor pages oldest first; pass before with newestFirst=True")
+        descending = newestFirst or before is not None
+        return descending, before if descending else after
+
+    @instrumented
+    def getMessagesAfterDatePage(self, senderId, receiverId, startDate, pageSize=DEFAULT_PAGE_SIZE, after=None,
+                                 projection=None):
+        checkProjection(projection)
+        with self._session() as session:
+            try:
+                return session.execute_read(
+                    self._getMessagesAfterDatePage, senderId, receiverId, startDate, pageSize, after, projection)
+            except Exception as e:
+                self._reportError("Error retrieving messages after date", e)
+                return [], None
+
+    def iterMessagesAfterDate(self, senderId, receiverId, startDate, pageSize=DEFAULT_PAGE_SIZE, projection=None):
+        if checkProjection(projection) == "columns":
+            raise ValueError("iterMessagesAfterDate yields rows; use getMessagesAfterDatePage for columns")
+        cursor = None
+        while True:
+            messages, cursor = self.getMessagesAfterDatePage(senderId, receiverId, startDate, pageSize, cursor,
+                                                             projection)
+            yield from messages
+            if cursor is None:
+                return
+
+    @instrumented
+    def getMessagesBetween(self, start, end, userId=None, projection=None):
+        # Messages with start <= timestamp < end, read from the timestamp index; with userId, only the ones that
+        # user sent or received, read from the per-user (senderId/receiverId, timestamp) indexes.
+        checkProjection(projection)
+        with self._session() as session:
             try:
-                session.execute_write(self._createMessage, senderId, receiverId, content, timestamp)
+                return session.execute_read(self._getMessagesBetween, start, end, userId, projection)
             except Exception as e:
-                print(f"Error creating message: {e}")
+                self._reportError("Error retrieving messages between dates", e)
 
-    def getMessagesAfterDate(self, senderId, receiverId, startDate):
-        with self.driver.session() as session:
+    @instrumented
+    def getActivityCounts(self, userId, start, end, bucket="day"):
+        # (bucket start, sent, received) per day or hour with any activity, in time order.
+        checkBucket(bucket)
+        with self._session() as session:
             try:
-                return session.execute_read(self._getMessagesAfterDate, senderId, receiverId, startDate)
+                return session.execute_read(self._getActivityCounts, userId, start, end, bucket)
             except Exception as e:
-                print(f"Error retrieving messages after date: {e}")
+                self._reportError("Error retrieving activity counts", e)
 
-    def getFullConversation(self, userId1, userId2):
-        with self.driver.session() as session:
+    @instrumented
+    def searchMessages(self, userId, text, limit=DEFAULT_SEARCH_LIMIT, start=None, end=None, after=None,
+                       projection=None):
+        # One page of (message, score) pairs, best first, from the message_content full-text index; with userId,
+        # only messages that user sent or received; start/end bound the timestamp. Returns (page, cursor), where
+        # cursor is passed as after for the next page and is None after the last one.
+        query = escapeQuery(text)
+        checkProjection(projection)
+        with self._session() as session:
             try:
-                return session.execute_read(self._getFullConversation, userId1, userId2)
+                return session.execute_read(self._searchMessages, userId, query, limit, start, end, after, projection)
             except Exception as e:
-                print(f"Error retrieving full conversation: {e}")
+                self._reportError("Error searching messages", e)
+                return [], None
 
     @staticmethod
-    def _createMessage(tx, senderId, receiverId, content, timestamp):
+    @transaction
+    def _createMessage(senderId, receiverId, content, timestamp, messageId=None):
         query = (
             "MATCH (sender:User {userId: $senderId}), (receiver:User {userId: $receiverId}) "
-            "CREATE (sender)-[:SENT]->(message:Message {content: $content, timestamp: $timestamp})-[:RECEIVED]->(receiver)"
+            "CREATE (sender)-[:SENT]->(message:Message {messageId: $messageId, senderId: $senderId, receiverId: $receiverId, content: $content, timestamp: $timestamp})-[:RECEIVED]->(receiver) "
+            "MERGE (sender)-[messaged:MESSAGED]->(receiver) "
+            "SET messaged.count = coalesce(messaged.count, 0) + 1, "
+            "messaged.lastTimestamp = CASE WHEN messaged.lastTimestamp > $timestamp THEN messaged.lastTimestamp ELSE $timestamp END"
+        )
+        timestamp = toDateTime(timestamp)
+        messageId = messageId or newMessageId(timestamp)
+        yield query, {"senderId": senderId, "receiverId": receiverId, "content": content, "timestamp": timestamp,
+                      "messageId": messageId}
+        return messageId
+
+    @staticmethod
+    @transaction
+    def _createMessagesBatch(rows):
+        rows = [dict(row, timestamp=toDateTime(row["timestamp"]),
+                     messageId=row.get("messageId") or newMessageId(row["timestamp"])) for row in rows]
+        matched = len((yield from SocialNetworkAPI._writeMessagesBatch.steps(rows)))
+        return batchCounters(len(rows), matched, matched)
+
+    @staticmethod
+    @transaction
+    def _writeMessagesBatch(rows):
+        # Returns the positions of the rows whose sender and receiver both exist.
+        query = (
+            "UNWIND range(0, size($rows) - 1) AS index "
+            "WITH index, $rows[index] AS row "
+            "MATCH (sender:User {userId: row.senderId}), (receiver:User {userId: row.receiverId}) "
+            "CREATE (sender)-[:SENT]->(message:Message {messageId: row.messageId, senderId: row.senderId, receiverId: row.receiverId, content: row.content, timestamp: row.timestamp})-[:RECEIVED]->(receiver) "
+            "MERGE (sender)-[messaged:MESSAGED]->(receiver) "
+            "SET messaged.count = coalesce(messaged.count, 0) + 1, "
+            "messaged.lastTimestamp = CASE WHEN messaged.lastTimestamp > row.timestamp THEN messaged.lastTimestamp ELSE row.timestamp END "
+            "RETURN collect(index) AS matched"
         )
-        tx.run(query, senderId=senderId, receiverId=receiverId, content=content, timestamp=timestamp)
+        records, _ = yield query, {"rows": rows}
+        return records[0]["matched"]
 
     @staticmethod
-    def _getMessagesAfterDate(tx, senderId, receiverId, startDate):
+    @transaction
+    def _getMessagesAfterDate(senderId, receiverId, startDate, projection=None):
         query = (
             "MATCH (sender:User {userId: $senderId})-[:SENT]->(message:Message)-[:RECEIVED]->(receiver:User {userId: $receiverId}) "
             "WHERE message.timestamp > $startDate "
-            "RETURN message"
+            "RETURN %s "
+            "ORDER BY message.messageId"
+            % ("message" if projection is None else messageFields("message", "$senderId", "$receiverId"))
         )
-        result = tx.run(query, senderId=senderId, receiverId=receiverId, startDate=startDate)
-        return [record["message"] for record in result]
+        records, _ = yield query, {"senderId": senderId, "receiverId": receiverId, "startDate": toDateTime(startDate)}
+        return SocialNetworkAPI._decode(records, projection, "message", MessageSummary)
 
     @staticmethod
-    def _getFullConversation(tx, userId1, userId2):
+    @transaction
+    def _getMessagesAfterDatePage(senderId, receiverId, startDate, pageSize, cursor, projection=None):
         query = (
-            "MATCH (user1:User {userId: $userId1})-[:SENT]->(message:Message)-[:RECEIVED]->(user2:User {userId: $userId2}) "
-            "RETURN message "
-            "UNION "
-            "MATCH (user1:User {userId: $userId2})-[:SENT]->(message:Message)-[:RECEIVED]->(user2:User {userId: $userId1}) "
-            "RETURN message"
+            "MATCH (sender:User {userId: $senderId})-[:SENT]->(message:Message)-[:RECEIVED]->(receiver:User {userId: $receiverId}) "
+            "WHERE message.timestamp > $startDate AND ($cursor IS NULL OR message.messageId > $cursor) "
+            "RETURN %s, message.messageId AS key "
+            "ORDER BY key "
+            "LIMIT $pageSize"
+            % ("message" if projection is None else messageFields("message", "$senderId", "$receiverId"))
+        )
+        records, _ = yield query, {"senderId": senderId, "receiverId": receiverId, "startDate": toDateTime(startDate),
+                                   "pageSize": pageSize, "cursor": cursor}
+        return SocialNetworkAPI._page(records, pageSize, projection)
+
+    @staticmethod
+    @transaction
+    def _getMessagesBetween(start, end, userId=None, projection=None):
+        if userId is None:
+            match = (
+                "MATCH (message:Message) "
+                "WHERE message.timestamp >= $start AND message.timestamp < $end "
+            )
+        else:
+            match = (
+                "CALL { "
+                "MATCH (message:Message) "
+                "WHERE message.senderId = $userId AND message.timestamp >= $start AND message.timestamp < $end "
+                "RETURN message "
+                "UNION "
+                "MATCH (message:Message) "
+                "WHERE message.receiverId = $userId AND message.timestamp >= $start AND message.timestamp < $end "
+                "RETURN message "
+                "} "
+            )
+        query = match + (
+            "RETURN %s "
+            "ORDER BY message.timestamp, message.messageId"
+            % ("message" if projection is None else messageFields("message", "message.senderId", "message.receiverId"))
+        )
+        records, _ = yield query, {"start": toDateTime(start), "end": toDateTime(end), "userId": userId}
+        return SocialNetworkAPI._decode(records, projection, "message", MessageSummary)
+
+    @staticmethod
+    @transaction
+    def _getActivityCounts(userId, start, end, bucket):
+        query = (
+            "CALL { "
+            "MATCH (message:Message) "
+            "WHERE message.senderId = $userId AND message.timestamp >= $start AND message.timestamp < $end "
+            "RETURN datetime.truncate($bucket, message.timestamp) AS bucket, 1 AS sent, 0 AS received "
+            "UNION ALL "
+            "MATCH (message:Message) "
+            "WHERE message.receiverId = $userId AND message.timestamp >= $start AND message.timestamp < $end "
+            "RETURN datetime.truncate($bucket, message.timestamp) AS bucket, 0 AS sent, 1 AS received "
+            "} "
+            "RETURN bucket, sum(sent) AS sent, sum(received) AS received "
+            "ORDER BY bucket"
+        )
+        records, _ = yield query, {"userId": userId, "start": toDateTime(start), "end": toDateTime(end),
+                                   "bucket": bucket}
+        return [(record["bucket"].to_native(), record["sent"], record["received"]) for record in records]
+
+    @staticmethod
+    @transaction
+    def _searchMessages(userId, query, limit, start=None, end=None, after=None, projection=None):
+        afterScore, afterKey = splitCursor(after)
+        cypher = (
+            "CALL db.index.fulltext.queryNodes($index, $query) YIELD node AS message, score "
+            "WHERE ($userId IS NULL OR message.senderId = $userId OR message.receiverId = $userId) "
+            "AND ($start IS NULL OR message.timestamp >= $start) AND ($end IS NULL OR message.timestamp < $end) "
+            "AND ($afterScore IS NULL OR score < $afterScore "
+            "OR (score = $afterScore AND message.messageId > $afterKey)) "
+            "RETURN %s, score, message.messageId AS key "
+            "ORDER BY score DESC, key "
+            "LIMIT $limit"
+            % ("message" if projection is None else messageFields("message", "message.senderId", "message.receiverId"))
+        )
+        records, _ = yield cypher, {"index": MESSAGE_INDEX, "query": query, "userId": userId,
+                                    "start": None if start is None else toDateTime(start),
+                                    "end": None if end is None else toDateTime(end),
+                                    "afterScore": afterScore, "afterKey": afterKey, "limit": limit}
+        return SocialNetworkAPI._searchPage(records, limit, projection, "message", MessageSummary)
+
+    @staticmethod
+    def _searchPage(records, limit, projection, variable, recordType):
+        # Like _page, but for (item, score) hits; the cursor is the (score, key) of the last hit on a full page.
+        if projection is None:
+            hits = [(record[variable], record["score"]) for record in records]
+        else:
+            hits = shapePairs([(tuple(record.values(*recordType.__slots__)), record["score"]) for record in records],
+                              projection, recordType, "score")
+        if len(records) < limit:
+            return hits, None
+        return hits, (records[-1]["score"], records[-1]["key"])
+
+    @staticmethod
+    @transaction
+    def _getFullConversation(userId1, userId2, projection=None):
+        query = (
+            "MATCH (user1:User {userId: $userId1})-[first:SENT|RECEIVED]-(message:Message)-[:SENT|RECEIVED]-(user2:User {userId: $userId2}) "
+            "RETURN %s "
+            "ORDER BY message.messageId"
+            % ("message" if projection is None else SocialNetworkAPI._conversationFields())
+        )
+        records, _ = yield query, {"userId1": userId1, "userId2": userId2}
+        return SocialNetworkAPI._decode(records, projection, "message", MessageSummary)
+
+    @staticmethod
+    @transaction
+    def _getFullConversationMany(pairs, projection=None):
+        query = (
+            "UNWIND $pairs AS pair "
+            "CALL { "
+            "WITH pair "
+            "MATCH (user1:User {userId: pair[0]})-[first:SENT|RECEIVED]-(message:Message)-[:SENT|RECEIVED]-(user2:User {userId: pair[1]}) "
+            "WITH first, message ORDER BY message.messageId "
+            "RETURN collect(%s) AS messages "
+            "} "
+            "RETURN pair, messages"
+            % ("message" if projection is None else
+               "[message.messageId, CASE type(first) WHEN 'SENT' THEN pair[0] ELSE pair[1] END, "
+               "CASE type(first) WHEN 'SENT' THEN pair[1] ELSE pair[0] END, message.content, message.timestamp]")
+        )
+        records, _ = yield query, {"pairs": [list(pair) for pair in pairs]}
+        if projection is None:
+            return {tuple(record["pair"]): record["messages"] for record in records}
+        return {tuple(record["pair"]): shape([tuple(row) for row in record["messages"]], projection, MessageSummary)
+                for record in records}
+
+    @staticmethod
+    @transaction
+    def _getConversationPage(userId1, userId2, pageSize, cursor, descending, projection=None):
+        query = (
+            "MATCH (user1:User {userId: $userId1})-[first:SENT|RECEIVED]-(message:Message)-[:SENT|RECEIVED]-(user2:User {userId: $userId2}) "
+            "WHERE $cursor IS NULL OR message.messageId %(op)s $cursor "
+            "RETURN %(fields)s, message.messageId AS key "
+            "ORDER BY key %(order)s "
+            "LIMIT $pageSize"
+            % dict({"op": "<", "order": "DESC"} if descending else {"op": ">", "order": "ASC"},
+                   fields="message" if projection is None else SocialNetworkAPI._conversationFields())
         )
-        result = tx.run(query, userId1=userId1, userId2=userId2)
-        return [record["message"] for record in result]
+        records, _ = yield query, {"userId1": userId1, "userId2": userId2, "pageSize": pageSize, "cursor": cursor}
+        return SocialNetworkAPI._page(records, pageSize, projection)
+
+    @staticmethod
+    def _conversationFields():
+        # The direction of user1's own SENT/RECEIVED edge tells who sent the message.
+        return messageFields("message", "CASE type(first) WHEN 'SENT' THEN $userId1 ELSE $userId2 END",
+                             "CASE type(first) WHEN 'SENT' THEN $userId2 ELSE $userId1 END")
 
+    @staticmethod
+    def _page(records, pageSize, projection=None):
+        # A short page is the last one; otherwise the last row becomes the cursor for the next page.
+        messages = SocialNetworkAPI._decode(records, projection, "message", MessageSummary)
+        if len(records) < pageSize:
+            return messages, None
+        return messages, records[-1]["key"]
+
+    @instrumented
     def createPost(self, userId, title, content, timestamp):
-        with self.driver.session() as session:
+        postId = newMessageId(timestamp)
+        with self._session() as session:
+            try:
+                session.execute_write(self._createPost, userId, title, content, timestamp, postId,
+                                      **self._txOptions())
+                return postId
+            except Exception as e:
+                self._reportError("Error creating post", e)
+
+    @instrumented
+    def createPosts(self, posts, batchSize=None):
+        rows = toRows(posts, ("userId", "title", "content", "timestamp"))
+        return self._writeBatches(bindOptions(self._createPostsBatch, **self._txOptions()), rows, batchSize,
+                                  "Error creating posts")
+
+    @instrumented
+    def searchPosts(self, text, limit=DEFAULT_SEARCH_LIMIT, start=None, end=None, after=None, projection=None):
+        # One page of (post, score) pairs from the post_text full-text index over titles and content; paged and
+        # time-filtered like searchMessages.
+        query = escapeQuery(text)
+        checkProjection(projection)
+        with self._session() as session:
+            try:
+                return session.execute_read(self._searchPosts, query, limit, start, end, after, projection)
+            except Exception as e:
+                self._reportError("Error searching posts", e)
+                return [], None
+
+    @instrumented
+    def getFeed(self, userId, pageSize=DEFAULT_PAGE_SIZE, before=None, projection=None):
+        # One page of the home feed, newest first: the user's timeline merged with the latest posts of the hubs the
+        # user is connected to. Returns (posts, cursor); pass cursor as before for the next page. It is None after
+        # the last page; a page may come back short when posts pushed to the timeline have since been deleted.
+        checkProjection(projection)
+        with self._session() as session:
             try:
-                session.execute_write(self._createPost, userId, title, content, timestamp)
+                return session.execute_read(self._getFeed, userId, pageSize, before, projection,
+                                            relationships=self.relationships)
             except Exception as e:
-                print(f"Error creating post: {e}")
+                self._reportError("Error retrieving feed", e)
+                return [], None
+
+    def iterFeed(self, userId, pageSize=DEFAULT_PAGE_SIZE, before=None, projection=None):
+        if checkProjection(projection) == "columns":
+            raise ValueError("iterFeed yields rows; use getFeed for columns")
+        cursor = before
+        while True:
+            posts, cursor = self.getFeed(userId, pageSize, cursor, projection)
+            yield from posts
+            if cursor is None:
+                return
 
-    def getUsersMentionedWithWorkRelation(self, userId):
-        with self.driver.session() as session:
+    @instrumented
+    def rebuildFeeds(self, batchSize=None, startAfter="", progress=None):
+        # Marks the hubs, then rebuilds every timeline from the posts of each user's non-hub connections, one page of
+        # users per transaction; pass the returned cursor as startAfter to resume. Run it after bulk loads (which
+        # skip fan-out without a FeedConfig), after backfillPostIds, or after changing the FeedConfig.
+        config = self.feed or FeedConfig()
+        if not startAfter:
+            self._runInBatches(self._markFeedHubsBatch, (config.fanOutLimit, self.relationships), batchSize, "hubs",
+                               progress, "marking")
+        cursor = startAfter
+        rebuilt = 0
+        with self._session() as session:
+            while True:
+                try:
+                    userIds = session.execute_read(self._getUserIdPage, cursor, batchSize or self.batchSize)
+                    if not userIds:
+                        return cursor
+                    rebuilt += session.execute_write(self._rebuildFeedsBatch, userIds, config.timelineSize,
+                                                     relationships=self.relationships)
+                except Exception as e:
+                    self._reportError(f"Error rebuilding feeds after {cursor!r}", e)
+                    return cursor
+                cursor = userIds[-1]
+                if progress is not None:
+                    progress(cursor, rebuilt)
+
+    @instrumented
+    def getUsersMentionedWithWorkRelation(self, userId, projection=None):
+        checkProjection(projection)
+        with self._session() as session:
             try:
-                return session.execute_read(self._getUsersMentionedWithWorkRelation, userId)
+                return session.execute_read(self._getUsersMentionedWithWorkRelation, userId, projection,
+                                            relationships=self.relationships)
             except Exception as e:
-                print(f"Error retrieving users mentioned with work relation: {e}")
+                self._reportError("Error retrieving users mentioned with work relation", e)
 
     @staticmethod
-    def _createPost(tx, userId, title, content, timestamp):
+    @transaction
+    def _createPost(userId, title, content, timestamp, postId=None, *, relationships, feed=None):
+        # Mentions are parsed once, here, into (post)-[:MENTIONS]->(user) edges.
+        postId = postId or newMessageId(timestamp)
         query = (
             "MATCH (user:User {userId: $userId}) "
-            "CREATE (user)-[:POSTED]->(post:Post {title: $title, content: $content, timestamp: $timestamp}) "
-            "WITH user, post, split($content, ' ') AS words "
-            "UNWIND words AS word "
-            "WITH user, post, word "
-            "WHERE word STARTS WITH '@' "
-            "MATCH (mentioned:User {userId: substring(word, 1)}) "
+            "CREATE (user)-[:POSTED]->(post:Post {postId: $postId, title: $title, content: $content, "
+            "timestamp: $timestamp}) "
+            "WITH user, post "
+            "UNWIND $mentions AS mentionedId "
+            "MATCH (mentioned:User {userId: mentionedId}) "
+            "CREATE (post)-[:MENTIONS]->(mentioned) "
             "MERGE (user)-[:MENTIONED]->(mentioned)"
         )
-        tx.run(query, userId=userId, title=title, content=content, timestamp=timestamp)
+        yield query, {"userId": userId, "postId": postId, "title": title, "content": content,
+                      "timestamp": toDateTime(timestamp), "mentions": parseMentions(content)}
+        if feed is not None:
+            yield from SocialNetworkAPI._fanOutPosts.steps([{"userId": userId, "postId": postId}], feed, relationships)
+        return postId
+
+    @staticmethod
+    @transaction
+    def _createPostsBatch(rows, *, relationships, feed=None):
+        rows = [dict(row, timestamp=toDateTime(row["timestamp"]), mentions=parseMentions(row["content"]),
+                     postId=row.get("postId") or newMessageId(row["timestamp"])) for row in rows]
+        query = (
+            "UNWIND $rows AS row "
+            "MATCH (user:User {userId: row.userId}) "
+            "CREATE (user)-[:POSTED]->(post:Post {postId: row.postId, title: row.title, content: row.content, "
+            "timestamp: row.timestamp}) "
+            "WITH user, post, row "
+            "CALL { "
+            "WITH user, post, row "
+            "UNWIND row.mentions AS mentionedId "
+            "MATCH (mentioned:User {userId: mentionedId}) "
+            "CREATE (post)-[:MENTIONS]->(mentioned) "
+            "MERGE (user)-[:MENTIONED]->(mentioned) "
+            "} "
+            "RETURN count(*) AS matched"
+        )
+        records, _ = yield query, {"rows": rows}
+        matched = records[0]["matched"]
+        if feed is not None:
+            yield from SocialNetworkAPI._fanOutPosts.steps(rows, feed, relationships)
+        return batchCounters(len(rows), matched, matched)
+
+    @staticmethod
+    @transaction
+    def _fanOutPosts(rows, feed, relationships):
+        # Authors past fanOutLimit become hubs on their first post; the rest push their postIds into the timeline of
+        # every person they are connected to. Each timeline is rewritten once per batch, newest first and cut to
+        # timelineSize, so a batch with several posts for one follower needs no read-after-write within the query.
+        query = (
+            "UNWIND $rows AS row "
+            "MATCH (author:User {userId: row.userId}) "
+            "FOREACH (ignored IN CASE WHEN NOT author:%(hub)s AND COUNT { (author)-%(connected)s-() } > $fanOutLimit "
+            "THEN [1] ELSE [] END | SET author:%(hub)s) "
+            "WITH author, row "
+            "WHERE NOT author:%(hub)s "
+            "MATCH (author)-%(connected)s-(follower:User) "
+            "WHERE NOT follower:Company AND NOT follower:University "
+            "WITH follower, collect(DISTINCT row.postId) AS postIds "
+            "CALL { "
+            "WITH follower, postIds "
+            "UNWIND postIds + coalesce(follower.feedIds, []) AS feedId "
+            "WITH DISTINCT feedId "
+            "ORDER BY feedId DESC "
+            "LIMIT $timelineSize "
+            "RETURN collect(feedId) AS feedIds "
+            "} "
+            "SET follower.feedIds = feedIds "
+            "RETURN count(follower) AS pushed"
+            % {"hub": HUB_LABEL, "connected": relationships.connected()}
+        )
+        records, _ = yield query, {"rows": [{"userId": row["userId"], "postId": row["postId"]} for row in rows],
+                                   "fanOutLimit": feed.fanOutLimit, "timelineSize": feed.timelineSize}
+        return records[0]["pushed"]
+
+    @staticmethod
+    @transaction
+    def _getFeed(userId, pageSize, before=None, projection=None, *, relationships):
+        # Post ids first, then the posts: the cursor is the last id, so deleted posts shorten a page but never end
+        # the feed early. Each hub contributes at most one page of its newest posts.
+        query = (
+            "MATCH (user:User {userId: $userId}) "
+            "CALL { "
+            "WITH user "
+            "UNWIND coalesce(user.feedIds, []) AS postId "
+            "WITH postId WHERE $before IS NULL OR postId < $before "
+            "RETURN postId "
+            "UNION "
+            "WITH user "
+            "MATCH (user)-%(connected)s-(hub:%(hub)s) "
+            "CALL { "
+            "WITH hub "
+            "MATCH (hub)-[:POSTED]->(post:Post) "
+            "WHERE post.postId IS NOT NULL AND ($before IS NULL OR post.postId < $before) "
+            "RETURN post.postId AS postId "
+            "ORDER BY postId DESC "
+            "LIMIT $pageSize "
+            "} "
+            "RETURN postId "
+            "} "
+            "RETURN postId "
+            "ORDER BY postId DESC "
+            "LIMIT $pageSize"
+            % {"hub": HUB_LABEL, "connected": relationships.connected()}
+        )
+        records, _ = yield query, {"userId": userId, "before": before, "pageSize": pageSize}
+        postIds = [record["postId"] for record in records]
+        query = (
+            "UNWIND $postIds AS postId "
+            "MATCH (author:User)-[:POSTED]->(post:Post {postId: postId}) "
+            "RETURN %s "
+            "ORDER BY post.postId DESC"
+            % ("post" if projection is None else postFields("post", "author.userId"))
+        )
+        records, _ = yield query, {"postIds": postIds}
+        posts = SocialNetworkAPI._decode(records, projection, "post", PostSummary)
+        return posts, postIds[-1] if len(postIds) == pageSize else None
 
     @staticmethod
-    def _getUsersMentionedWithWorkRelation(tx, userId):
+    @transaction
+    def _markFeedHubsBatch(fanOutLimit, relationships, batchSize):
         query = (
-            "MATCH (user:User {userId: $userId})-[:MENTIONED]->(mentioned:User) "
-            "MATCH (post:Post)<-[:POSTED]-(user) "
-            "WHERE toLower(post.content) CONTAINS '@' + mentioned.userId "
-            "RETURN DISTINCT mentioned"
+            "MATCH (user:User) "
+            "WHERE NOT user:%(hub)s AND COUNT { (user)-%(connected)s-() } > $fanOutLimit "
+            "WITH user LIMIT $batchSize "
+            "SET user:%(hub)s "
+            "RETURN count(user) AS marked"
+            % {"hub": HUB_LABEL, "connected": relationships.connected()}
         )
-        result = tx.run(query, userId=userId)
-        return [record["mentioned"] for record in result]
+        records, _ = yield query, {"fanOutLimit": fanOutLimit, "batchSize": batchSize}
+        return records[0]["marked"]
 
-    def findConnectionsByHops(self, userId, maxHops):
-        with self.driver.session() as session:
+    @staticmethod
+    @transaction
+    def _rebuildFeedsBatch(userIds, timelineSize, *, relationships):
+        query = (
+            "UNWIND $userIds AS userId "
+            "MATCH (user:User {userId: userId}) "
+            "WHERE NOT user:Company AND NOT user:University "
+            "CALL { "
+            "WITH user "
+            "OPTIONAL MATCH (user)-%(connected)s-(author:User)-[:POSTED]->(post:Post) "
+            "WHERE NOT author:%(hub)s AND post.postId IS NOT NULL "
+            "WITH DISTINCT post.postId AS postId "
+            "ORDER BY postId DESC "
+            "LIMIT $timelineSize "
+            "RETURN collect(postId) AS feedIds "
+            "} "
+            "SET user.feedIds = feedIds "
+            "RETURN count(user) AS rebuilt"
+            % {"hub": HUB_LABEL, "connected": relationships.connected()}
+        )
+        records, _ = yield query, {"userIds": userIds, "timelineSize": timelineSize}
+        return records[0]["rebuilt"]
+
+    @staticmethod
+    @transaction
+    def _searchPosts(query, limit, start=None, end=None, after=None, projection=None):
+        # The postId breaks score ties (run backfillPostIds on older stores); authors are matched for the page only.
+        afterScore, afterKey = splitCursor(after)
+        cypher = (
+            "CALL db.index.fulltext.queryNodes($index, $query) YIELD node AS post, score "
+            "WHERE ($start IS NULL OR post.timestamp >= $start) AND ($end IS NULL OR post.timestamp < $end) "
+            "AND ($afterScore IS NULL OR score < $afterScore OR (score = $afterScore AND post.postId > $afterKey)) "
+            "WITH post, score, post.postId AS key "
+            "ORDER BY score DESC, key "
+            "LIMIT $limit "
+            "OPTIONAL MATCH (author:User)-[:POSTED]->(post) "
+            "RETURN %s, score, key "
+            "ORDER BY score DESC, key"
+            % ("post" if projection is None else postFields("post", "author.userId"))
+        )
+        records, _ = yield cypher, {"index": POST_INDEX, "query": query,
+                                    "start": None if start is None else toDateTime(start),
+                                    "end": None if end is None else toDateTime(end),
+                                    "afterScore": afterScore, "afterKey": afterKey, "limit": limit}
+        return SocialNetworkAPI._searchPage(records, limit, projection, "post", PostSummary)
+
+    @staticmethod
+    @transaction
+    def _getUsersMentionedWithWorkRelation(userId, projection=None, *, relationships):
+        # Mentioned users who work with the author: a direct work connection or a shared company.
+        work = relationships.connected("", "work")
+        query = (
+            "MATCH (user:User {userId: $userId})-[:POSTED]->(:Post)-[:MENTIONS]->(mentioned:User) "
+            "WITH DISTINCT user, mentioned "
+            "WHERE EXISTS { MATCH (user)-%s-(mentioned) } "
+            "OR EXISTS { MATCH (user)-%s-(:Company)-%s-(mentioned) } "
+            "RETURN %s" % (work, work, work, "mentioned" if projection is None else userFields("mentioned"))
+        )
+        records, _ = yield query, {"userId": userId}
+        return SocialNetworkAPI._decode(records, projection, "mentioned", UserSummary)
+
+    @instrumented
+    def findConnectionsByHops(self, userId, maxHops, maxResults=None, maxFanOut=None, projection=None):
+        checkProjection(projection)
+        with self._session() as session:
+            try:
+                return session.execute_read(self._findConnectionsByHops, userId, maxHops, maxResults, maxFanOut,
+                                            projection, relationships=self.relationships)
+            except Exception as e:
+                self._reportError("Error finding new connections by hops", e)
+
+    @instrumented
+    def shortestConnection(self, userId1, userId2, maxHops=None, maxFanOut=None):
+        with self._session() as session:
             try:
-                return session.execute_read(self._findConnectionsByHops, userId, maxHops)
+                return session.execute_read(self._shortestConnection, userId1, userId2, maxHops, maxFanOut,
+                                            relationships=self.relationships)
             except Exception as e:
-                print(f"Error finding new connections by hops: {e}")
+                self._reportError("Error finding shortest connection", e)
 
-    def findConnectionsByMessages(self, userId, minMessages):
-        with self.driver.session() as session:
+    @instrumented
+    def findConnectionsByMessages(self, userId, minMessages, maxDepth=DEFAULT_MESSAGE_DEPTH, maxFanOut=None,
+                                  projection=None):
+        checkProjection(projection)
+        with self._session() as session:
             try:
-                return session.execute_read(self._findConnectionsByMessages, userId, minMessages)
+                return session.execute_read(self._findConnectionsByMessages, userId, minMessages, maxDepth, maxFanOut,
+                                            projection, relationships=self.relationships)
             except Exception as e:
-                print(f"Error finding new connections by messages: {e}")
+                self._reportError("Error finding new connections by messages", e)
+
+    @instrumented
+    def backfillMessagedEdges(self, batchSize=None, startAfter="", progress=None):
+        # Rebuilds MESSAGED aggregates from existing Message nodes, one page of senders per transaction.
+        # Idempotent; pass the returned cursor as startAfter to resume an interrupted run.
+        cursor = startAfter
+        with self._session() as session:
+            while True:
+                try:
+                    senderIds = session.execute_read(self._getUserIdPage, cursor, batchSize or self.batchSize)
+                    if not senderIds:
+                        return cursor
+                    pairs = session.execute_write(self._backfillMessagedEdges, senderIds)
+                except Exception as e:
+                    self._reportError(f"Error backfilling MESSAGED edges after {cursor!r}", e)
+                    return cursor
+                cursor = senderIds[-1]
+                if progress is not None:
+                    progress(cursor, pairs)
+
+    @instrumented
+    def getPeopleYouMayKnow(self, userId, limit=None, projection=None):
+        # A single lookup of the stored top-K: (user, score) pairs, best first.
+        checkProjection(projection)
+        with self._session() as session:
+            try:
+                return session.execute_read(self._getPeopleYouMayKnow, userId, limit, projection)
+            except Exception as e:
+                self._reportError("Error retrieving people you may know", e)
+
+    @instrumented
+    def refreshPeopleYouMayKnow(self, userIds, batchSize=None):
+        # Recomputes and stores the top-K of the given users, one UNWIND write per chunk; returns how many.
+        config = self.pymk or PymkConfig()
+        refreshed = 0
+        with self._session() as session:
+            for chunk in chunks(dict.fromkeys(userIds), batchSize or self.batchSize):
+                try:
+                    refreshed += session.execute_write(self._refreshPeopleYouMayKnow, chunk, config.topK,
+                                                       config.scoring == "adamicAdar", config.messageWeight,
+                                                       relationships=self.relationships)
+                except Exception as e:
+                    self._reportError("Error refreshing people you may know", e)
+        return refreshed
+
+    @instrumented
+    def rebuildPeopleYouMayKnow(self, batchSize=None, startAfter="", progress=None):
+        # Full rebuild, one page of users per transaction; pass the returned cursor as startAfter to resume.
+        # Run it once after bulk loads, which are cheaper without pymk than with per-batch refreshes.
+        cursor = startAfter
+        refreshed = 0
+        with self._session() as session:
+            while True:
+                try:
+                    userIds = session.execute_read(self._getUserIdPage, cursor, batchSize or self.batchSize)
+                except Exception as e:
+                    self._reportError(f"Error rebuilding people you may know after {cursor!r}", e)
+                    return cursor
+                if not userIds:
+                    return cursor
+                refreshed += self.refreshPeopleYouMayKnow(userIds, batchSize)
+                cursor = userIds[-1]
+                if progress is not None:
+                    progress(cursor, refreshed)
+
+    def _refreshAround(self, userIds):
+        # A connection between u1 and u2 changes the candidates of u1, u2 and their neighbours, and the
+        # Adamic-Adar weight of every pair that shares u1 or u2; that is exactly the users refreshed here.
+        # The neighbours of a company or university are skipped: refreshing them would cost the hub's degree
+        # on every edge written to it, so their scores catch up at the next rebuildPeopleYouMayKnow.
+        if self.pymk is None or not userIds:
+            return
+        with self._session() as session:
+            try:
+                affected = session.execute_read(self._getAffectedUsers, list(dict.fromkeys(userIds)),
+                                                relationships=self.relationships)
+            except Exception as e:
+                self._reportError("Error finding users affected by a connection change", e)
+                return
+        self.refreshPeopleYouMayKnow(affected)
 
     @staticmethod
-    def _findConnectionsByHops(tx, userId, maxHops):
-        query = (
-            "MATCH path = (user1:User {userId: $userId})-[:CONNECTED_TO*1..%d]-(user2:User)-[:CONNECTED_TO]-(user3:User) "
-            "WHERE NOT (user1)-[:CONNECTED_TO]-(user3) "
-            "AND length(path) <= %d "
-            "RETURN DISTINCT user3, length(path) AS hops "
-            "ORDER BY hops"
-            % (maxHops, maxHops)
-        )
-        result = tx.run(query, userId=userId)
-        return [(record["user3"], record["hops"]) for record in result]
+    @transaction
+    def _findConnectionsByHops(userId, maxHops, maxResults=None, maxFanOut=None, projection=None, *,
+                               relationships):
+        found = yield from runSearchSteps(
+            hopSearch(userId, maxHops, maxResults, maxFanOut),
+            lambda frontier: SocialNetworkAPI._expandFrontier.steps(frontier, relationships, maxFanOut))
+        users = yield from SocialNetworkAPI._getUsersById.steps([foundId for foundId, _ in found], projection)
+        pairs = [(users[foundId], hops) for foundId, hops in found if foundId in users]
+        return pairs if projection is None else shapePairs(pairs, projection, UserSummary, "hops")
+
+    @staticmethod
+    @transaction
+    def _shortestConnection(userId1, userId2, maxHops=None, maxFanOut=None, *, relationships):
+        return (yield from runSearchSteps(
+            shortestPathSearch(userId1, userId2, maxHops, maxFanOut),
+            lambda frontier: SocialNetworkAPI._expandFrontier.steps(frontier, relationships, maxFanOut)))
+
+    @staticmethod
+    @transaction
+    def _expandFrontier(frontier, relationships, maxFanOut=None):
+        if maxFanOut is None:
+            query = (
+                "UNWIND $frontier AS sourceId "
+                "MATCH (:User {userId: sourceId})-%s-(neighbour:User) "
+                "RETURN DISTINCT sourceId, neighbour.userId AS neighbourId" % relationships.connected()
+            )
+        else:
+            # The LIMIT stops each source's scan after maxFanOut neighbours, so a supernode is never read in full.
+            query = (
+                "UNWIND $frontier AS sourceId "
+                "MATCH (source:User {userId: sourceId}) "
+                "CALL { "
+                "WITH source "
+                "MATCH (source)-%s-(neighbour:User) "
+                "RETURN DISTINCT neighbour "
+                "LIMIT $maxFanOut "
+                "} "
+                "RETURN sourceId, neighbour.userId AS neighbourId" % relationships.connected()
+            )
+        records, _ = yield query, {"frontier": frontier, "maxFanOut": maxFanOut}
+        return [(record["sourceId"], record["neighbourId"]) for record in records]
+
+    @staticmethod
+    @transaction
+    def _getUsersById(userIds, projection=None):
+        # Projected lookups map each id to a (userId, name) row instead of the Node.
+        query = "UNWIND $userIds AS userId MATCH (user:User {userId: userId}) RETURN userId, %s" % (
+            "user" if projection is None else "user.name AS name")
+        records, _ = yield query, {"userIds": userIds}
+        if projection is None:
+            return {record["userId"]: record["user"] for record in records}
+        return {record["userId"]: (record["userId"], record["name"]) for record in records}
 
     @staticmethod
-    def _findConnectionsByMessages(tx, userId, minMessages):
+    @transaction
+    def _findConnectionsByMessages(userId, minMessages, maxDepth=DEFAULT_MESSAGE_DEPTH, maxFanOut=None,
+                                   projection=None, *, relationships):
+        reachable = yield from runSearchSteps(
+            reachableSearch(userId, maxDepth, maxFanOut),
+            lambda frontier: SocialNetworkAPI._expandFrontier.steps(frontier, relationships, maxFanOut))
+        # Counts senders through the aggregated MESSAGED edges instead of walking individual Message nodes.
         query = (
-            "MATCH (user1:User {userId: $userId})-[:CONNECTED_TO*1..]-(user2:User)-[:SENT]->(:Message)-[:RECEIVED]->(user3:User) "
-            "WHERE NOT (user1)-[:CONNECTED_TO]-(user3) "
-            "AND EXISTS { MATCH (user1)-[:CONNECTED_TO*1..]-(user2) } "
+            "MATCH (user1:User {userId: $userId}) "
+            "UNWIND $senderIds AS senderId "
+            "MATCH (user2:User {userId: senderId})-[:MESSAGED]->(user3:User) "
+            "WHERE user3 <> user1 AND NOT (user1)-%s-(user3) "
             "WITH user3, COUNT(DISTINCT user2) AS message_count "
             "WHERE message_count >= $minMessages "
-            "RETURN DISTINCT user3, message_count "
+            "RETURN %s, message_count "
             "ORDER BY message_count DESC"
+            % (relationships.connected(), "user3" if projection is None else userFields("user3"))
         )
-        result = tx.run(query, userId=userId, minMessages=minMessages)
-        return [(record["user3"], record["message_count"]) for record in result]
+        records, _ = yield query, {"userId": userId, "senderIds": list(reachable), "minMessages": minMessages}
+        if projection is None:
+            return [(record["user3"], record["message_count"]) for record in records]
+        pairs = [((record["userId"], record["name"]), record["message_count"]) for record in records]
+        return shapePairs(pairs, projection, UserSummary, "messageCount")
+
+    @staticmethod
+    @transaction
+    def _getUserIdPage(cursor, pageSize):
+        query = (
+            "MATCH (user:User) WHERE user.userId > $cursor "
+            "RETURN user.userId AS userId ORDER BY userId LIMIT $pageSize"
+        )
+        records, _ = yield query, {"cursor": cursor, "pageSize": pageSize}
+        return [record["userId"] for record in records]
+
+    @staticmethod
+    @transaction
+    def _backfillMessagedEdges(senderIds):
+        query = (
+            "UNWIND $senderIds AS senderId "
+            "MATCH (sender:User {userId: senderId})-[:SENT]->(message:Message)-[:RECEIVED]->(receiver:User) "
+            "WITH sender, receiver, count(message) AS messageCount, max(message.timestamp) AS lastTimestamp "
+            "MERGE (sender)-[messaged:MESSAGED]->(receiver) "
+            "SET messaged.count = messageCount, messaged.lastTimestamp = lastTimestamp "
+            "RETURN count(*) AS pairs"
+        )
+        records, _ = yield query, {"senderIds": senderIds}
+        return records[0]["pairs"]
+
+    @staticmethod
+    @transaction
+    def _getPeopleYouMayKnow(userId, limit=None, projection=None):
+        query = (
+            "MATCH (user:User {userId: $userId}) "
+            "UNWIND range(0, size(coalesce(user.pymkIds, [])) - 1) AS position "
+            "MATCH (candidate:User {userId: user.pymkIds[position]}) "
+            "RETURN %s, user.pymkScores[position] AS score "
+            "ORDER BY position"
+            % ("candidate" if projection is None else userFields("candidate"))
+        )
+        records, _ = yield query, {"userId": userId}
+        records = records[:limit]
+        if projection is None:
+            return [(record["candidate"], record["score"]) for record in records]
+        pairs = [((record["userId"], record["name"]), record["score"]) for record in records]
+        return shapePairs(pairs, projection, UserSummary, "score")
+
+    @staticmethod
+    @transaction
+    def _refreshPeopleYouMayKnow(userIds, topK, adamicAdar, messageWeight, *, relationships):
+        # The inner CALL always returns one row, so users left without candidates get empty lists.
+        query = (
+            "UNWIND $userIds AS userId "
+            "MATCH (user:User {userId: userId}) "
+            "WHERE NOT user:Company AND NOT user:University "
+            "CALL { "
+            "WITH user "
+            "CALL { "
+            "WITH user "
+            "MATCH (user)-%(connected)s-(middle)-%(connected)s-(candidate:User) "
+            "WHERE candidate <> user AND NOT candidate:Company AND NOT candidate:University "
+            "AND NOT EXISTS { (user)-%(connected)s-(candidate) } "
+            "WITH DISTINCT candidate, middle "
+            "RETURN candidate, "
+            "sum(CASE WHEN $adamicAdar THEN 1.0 / log(COUNT { (middle)-%(connected)s-() }) ELSE 1.0 END) AS score "
+            "UNION ALL "
+            "WITH user "
+            "MATCH (user)-[messaged:MESSAGED]-(candidate:User) "
+            "WHERE $messageWeight > 0 AND candidate <> user AND NOT candidate:Company AND NOT candidate:University "
+            "AND NOT EXISTS { (user)-%(connected)s-(candidate) } "
+            "WITH candidate, sum(messaged.count) AS messages "
+            "RETURN candidate, $messageWeight * log(1 + messages) AS score "
+            "} "
+            "WITH candidate, sum(score) AS score "
+            "ORDER BY score DESC, candidate.userId "
+            "LIMIT $topK "
+            "RETURN collect(candidate.userId) AS candidateIds, collect(score) AS scores "
+            "} "
+            "SET user.pymkIds = candidateIds, user.pymkScores = scores "
+            "RETURN count(user) AS refreshed" % {"connected": relationships.connected()}
+        )
+        records, _ = yield query, {"userIds": userIds, "topK": topK, "adamicAdar": adamicAdar,
+                                   "messageWeight": messageWeight}
+        return records[0]["refreshed"]
+
+    @staticmethod
+    @transaction
+    def _getAffectedUsers(userIds, *, relationships):
+        query = (
+            "UNWIND $userIds AS userId "
+            "MATCH (user:User {userId: userId}) "
+            "OPTIONAL MATCH (user)-%s-(neighbour:User) WHERE NOT user:Company AND NOT user:University "
+            "WITH collect(user.userId) + collect(neighbour.userId) AS affected "
+            "UNWIND affected AS userId "
+            "RETURN DISTINCT userId" % relationships.connected()
+        )
+        records, _ = yield query, {"userIds": userIds}
+        return [record["userId"] for record in records]
+
+
+class SocialNetworkBatch:
+    # Unit of work: every call runs on one session and one explicit transaction,
+    # committed once on a clean exit and rolled back if the block raises. A failed commit raises too.
+    def __init__(self, api, fetchSize=None):
+        self.api = api
+        self.fetchSize = fetchSize
+        self.session = None
+        self.tx = None
+        self.committed = False
+        self.writes = []
+
+    def __enter__(self):
+        sessionConfig = {} if self.fetchSize is None else {"fetch_size": self.fetchSize}
+        self.session = self.api._session(**sessionConfig)
+        self.tx = self.session.begin_transaction()
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        try:
+            if excType is not None:
+                try:
+                    self.tx.rollback()
+                except Exception as e:
+                    self.api._reportError("Error rolling back batch", e)
+                return False
+            try:
+                self.tx.commit()
+            except Exception as e:
+                # Nothing in the block was applied; the caller has to know.
+                self.api._reportError("Error committing batch", e)
+                raise
+            self.committed = True
+            for method, args, kwargs in self.writes:
+                self.api._invalidate(method, args, kwargs)
+        finally:
+            self.tx.close()
+            self.session.close()
+        return False
+
+    def __getattr__(self, name):
+        txFunction = None if name.startswith("_") else getattr(SocialNetworkAPI, "_" + name, None)
+        if txFunction is None:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        txFunction = bindOptions(txFunction, **self.api._txOptions())
+
+        def call(*args, **kwargs):
+            if not name.startswith(READ_PREFIXES):
+                self.writes.append((name, args, kwargs))
+            if self.api.metrics is None:
+                return txFunction(self.tx, *args, **kwargs)
+            with measure(self.api.metrics, name):
+                return txFunction(self.tx, *args, **kwargs)
+
+        return call
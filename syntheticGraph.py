@@ -0,0 +1,152 @@
+"""
+Seeded generator of power-law social graphs for benchmarks. Users attach to existing users by
+preferential attachment (Barabasi-Albert), so degrees follow the long tail of a real network;
+companies and universities are picked with the same bias. Every section is drawn from its own
+seeded stream, so the same seed always yields the same graph, section by section.
+"""
+
+import random
+from array import array
+from datetime import datetime, timedelta
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+PERSONAL_TYPES = ("friend", "family")
+PERSONAL_WEIGHTS = (0.8, 0.2)
+START_DATE = datetime(2023, 1, 1)
+
+WORDS = (
+    "hey", "news", "project", "meeting", "lunch", "deadline", "weekend", "plan", "coffee", "great",
+    "thanks", "soon", "update", "idea", "team", "launch", "review", "trip", "call", "today",
+)
+
+
+class SyntheticGraph:
+    def __init__(self, users, seed=0, edgesPerUser=3, companyRatio=0.01, universityRatio=0.002,
+                 messagesPerUser=5, postsPerUser=1, mentionsPerPost=2, days=365):
+        self.users = users
+        self.seed = seed
+        self.edgesPerUser = edgesPerUser
+        self.companyCount = max(1, int(users * companyRatio))
+        self.universityCount = max(1, int(users * universityRatio))
+        self.messagesPerUser = messagesPerUser
+        self.postsPerUser = postsPerUser
+        self.mentionsPerPost = mentionsPerPost
+        self.days = days
+        self._edges = None
+
+    @classmethod
+    def atScale(cls, scale, seed=0, **options):
+        return cls(SCALES[scale.lower()], seed=seed, **options)
+
+    def _random(self, section):
+        return random.Random(f"{self.seed}:{section}")
+
+    @staticmethod
+    def userId(index):
+        return f"user{index}"
+
+    @staticmethod
+    def companyId(index):
+        return f"comp{index}"
+
+    @staticmethod
+    def universityId(index):
+        return f"uni{index}"
+
+    def _timestamp(self, rng):
+        return (START_DATE + timedelta(seconds=rng.randrange(self.days * 86400))).isoformat()
+
+    def userRows(self):
+        for index in range(self.users):
+            yield self.userId(index), f"User {index}"
+
+    def companyRows(self):
+        for index in range(self.companyCount):
+            yield self.companyId(index), f"Company {index}"
+
+    def universityRows(self):
+        for index in range(self.universityCount):
+            yield self.universityId(index), f"University {index}"
+
+    def edges(self):
+        # Preferential attachment over user indexes, cached as a flat array of (src, dst) pairs.
+        if self._edges is None:
+            rng = self._random("edges")
+            edges = array("l")
+            repeated = array("l")
+            core = min(self.users, self.edgesPerUser + 1)
+            for src in range(1, core):
+                for dst in range(src):
+                    edges.extend((src, dst))
+                    repeated.extend((src, dst))
+            for src in range(core, self.users):
+                targets = set()
+                while len(targets) < self.edgesPerUser:
+                    targets.add(repeated[rng.randrange(len(repeated))])
+                for dst in targets:
+                    edges.extend((src, dst))
+                    repeated.extend((src, dst))
+            self._edges = edges
+        return self._edges
+
+    def connectionRows(self):
+        rng = self._random("connections")
+        edges = self.edges()
+        for offset in range(0, len(edges), 2):
+            connectionType = rng.choices(PERSONAL_TYPES, PERSONAL_WEIGHTS)[0]
+            yield self.userId(edges[offset]), self.userId(edges[offset + 1]), connectionType
+        # Employers and schools are chosen with a power-law bias so a few organisations are hubs.
+        for index in range(self.users):
+            if rng.random() < 0.7:
+                company = min(int(rng.paretovariate(1.2)) - 1, self.companyCount - 1)
+                yield self.userId(index), self.companyId(company), "work"
+            if rng.random() < 0.5:
+                university = min(int(rng.paretovariate(1.2)) - 1, self.universityCount - 1)
+                yield self.userId(index), self.universityId(university), "academic"
+
+    def _text(self, rng, words=8):
+        return " ".join(rng.choice(WORDS) for _ in range(words))
+
+    def messageRows(self):
+        # Messages travel along existing connections; popular users both send and receive more.
+        rng = self._random("messages")
+        edges = self.edges()
+        pairs = len(edges) // 2
+        if not pairs:
+            return
+        for _ in range(self.users * self.messagesPerUser):
+            offset = rng.randrange(pairs) * 2
+            sender, receiver = edges[offset], edges[offset + 1]
+            if rng.random() < 0.5:
+                sender, receiver = receiver, sender
+            yield self.userId(sender), self.userId(receiver), self._text(rng), self._timestamp(rng)
+
+    def postRows(self):
+        rng = self._random("posts")
+        edges = self.edges()
+        pairs = len(edges) // 2
+        for _ in range(self.users * self.postsPerUser):
+            offset = rng.randrange(pairs) * 2 if pairs else 0
+            author = edges[offset] if pairs else rng.randrange(self.users)
+            mentions = []
+            for _ in range(self.mentionsPerPost):
+                if pairs:
+                    mentions.append(self.userId(edges[rng.randrange(pairs) * 2 + 1]))
+            content = self._text(rng) + "".join(f" @{mentionId}" for mentionId in mentions)
+            yield self.userId(author), self._text(rng, 3), content, self._timestamp(rng)
+
+    def load(self, api, batchSize=None):
+        # Loads the whole graph through the bulk writers and returns the row count per section.
+        return {
+            "users": self._count(api.createUsers(self.userRows(), batchSize)),
+            "companies": self._count(api.createCompanies(self.companyRows(), batchSize)),
+            "universities": self._count(api.createUniversities(self.universityRows(), batchSize)),
+            "connections": self._count(api.createConnections(self.connectionRows(), batchSize)),
+            "messages": self._count(api.createMessages(self.messageRows(), batchSize)),
+            "posts": self._count(api.createPosts(self.postRows(), batchSize)),
+        }
+
+    @staticmethod
+    def _count(batches):
+        return sum(batch["rows"] for batch in batches or [])
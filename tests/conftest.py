@@ -0,0 +1,171 @@
+"""
+Stand-ins for the neo4j driver. Every statement a transaction runs is logged on the driver as
+(query, parameters) and answered by driver.respond(query, parameters), which returns a list of dicts
+(the records) or a (records, counters) pair; counters not given default to 0.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from neo4j import AsyncGraphDatabase, GraphDatabase, Record
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COUNTERS = ("nodes_created", "nodes_deleted", "relationships_created", "relationships_deleted", "properties_set")
+
+
+class FakeResult:
+    def __init__(self, records, counters):
+        self.records = records
+        self.counters = counters
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def consume(self):
+        return SimpleNamespace(counters=self.counters, profile=None)
+
+
+class FakeTransaction:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def run(self, query, parameters=None, **kwargs):
+        parameters = dict(parameters or {}, **kwargs)
+        self.driver.statements.append((query, parameters))
+        response = self.driver.respond(query, parameters)
+        records, counters = response if isinstance(response, tuple) else (response, {})
+        counters = SimpleNamespace(**dict(dict.fromkeys(COUNTERS, 0), **counters))
+        return FakeResult([Record(record) for record in records], counters)
+
+    def commit(self):
+        self.driver.commits += 1
+        if self.driver.failCommit is not None:
+            raise self.driver.failCommit
+
+    def rollback(self):
+        self.driver.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excInfo):
+        return False
+
+    def close(self):
+        pass
+
+    def execute_write(self, txFunction, *args, **kwargs):
+        return txFunction(FakeTransaction(self.driver), *args, **kwargs)
+
+    execute_read = execute_write
+
+    def run(self, query, parameters=None, **kwargs):
+        return FakeTransaction(self.driver).run(query, parameters, **kwargs)
+
+    def begin_transaction(self, **config):
+        return FakeTransaction(self.driver)
+
+
+class FakeDriver:
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.failCommit = None
+        self.respond = lambda query, parameters: []
+
+    def session(self, **config):
+        return FakeSession(self)
+
+    def close(self):
+        pass
+
+    def queries(self):
+        return [query for query, _ in self.statements]
+
+
+class AsyncFakeResult:
+    def __init__(self, result):
+        self.result = result
+
+    async def __aiter__(self):
+        for record in self.result.records:
+            yield record
+
+    async def consume(self):
+        return self.result.consume()
+
+
+class AsyncFakeTransaction:
+    def __init__(self, driver):
+        self.transaction = FakeTransaction(driver)
+
+    async def run(self, query, parameters=None, **kwargs):
+        return AsyncFakeResult(self.transaction.run(query, parameters, **kwargs))
+
+    async def commit(self):
+        self.transaction.commit()
+
+    async def rollback(self):
+        self.transaction.rollback()
+
+    async def close(self):
+        pass
+
+
+class AsyncFakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *excInfo):
+        return False
+
+    async def close(self):
+        pass
+
+    async def execute_write(self, txFunction, *args, **kwargs):
+        return await txFunction(AsyncFakeTransaction(self.driver), *args, **kwargs)
+
+    execute_read = execute_write
+
+    async def run(self, query, parameters=None, **kwargs):
+        return await AsyncFakeTransaction(self.driver).run(query, parameters, **kwargs)
+
+    async def begin_transaction(self, **config):
+        return AsyncFakeTransaction(self.driver)
+
+
+class AsyncFakeDriver(FakeDriver):
+    def session(self, **config):
+        return AsyncFakeSession(self)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def fakeDriver(monkeypatch):
+    driver = FakeDriver()
+    monkeypatch.setattr(GraphDatabase, "driver", lambda *args, **kwargs: driver)
+    return driver
+
+
+@pytest.fixture
+def asyncFakeDriver(monkeypatch):
+    driver = AsyncFakeDriver()
+    monkeypatch.setattr(AsyncGraphDatabase, "driver", lambda *args, **kwargs: driver)
+    return driver
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from asyncSocialNetwork import AsyncSocialNetworkAPI
+from recommendations import PymkConfig
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def respond(query, parameters):
+    if "collect(index) AS matched" in query:
+        return [{"matched": list(range(len(parameters["rows"])))}]
+    if "neighbourId" in query:
+        return [{"sourceId": sourceId, "neighbourId": sourceId + "x"} for sourceId in parameters["frontier"]
+                if len(sourceId) < 3]
+    if "RETURN userId, user.name AS name" in query:
+        return [{"userId": userId, "name": userId.upper()} for userId in parameters["userIds"]]
+    if "RETURN user.userId AS userId ORDER BY userId" in query:
+        return [{"userId": userId} for userId in ("a", "b") if userId > parameters["cursor"]]
+    if "SHOW INDEXES" in query:
+        return [{"name": "message_timestamp", "state": "POPULATING", "populationPercent": 50.0}]
+    for count, key in (("pairs", "senderIds"), ("rebuilt", "userIds"), ("refreshed", "userIds")):
+        if f"AS {count}" in query:
+            return [{count: len(parameters[key])}]
+    if "AS marked" in query or "awaitIndexes" in query:
+        return [{"marked": 0}]
+    if "AS key" in query:
+        if parameters.get("cursor") is not None:
+            return []
+        return [{"messageId": "m2", "senderId": "a", "receiverId": "b", "content": "hi", "timestamp": None,
+                 "key": "m2"}]
+    return [{"userId": "b", "name": "B"}]
+
+
+CALLS = [
+    ("getFriendsAndFamily", ("a", "record")),
+    ("getConversationPage", ("a", "b", 1, None, None, True, "tuple")),
+    ("createConnections", ([("a", "b", "friend"), ("b", "c", "work")],)),
+    ("findConnectionsByHops", ("a", 3, None, None, "tuple")),
+    ("shortestConnection", ("a", "axx")),
+    ("ensureSchema", (True,)),
+    ("getMessagesAfterDatePage", ("a", "b", "2024-01-01T00:00:00", 1)),
+    ("backfillMessagedEdges", ()),
+    ("rebuildPeopleYouMayKnow", ()),
+    ("rebuildFeeds", ()),
+]
+
+
+@pytest.mark.parametrize("method, args", CALLS)
+def testAsyncRunsTheSyncStatements(fakeDriver, asyncFakeDriver, method, args):
+    fakeDriver.respond = asyncFakeDriver.respond = respond
+    expected = getattr(SocialNetworkAPI("bolt://test", "user", "password"), method)(*args)
+    api = AsyncSocialNetworkAPI("bolt://test", "user", "password")
+    assert asyncio.run(getattr(api, method)(*args)) == expected
+    assert asyncFakeDriver.statements == fakeDriver.statements
+
+
+def testCreateConnectionsRefreshesEachWrittenChunk(asyncFakeDriver):
+    def respondWithAffected(query, parameters):
+        if "RETURN DISTINCT userId" in query:
+            return [{"userId": userId} for userId in parameters["userIds"]]
+        if "RETURN count(user) AS refreshed" in query:
+            return [{"refreshed": len(parameters["userIds"])}]
+        return respond(query, parameters)
+
+    asyncFakeDriver.respond = respondWithAffected
+    api = AsyncSocialNetworkAPI("bolt://test", "user", "password", batchSize=1, pymk=PymkConfig())
+    asyncio.run(api.createConnections([("a", "b", "friend"), ("b", "c", "friend")]))
+    lookups = [parameters["userIds"] for query, parameters in asyncFakeDriver.statements
+               if "RETURN DISTINCT userId" in query]
+    assert lookups == [["a", "b"], ["b", "c"]]
+
+
+def testCreateMessageReturnsTheWrittenId(asyncFakeDriver):
+    api = AsyncSocialNetworkAPI("bolt://test", "user", "password")
+    messageId = asyncio.run(api.createMessage("a", "b", "hi", "2024-01-01T00:00:00"))
+    assert asyncFakeDriver.statements[-1][1]["messageId"] == messageId
+
+
+def testUnknownAttributesStillRaise(asyncFakeDriver):
+    api = AsyncSocialNetworkAPI("bolt://test", "user", "password")
+    with pytest.raises(AttributeError):
+        api._notATransaction
+    with pytest.raises(AttributeError):
+        api._reportError
+
+
+def testIterMessagesAfterDateFollowsTheCursor(fakeDriver, asyncFakeDriver):
+    fakeDriver.respond = asyncFakeDriver.respond = respond
+    expected = list(SocialNetworkAPI("bolt://test", "user", "password").iterMessagesAfterDate(
+        "a", "b", "2024-01-01T00:00:00", 1, "tuple"))
+
+    async def collect():
+        api = AsyncSocialNetworkAPI("bolt://test", "user", "password")
+        return [message async for message in api.iterMessagesAfterDate("a", "b", "2024-01-01T00:00:00", 1, "tuple")]
+
+    assert asyncio.run(collect()) == expected
+    assert asyncFakeDriver.statements == fakeDriver.statements
+
+
+def testBatchRunsOneTransactionAndRefreshesAfterTheCommit(fakeDriver, asyncFakeDriver):
+    fakeDriver.respond = asyncFakeDriver.respond = respond
+    with SocialNetworkAPI("bolt://test", "user", "password", pymk=PymkConfig()).batch() as batch:
+        batch.getFriendsAndFamily("a", "tuple")
+        batch.createConnection(userId1="a", userId2="c", connectionType="friend")
+
+    async def run():
+        api = AsyncSocialNetworkAPI("bolt://test", "user", "password", pymk=PymkConfig())
+        async with api.batch() as batch:
+            await batch.getFriendsAndFamily("a", "tuple")
+            await batch.createConnection(userId1="a", userId2="c", connectionType="friend")
+        return batch
+
+    batch = asyncio.run(run())
+    assert batch.committed and [name for name, _, _ in batch.writes] == ["createConnection"]
+    assert asyncFakeDriver.statements == fakeDriver.statements
+    assert (asyncFakeDriver.commits, asyncFakeDriver.rollbacks) == (1, 0)
+
+
+def testBatchRollsBackWhenTheBlockRaises(asyncFakeDriver):
+    async def run():
+        api = AsyncSocialNetworkAPI("bolt://test", "user", "password", pymk=PymkConfig())
+        async with api.batch() as batch:
+            await batch.createConnection("a", "c", "friend")
+            raise RuntimeError("abandon")
+
+    with pytest.raises(RuntimeError, match="abandon"):
+        asyncio.run(run())
+    assert (asyncFakeDriver.commits, asyncFakeDriver.rollbacks) == (0, 1)
+    assert len(asyncFakeDriver.statements) == 1
+
+
+def testCacheStatsAndWriteBehind(asyncFakeDriver):
+    api = AsyncSocialNetworkAPI("bolt://test", "user", "password")
+    assert api.cacheStats() is None
+    with pytest.raises(AttributeError, match="does not support writeBehind"):
+        api.writeBehind()
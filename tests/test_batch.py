@@ -0,0 +1,50 @@
+import pytest
+
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def testKeywordArgumentsReachTheTxFunctionAndInvalidation(fakeDriver):
+    fakeDriver.respond = lambda query, parameters: [{"connection": {"userId": "b"}}]
+    api = SocialNetworkAPI("bolt://test", "user", "password", cacheSize=10)
+    api.getFriendsAndFamily("a")
+    with api.batch() as batch:
+        batch.createConnection(userId1="a", userId2="c", connectionType="friend")
+    assert fakeDriver.statements[-1][1] == {"userId1": "a", "userId2": "c", "connectionType": "friend"}
+    assert api.cacheStats()["size"] == 0
+
+
+def testCreateMessageReturnsItsId(fakeDriver):
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    with api.batch() as batch:
+        messageId = batch.createMessage("a", "b", "hi", "2024-01-01T00:00:00")
+    assert messageId is not None
+    assert fakeDriver.statements[-1][1]["messageId"] == messageId
+
+
+def testOnlyWritesAreReplayed(fakeDriver):
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    with api.batch() as batch:
+        batch.getFriendsAndFamily("a")
+        batch.deleteUser("a")
+    assert [name for name, _, _ in batch.writes] == ["deleteUser"]
+
+
+def testFailedCommitRaisesAndInvalidatesNothing(fakeDriver):
+    fakeDriver.respond = lambda query, parameters: [{"connection": {"userId": "b"}}]
+    fakeDriver.failCommit = RuntimeError("commit failed")
+    api = SocialNetworkAPI("bolt://test", "user", "password", cacheSize=10)
+    api.getFriendsAndFamily("a")
+    with pytest.raises(RuntimeError, match="commit failed"):
+        with api.batch() as batch:
+            batch.deleteUser("a")
+    assert not batch.committed
+    assert api.cacheStats()["size"] == 1
+
+
+def testRaisingBlockRollsBack(fakeDriver):
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    with pytest.raises(KeyError):
+        with api.batch() as batch:
+            batch.deleteUser("a")
+            raise KeyError("a")
+    assert (fakeDriver.commits, fakeDriver.rollbacks) == (0, 1)
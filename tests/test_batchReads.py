@@ -0,0 +1,49 @@
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def connectionsOf(query, parameters):
+    return [{"userId": userId, "connections": [[userId + "1", userId.upper()]]}
+            for userId in parameters["userIds"] if userId != "ghost"]
+
+
+def testFriendsAndFamilyManyIsOneRoundTripPerChunkOfDistinctIds(fakeDriver):
+    fakeDriver.respond = connectionsOf
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    results = api.getFriendsAndFamilyMany(["a", "b", "a", "ghost", "c"], "tuple", batchSize=2)
+    assert results == {"a": [("a1", "A")], "b": [("b1", "B")], "ghost": None, "c": [("c1", "C")]}
+    assert [parameters["userIds"] for _, parameters in fakeDriver.statements] == [["a", "b"], ["ghost", "c"]]
+
+
+def testCachedIdsAreServedWithoutAQuery(fakeDriver):
+    fakeDriver.respond = connectionsOf
+    api = SocialNetworkAPI("bolt://test", "user", "password", cacheSize=10)
+    first = api.getFriendsAndFamilyMany(["a", "b"], "tuple")
+    first["a"].append("mutated")
+    assert api.getFriendsAndFamilyMany(["b", "c", "a"], "tuple") == {
+        "b": [("b1", "B")], "c": [("c1", "C")], "a": [("a1", "A")]}
+    assert [parameters["userIds"] for _, parameters in fakeDriver.statements] == [["a", "b"], ["c"]]
+
+
+def testAFailedChunkMapsItsIdsToNone(fakeDriver, capsys):
+    def respond(query, parameters):
+        if "b" in parameters["userIds"]:
+            raise RuntimeError("timeout")
+        return connectionsOf(query, parameters)
+
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.getFriendsAndFamilyMany(["a", "b"], "tuple", batchSize=1) == {"a": [("a1", "A")], "b": None}
+    assert "Error retrieving friends and family: timeout" in capsys.readouterr().out
+
+
+def testConversationsAreFetchedOncePerUnorderedPair(fakeDriver):
+    def respond(query, parameters):
+        return [{"pair": pair, "messages": [["m1", pair[0], pair[1], "hi", None]]} for pair in parameters["pairs"]]
+
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    results = api.getFullConversationMany([("b", "a"), ("a", "b"), ("a", "c")], "tuple")
+    assert fakeDriver.statements[0][1]["pairs"] == [["a", "b"], ["a", "c"]]
+    assert results[("a", "b")] == results[("b", "a")] == [("m1", "a", "b", "hi", None)]
+    assert results[("a", "b")] is not results[("b", "a")]
+    assert list(results) == [("b", "a"), ("a", "b"), ("a", "c")]
@@ -0,0 +1,23 @@
+import pytest
+
+from benchmark import percentile, summarise
+
+
+@pytest.mark.parametrize("samples, fraction, expected", [
+    ([1, 2, 3], 0.5, 2),
+    ([1, 2, 3, 4], 0.5, 2),
+    ([1, 2, 3, 4, 5], 0.5, 3),
+    (list(range(1, 101)), 0.95, 95),
+    (list(range(1, 101)), 0.99, 99),
+    (list(range(1, 11)), 0.95, 10),
+    ([7], 0.01, 7),
+    ([], 0.5, None),
+])
+def testPercentileIsTheNearestRank(samples, fraction, expected):
+    assert percentile(samples, fraction) == expected
+
+
+def testSummarise():
+    summary = summarise([3.0, 1.0, 2.0, 4.0], 2.0)
+    assert (summary["calls"], summary["p50"], summary["p99"], summary["max"], summary["throughput"]) == (
+        4, 2.0, 4.0, 4.0, 2.0)
@@ -0,0 +1,57 @@
+import pytest
+
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def draining(remaining):
+    # Answers each batch with min(batchSize, what is left) of its kind, like the LIMITed deletes.
+    def respond(query, parameters):
+        kind = "nodes" if "DETACH DELETE" in query else "relationships"
+        deleted = min(parameters["batchSize"], remaining[kind])
+        remaining[kind] -= deleted
+        return [{"deleted": deleted}]
+
+    return respond
+
+
+def testDeleteDrainsRelationshipsThenNodesInCommittedBatches(fakeDriver):
+    fakeDriver.respond = draining({"relationships": 5, "nodes": 4})
+    progress = []
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.delete(batchSize=2, progress=lambda *args: progress.append(args)) == {"relationships": 5, "nodes": 4}
+    assert progress == [("relationships", 2), ("relationships", 4), ("relationships", 5), ("nodes", 2), ("nodes", 4)]
+    assert all("LIMIT $batchSize" in query for query in fakeDriver.queries())
+    assert not any(query == "MATCH (n) DETACH DELETE n" for query in fakeDriver.queries())
+
+
+def testAFailedBatchStopsThePhaseAndReportsHowFarItGot(fakeDriver, capsys):
+    calls = []
+
+    def respond(query, parameters):
+        calls.append(query)
+        if len(calls) == 2:
+            raise RuntimeError("lock timeout")
+        return [{"deleted": parameters["batchSize"] if len(calls) == 1 else 0}]
+
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    deleted = api.deleteLabel("User", batchSize=3)
+    assert deleted == {"relationships": 3, "nodes": 0}
+    assert "Error deleting relationships after 3 rows: lock timeout" in capsys.readouterr().out
+
+
+def testDeleteLabelClearsTheLabelsAggregatesFirst(fakeDriver):
+    fakeDriver.respond = draining({"relationships": 1, "nodes": 1})
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    api.deleteLabel("Message", batchSize=10)
+    assert [query.split(" WITH")[0] for query in fakeDriver.queries()] == [
+        "MATCH (n)-[r:MESSAGED]-()", "MATCH (n:Message)-[r]-()", "MATCH (n:Message)"]
+    with pytest.raises(ValueError, match="Cannot delete label"):
+        api.deleteLabel("Tag` DETACH DELETE n //")
+
+
+def testDeleteUsersWorksThroughTheIdsInChunks(fakeDriver):
+    fakeDriver.respond = lambda query, parameters: [{"deleted": len(parameters["userIds"]) // 2}]
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.deleteUsers(["a", "b", "c"], batchSize=2) == {"relationships": 1, "nodes": 1}
+    assert [parameters["userIds"] for _, parameters in fakeDriver.statements] == [["a", "b"], ["a", "b"], ["c"], ["c"]]
@@ -0,0 +1,37 @@
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def testUsersAreWrittenInChunksFromAnyRowShape(fakeDriver):
+    fakeDriver.respond = lambda query, parameters: ([], {"nodes_created": len(parameters["rows"]) - 1})
+    api = SocialNetworkAPI("bolt://test", "user", "password", batchSize=2)
+    counters = api.createUsers({"a": "Ann", "b": "Bob", "c": "Cid"})
+    assert [parameters["rows"] for _, parameters in fakeDriver.statements] == [
+        [{"userId": "a", "name": "Ann"}, {"userId": "b", "name": "Bob"}], [{"userId": "c", "name": "Cid"}]]
+    assert counters == [{"rows": 2, "created": 1, "merged": 1, "failed": 0, "batch": 0},
+                        {"rows": 1, "created": 0, "merged": 1, "failed": 0, "batch": 1}]
+    api.createCompanies([("acme", "Acme")])
+    api.createUniversities([{"userId": "mit", "name": "MIT"}])
+    assert [parameters["rows"] for _, parameters in fakeDriver.statements[2:]] == [
+        [{"userId": "acme", "name": "Acme"}], [{"userId": "mit", "name": "MIT"}]]
+    assert "MERGE (u:User:Company" in fakeDriver.statements[2][0]
+    assert "MERGE (u:User:University" in fakeDriver.statements[3][0]
+
+
+def testConnectionCountersComeFromTheMatchedRows(fakeDriver):
+    fakeDriver.respond = lambda query, parameters: ([{"matched": [0, 2]}], {"relationships_created": 1})
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    counters = api.createConnections([("a", "b", "friend"), ("a", "missing", "friend"), ("b", "c", "family")])
+    assert counters == [{"rows": 3, "created": 1, "merged": 1, "failed": 1, "batch": 0}]
+
+
+def testAFailedBatchIsCountedAndTheRestAreWritten(fakeDriver, capsys):
+    def failSecondBatch(query, parameters):
+        if parameters["rows"][0]["userId"] == "c":
+            raise RuntimeError("batch rejected")
+        return [], {"nodes_created": len(parameters["rows"])}
+
+    fakeDriver.respond = failSecondBatch
+    api = SocialNetworkAPI("bolt://test", "user", "password", batchSize=2)
+    counters = api.createUsers([(userId, userId.upper()) for userId in "abcde"])
+    assert [(batch["created"], batch["failed"]) for batch in counters] == [(2, 0), (0, 2), (1, 0)]
+    assert "Error creating users (batch 1): batch rejected" in capsys.readouterr().out
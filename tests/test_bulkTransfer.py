@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+from bulkTransfer import DEADLOCK_DETECTED, importDirectory, importRows, partition
+from inMemoryGraph import InMemorySocialNetworkAPI
+from socialNetworkLegacy import SocialNetworkAPI
+
+USERS = [{"userId": f"u{index}", "name": f"User {index}"} for index in range(20)]
+
+
+def respond(query, parameters):
+    return [], {"nodes_created": len(parameters["rows"])}
+
+
+def runImport(api, section, rows, **options):
+    # Runs on a thread so that a wedged producer fails the test instead of hanging it.
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(result=importRows(api, section, rows, **options)),
+                              daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive(), "import did not finish"
+    return outcome["result"]
+
+
+@pytest.fixture
+def api(fakeDriver):
+    fakeDriver.respond = respond
+    return SocialNetworkAPI("bolt://test", "user", "password")
+
+
+def testEveryRowIsWrittenOnce(api, fakeDriver):
+    result = runImport(api, "users", iter(USERS), workers=3, batchSize=4)
+    assert result == {"rows": 20, "created": 20, "merged": 0, "failed": 0}
+    written = [row["userId"] for _, parameters in fakeDriver.statements for row in parameters["rows"]]
+    assert sorted(written) == sorted(row["userId"] for row in USERS)
+
+
+def testRowsSharingAPartitionNodeGoThroughOneWorker(api, fakeDriver):
+    workersByUser = {}
+
+    def recordWorker(query, parameters):
+        for row in parameters["rows"]:
+            workersByUser.setdefault(row["userId2"], set()).add(threading.current_thread().name)
+        return [{"matched": list(range(len(parameters["rows"])))}]
+
+    fakeDriver.respond = recordWorker
+    rows = [{"userId1": f"u{index}", "userId2": f"hub{index % 3}", "connectionType": "friend"} for index in range(30)]
+    runImport(api, "connections", iter(rows), workers=4, batchSize=2)
+    assert all(len(workers) == 1 for workers in workersByUser.values())
+    assert {userId: workers.pop() for userId, workers in workersByUser.items()} == {
+        f"hub{index}": f"import-connections-{partition(f'hub{index}', 4)}" for index in range(3)}
+
+
+def testTheProducerStopsAQueueAheadOfABlockedWorker(api, fakeDriver):
+    release = threading.Event()
+    pulled = []
+
+    def rows():
+        for row in USERS:
+            pulled.append(row)
+            yield row
+
+    def blockedWrite(query, parameters):
+        release.wait(5)
+        return respond(query, parameters)
+
+    fakeDriver.respond = blockedWrite
+    thread = threading.Thread(target=importRows, args=(api, "users", rows()),
+                              kwargs={"workers": 1, "batchSize": 1, "queueSize": 2}, daemon=True)
+    thread.start()
+    time.sleep(0.2)
+    # One batch in the worker, two queued and one waiting to be put.
+    assert len(pulled) == 4
+    release.set()
+    thread.join(5)
+    assert len(pulled) == len(USERS)
+
+
+class DeadlockDetected(Exception):
+    code = DEADLOCK_DETECTED
+
+
+def testDeadlockedBatchesAreRetried(api, fakeDriver):
+    attempts = []
+
+    def deadlockTwice(query, parameters):
+        attempts.append(parameters["rows"][0]["userId"])
+        if len(attempts) <= 2:
+            raise DeadlockDetected()
+        return respond(query, parameters)
+
+    fakeDriver.respond = deadlockTwice
+    result = runImport(api, "users", iter(USERS[:1]), workers=1)
+    assert (result["created"], result["failed"], len(attempts)) == (1, 0, 3)
+
+
+def testFailedBatchesAreCountedAndTheImportFinishes(api, monkeypatch):
+    def failSession(**config):
+        raise RuntimeError("no session")
+
+    monkeypatch.setattr(api, "_session", failSession)
+    result = runImport(api, "users", iter(USERS), workers=2, batchSize=1, queueSize=1)
+    assert result == {"rows": 20, "created": 0, "merged": 0, "failed": 20}
+
+
+def testAFailingAfterBatchHookKeepsTheWorkerDraining(api, monkeypatch, capsys):
+    def failInvalidation(rows):
+        raise RuntimeError("invalidation failed")
+
+    api.driver.respond = lambda query, parameters: [{"matched": list(range(len(parameters["rows"])))}]
+    monkeypatch.setattr(api, "_invalidateConnections", failInvalidation)
+    rows = [{"userId1": "u0", "userId2": f"u{index}", "connectionType": "friend"} for index in range(1, 20)]
+    result = runImport(api, "connections", iter(rows), workers=2, batchSize=1, queueSize=1)
+    assert (result["rows"], result["failed"]) == (19, 0)
+    assert "invalidation failed" in capsys.readouterr().out
+
+
+def testInMemoryImportKeepsTheIdsOfTheRows(tmp_path):
+    (tmp_path / "users.csv").write_text("userId,name\na,Ann\nb,Bob\n")
+    (tmp_path / "connections.jsonl").write_text('{"userId1": "a", "userId2": "b", "connectionType": "friend"}\n')
+    (tmp_path / "messages.jsonl").write_text(
+        '{"messageId": "m1", "senderId": "a", "receiverId": "b", "content": "hi", "timestamp": "2024-01-01T00:00:00"}\n'
+        '{"messageId": "m2", "senderId": "b", "receiverId": "missing", "content": "hi", '
+        '"timestamp": "2024-01-01T00:00:00"}\n')
+    (tmp_path / "posts.csv").write_text("postId,userId,title,content,timestamp\np1,a,hello,hi all,2024-01-01T00:00:00\n")
+    api = InMemorySocialNetworkAPI()
+    results = importDirectory(api, str(tmp_path))
+    assert {section: result["failed"] for section, result in results.items()} == {
+        "users": 0, "connections": 0, "messages": 1, "posts": 0}
+    assert api.getFriendsAndFamily("a", "tuple") == [("b", "Bob")]
+    assert [message.messageId for message in api.getFullConversation("a", "b", "record")] == ["m1"]
+    assert [post.postId for post in api.getFeed("b", projection="record")[0]] == ["p1"]
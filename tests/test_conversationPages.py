@@ -0,0 +1,48 @@
+import pytest
+
+from socialNetworkLegacy import SocialNetworkAPI
+
+MESSAGE_IDS = [f"m{index}" for index in range(1, 6)]
+
+
+def respond(query, parameters):
+    # Keyset paging over five messages, as the ORDER BY / LIMIT in the query would return them.
+    descending = "ORDER BY key DESC" in query
+    cursor = parameters["cursor"]
+    keys = sorted(MESSAGE_IDS, reverse=descending)
+    if cursor is not None:
+        keys = [key for key in keys if (key < cursor if descending else key > cursor)]
+    return [{"messageId": key, "senderId": "a", "receiverId": "b", "content": key, "timestamp": None, "key": key}
+            for key in keys[:parameters["pageSize"]]]
+
+
+@pytest.fixture
+def api(fakeDriver):
+    fakeDriver.respond = respond
+    return SocialNetworkAPI("bolt://test", "user", "password")
+
+
+def testAFullPageCarriesTheCursorAndAShortPageEndsTheConversation(api, fakeDriver):
+    page, cursor = api.getConversationPage("a", "b", 2, projection="tuple")
+    assert ([message[0] for message in page], cursor) == (["m1", "m2"], "m2")
+    page, cursor = api.getConversationPage("a", "b", 4, after=cursor, projection="tuple")
+    assert ([message[0] for message in page], cursor) == (["m3", "m4", "m5"], None)
+    assert fakeDriver.statements[1][1]["cursor"] == "m2"
+
+
+def testIterConversationStreamsEveryPageInEitherOrder(api, fakeDriver):
+    assert [message.messageId for message in api.iterConversation("a", "b", 2, projection="record")] == MESSAGE_IDS
+    assert len(fakeDriver.statements) == 3
+    newestFirst = api.iterConversation("a", "b", 2, newestFirst=True, projection="record")
+    assert [message.messageId for message in newestFirst] == MESSAGE_IDS[::-1]
+    before = api.iterConversation("a", "b", 2, before="m4", projection="tuple")
+    assert [message[0] for message in before] == ["m3", "m2", "m1"]
+
+
+def testCursorsAndProjectionsAreChecked(api):
+    with pytest.raises(ValueError):
+        api.getConversationPage("a", "b", after="m1", before="m3")
+    with pytest.raises(ValueError):
+        api.getConversationPage("a", "b", after="m1", newestFirst=True)
+    with pytest.raises(ValueError):
+        next(api.iterConversation("a", "b", projection="columns"))
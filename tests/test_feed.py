@@ -0,0 +1,76 @@
+import pytest
+
+from feed import FeedConfig
+from inMemoryGraph import InMemorySocialNetworkAPI
+from relationships import RelationshipModel
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def respond(query, parameters):
+    for count in ("pushed", "matched", "marked", "rebuilt"):
+        if f"AS {count}" in query:
+            return [{count: 0}]
+    if "RETURN user.userId AS userId ORDER BY userId" in query:
+        return [{"userId": userId} for userId in ("a", "b") if userId > parameters["cursor"]]
+    return []
+
+
+def testPostsFanOutUnderTheConfiguredThreshold(fakeDriver):
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password", feed=FeedConfig(timelineSize=50, fanOutLimit=3))
+    postId = api.createPost("a", "Hi", "hello", "2024-01-01T00:00:00")
+    assert len(fakeDriver.statements) == 2
+    query, parameters = fakeDriver.statements[-1]
+    assert "COUNT { (author)-[:CONNECTED_TO]-() } > $fanOutLimit" in query
+    assert "SET author:FeedHub" in query and "WHERE NOT author:FeedHub" in query
+    assert parameters == {"rows": [{"userId": "a", "postId": postId}], "fanOutLimit": 3, "timelineSize": 50}
+
+
+def testTheHubDegreeIsCountedOverTheTypedRelationships(fakeDriver):
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password", feed=FeedConfig(fanOutLimit=0),
+                           relationships=RelationshipModel("typed"))
+    api.createPosts([("a", "One", "x", "2024-01-01T00:00:00"), ("b", "Two", "y", "2024-01-02T00:00:00")])
+    query, parameters = fakeDriver.statements[-1]
+    assert "COUNT { (author)-[:FRIEND|FAMILY|WORK|ACADEMIC]-() } > $fanOutLimit" in query
+    assert [row["userId"] for row in parameters["rows"]] == ["a", "b"] and parameters["fanOutLimit"] == 0
+
+
+def testWithoutAFeedConfigPostsDoNotFanOut(fakeDriver):
+    fakeDriver.respond = respond
+    SocialNetworkAPI("bolt://test", "user", "password").createPost("a", "Hi", "hello", "2024-01-01T00:00:00")
+    assert len(fakeDriver.statements) == 1
+
+
+def testRebuildMarksHubsWithTheConfiguredLimitBeforeTheTimelines(fakeDriver):
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password", feed=FeedConfig(timelineSize=7, fanOutLimit=2))
+    assert api.rebuildFeeds(batchSize=10) == "b"
+    (marking, marked), (_, page), (rebuilding, rebuilt), _ = fakeDriver.statements
+    assert "SET user:FeedHub" in marking and marked == {"fanOutLimit": 2, "batchSize": 10}
+    assert "WHERE NOT author:FeedHub" in rebuilding and rebuilt == {"userIds": ["a", "b"], "timelineSize": 7}
+    fakeDriver.statements.clear()
+    api.rebuildFeeds(startAfter="b")
+    assert not any("SET user:FeedHub" in query for query in fakeDriver.queries())
+
+
+def testInvalidConfigsAreRejected():
+    with pytest.raises(ValueError, match="timelineSize"):
+        FeedConfig(timelineSize=0)
+    with pytest.raises(ValueError, match="fanOutLimit"):
+        FeedConfig(fanOutLimit=-1)
+
+
+def testFeedPagesByPostIdNewestFirst():
+    api = InMemorySocialNetworkAPI(feed=FeedConfig(fanOutLimit=1))
+    api.createUsers({"a": "A", "b": "B", "c": "C"})
+    api.createCompanies({"acme": "Acme"})
+    api.createConnections([("a", "b", "friend"), ("a", "acme", "work"), ("c", "acme", "work")])
+    for userId, timestamp in (("b", "2024-01-01"), ("acme", "2024-01-02"), ("c", "2024-01-03"),
+                              ("b", "2024-01-04")):
+        api.createPost(userId, userId, timestamp, timestamp + "T00:00:00")
+    page, cursor = api.getFeed("a", 2, projection="tuple")
+    assert [post[3] for post in page] == ["2024-01-04", "2024-01-02"]
+    page, cursor = api.getFeed("a", 2, cursor, projection="tuple")
+    assert [post[3] for post in page] == ["2024-01-01"] and cursor is None
+    assert [post[3] for post in api.iterFeed("a", 1, projection="tuple")] == ["2024-01-04", "2024-01-02", "2024-01-01"]
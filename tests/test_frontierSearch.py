@@ -0,0 +1,60 @@
+from frontierSearch import capFanOut, hopSearch, reachableSearch, runSearch, runSearchSteps, shortestPathSearch
+
+# a - b - c - d, a - e - d, f alone.
+GRAPH = {"a": ["b", "e"], "b": ["a", "c"], "c": ["b", "d"], "d": ["c", "e"], "e": ["a", "d"], "f": []}
+
+
+def expand(frontier):
+    return [(node, neighbour) for node in frontier for neighbour in GRAPH[node]]
+
+
+def testHopSearchReturnsMinimumDistancesNearestFirst():
+    assert runSearch(hopSearch("a", 3), expand) == [("c", 2), ("d", 2)]
+    assert runSearch(hopSearch("a", 1), expand) == []
+
+
+def testHopSearchLimits():
+    assert runSearch(hopSearch("a", 3, maxResults=1), expand) == [("c", 2)]
+
+
+def testFanOutIsCappedPerNode():
+    # a - hub - x0..x4, x0 - y: at most two of the hub's edges are followed, the one back to a included.
+    star = {"a": ["hub"], "hub": ["a"] + [f"x{index}" for index in range(5)], "x0": ["hub", "y"], "y": ["x0"],
+            **{f"x{index}": ["hub"] for index in range(1, 5)}}
+
+    def expandStar(frontier):
+        return [(node, neighbour) for node in frontier for neighbour in star.get(node, ())]
+
+    assert runSearch(hopSearch("a", 3, maxFanOut=2), expandStar) == [("x0", 2), ("y", 3)]
+    assert runSearch(reachableSearch("a", 3, maxFanOut=2), expandStar) == {"hub": 1, "x0": 2, "y": 3}
+    assert runSearch(shortestPathSearch("a", "x3", maxFanOut=2), expandStar) is None
+    assert runSearch(shortestPathSearch("a", "x3"), expandStar) == ["a", "hub", "x3"]
+    assert capFanOut([("a", "b"), ("a", "c"), ("b", "c")], 1) == [("a", "b"), ("b", "c")]
+
+
+def testReachableSearch():
+    assert runSearch(reachableSearch("a", 1), expand) == {"b": 1, "e": 1}
+    assert runSearch(reachableSearch("a", 5), expand) == {"b": 1, "e": 1, "c": 2, "d": 2}
+    assert runSearch(reachableSearch("f", 5), expand) == {}
+
+
+def testShortestPathSearch():
+    assert runSearch(shortestPathSearch("a", "d"), expand) == ["a", "e", "d"]
+    assert runSearch(shortestPathSearch("b", "d"), expand) == ["b", "c", "d"]
+    assert runSearch(shortestPathSearch("a", "a"), expand) == ["a"]
+    assert runSearch(shortestPathSearch("a", "f"), expand) is None
+    assert runSearch(shortestPathSearch("b", "d", maxHops=1), expand) is None
+
+
+def testRunSearchStepsDelegatesEachExpansion():
+    def expandSteps(frontier):
+        edges = yield frontier
+        return edges
+
+    steps = runSearchSteps(hopSearch("a", 3), expandSteps)
+    frontier = next(steps)
+    try:
+        while True:
+            frontier = steps.send(expand(frontier))
+    except StopIteration as stop:
+        assert stop.value == [("c", 2), ("d", 2)]
@@ -0,0 +1,65 @@
+import random
+
+import numpy as np
+
+from graphSnapshot import GraphSnapshot, LABEL_BITS, exportInMemory
+from inMemoryGraph import InMemorySocialNetworkAPI
+
+
+def randomGraph(seed=7, users=30, connections=70):
+    rng = random.Random(seed)
+    api = InMemorySocialNetworkAPI()
+    api.createUsers({f"user{index:02d}": f"User {index}" for index in range(users)})
+    api.createCompanies({"acme": "Acme"})
+    userIds = [f"user{index:02d}" for index in range(users)] + ["acme"]
+    rows = []
+    while len(rows) < connections:
+        userId1, userId2 = rng.sample(userIds, 2)
+        rows.append((userId1, userId2, rng.choice(("friend", "family", "work"))))
+    api.createConnections(rows)
+    return api, userIds
+
+
+def testSaveAndLoadRoundTripsEveryArrayMemoryMapped(tmp_path):
+    api, _ = randomGraph()
+    snapshot = exportInMemory(api, tmp_path)
+    loaded = GraphSnapshot.load(tmp_path)
+    assert isinstance(loaded.neighbours, np.memmap)
+    for name in ("offsets", "neighbours", "edgeTypes", "userIds", "labels"):
+        assert np.array_equal(getattr(loaded, name), getattr(snapshot, name))
+    assert loaded.types == snapshot.types
+    assert loaded.labels[loaded.indexOf(["acme"])[0]] == LABEL_BITS["Company"]
+    assert list(loaded.indexOf(["user03", "nobody"])) == [4, -1]
+    assert int(loaded.degrees().sum()) == 2 * 70
+
+
+def testKHopMatchesTheInMemoryHopSearch(tmp_path):
+    api, userIds = randomGraph()
+    snapshot = exportInMemory(api, tmp_path)
+    offsets, nodes, hops = GraphSnapshot.load(tmp_path).kHop(snapshot.indexOf(userIds), 3)
+    for source, userId in enumerate(userIds):
+        reached = {(str(snapshot.userIds[node]), int(hop))
+                   for node, hop in zip(nodes[offsets[source]:offsets[source + 1]],
+                                        hops[offsets[source]:offsets[source + 1]])}
+        expected = {(user[0], hop) for user, hop in api.findConnectionsByHops(userId, 3, projection="tuple")}
+        assert {pair for pair in reached if pair[1] >= 2} == expected
+
+
+def testFamilyOfFamilyMatchesTheInMemoryBackend(tmp_path):
+    api, userIds = randomGraph()
+    exportInMemory(api, tmp_path)
+    snapshot = GraphSnapshot.load(tmp_path)
+    offsets, nodes = snapshot.familyOfFamily(snapshot.indexOf(userIds))
+    for source, userId in enumerate(userIds):
+        reached = {str(snapshot.userIds[node]) for node in nodes[offsets[source]:offsets[source + 1]]}
+        assert reached == {user[0] for user in api.getFamilyOfFamily(userId, "tuple")} - {userId}
+
+
+def testCommonNeighbourCountsSkipDirectNeighbours():
+    snapshot = GraphSnapshot.build([("a", 0), ("b", 0), ("c", 0), ("d", 0)],
+                                   [("a", "b", "friend"), ("a", "c", "friend"), ("b", "d", "friend"),
+                                    ("c", "d", "friend"), ("a", "d", "friend"), ("a", "ghost", "friend")])
+    assert list(snapshot.commonNeighbours([0, 1], [3, 2])) == [2, 2]
+    pairs = {(int(source), int(candidate)): int(count)
+             for batch in snapshot.iterCommonNeighbourCounts(batchSize=3) for source, candidate, count in zip(*batch)}
+    assert pairs == {(1, 2): 2, (2, 1): 2}
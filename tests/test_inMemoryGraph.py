@@ -0,0 +1,115 @@
+from math import log
+
+import pytest
+
+from inMemoryGraph import InMemorySocialNetworkAPI
+from projections import UserSummary
+from recommendations import PymkConfig
+
+
+@pytest.fixture
+def api():
+    api = InMemorySocialNetworkAPI()
+    api.createUsers({"a": "Ann", "b": "Bob", "c": "Cid", "d": "Dee", "e": "Eve"})
+    api.createCompany("acme", "Acme")
+    api.createConnections([("a", "b", "friend"), ("b", "c", "family"), ("c", "d", "family"), ("a", "acme", "work"),
+                           ("e", "acme", "work")])
+    return api
+
+
+def testCreateConnectionsCountsEveryOutcome(api):
+    counters = api.createConnections([("a", "b", "friend"), ("a", "c", "friend"), ("a", "missing", "friend")])
+    assert counters == [{"rows": 3, "created": 1, "merged": 1, "failed": 1, "batch": 0}]
+
+
+def testFriendsAndFamilyProjections(api):
+    assert sorted(user.userId for user in api.getFriendsAndFamily("a")) == ["acme", "b"]
+    assert sorted(api.getFriendsAndFamily("b", "tuple")) == [("a", "Ann"), ("c", "Cid")]
+    assert api.getFriendsAndFamily("d", "record") == [UserSummary("c", "Cid")]
+    assert api.getFriendsAndFamily("d", "columns") == {"userId": ["c"], "name": ["Cid"]}
+    assert api.getFriendsAndFamily("missing", "tuple") == []
+
+
+def testFamilyOfFamilyDoesNotWalkBackAlongTheSameEdge(api):
+    assert api.getFamilyOfFamily("b", "tuple") == [("d", "Dee")]
+    assert api.getFamilyOfFamily("a", "tuple") == []
+
+
+def testDeleteConnection(api):
+    api.deleteConnection("a", "b")
+    assert api.getFriendsAndFamily("a", "tuple") == [("acme", "Acme")]
+
+
+def testHopsAndShortestConnection(api):
+    assert api.findConnectionsByHops("a", 3, projection="tuple") == [
+        (("c", "Cid"), 2), (("e", "Eve"), 2), (("d", "Dee"), 3)]
+    assert api.shortestConnection("a", "d") == ["a", "b", "c", "d"]
+    assert api.shortestConnection("a", "d", maxHops=2) is None
+
+
+def conversation(api):
+    return [api.createMessage("a" if minute % 2 else "b", "b" if minute % 2 else "a", f"m{minute}",
+                              f"2024-01-01T00:0{minute}:00") for minute in range(5)]
+
+
+def testConversationPagesOldestFirst(api):
+    messageIds = conversation(api)
+    first, cursor = api.getConversationPage("a", "b", 2)
+    second, _ = api.getConversationPage("a", "b", 2, after=cursor)
+    assert [message.messageId for message in first + second] == messageIds[:4]
+    assert [message.messageId for message in api.iterConversation("a", "b", 2)] == messageIds
+
+
+def testConversationPagesNewestFirst(api):
+    messageIds = conversation(api)
+    page, cursor = api.getConversationPage("a", "b", 2, newestFirst=True)
+    assert [message.messageId for message in page] == messageIds[:2:-1]
+    page, _ = api.getConversationPage("a", "b", 2, before=cursor)
+    assert [message.messageId for message in page] == messageIds[2:0:-1]
+    assert [message.messageId for message in api.iterConversation("a", "b", 2, newestFirst=True)] == messageIds[::-1]
+
+
+def testConversationCursorMustMatchTheDirection(api):
+    messageIds = conversation(api)
+    with pytest.raises(ValueError):
+        api.getConversationPage("a", "b", 2, after=messageIds[0], newestFirst=True)
+    with pytest.raises(ValueError):
+        api.getConversationPage("a", "b", 2, after=messageIds[0], before=messageIds[1])
+
+
+def testAdamicAdarSkipsMiddlesOnlyConnectedToTheUser():
+    api = InMemorySocialNetworkAPI(pymk=PymkConfig(scoring="adamicAdar"))
+    api.createUsers({"a": "Ann", "b": "Bob", "c": "Cid", "leaf": "Leaf"})
+    api.createConnections([("a", "b", "friend"), ("b", "c", "friend"), ("leaf", "a", "friend")])
+    assert api.getPeopleYouMayKnow("leaf", projection="tuple") == [(("b", "Bob"), 1 / log(2))]
+    assert [user for user, _ in api.getPeopleYouMayKnow("a", projection="tuple")] == [("c", "Cid")]
+
+
+def testPeopleYouMayKnowSkipsCompaniesAndKnownUsers(api):
+    assert api.getPeopleYouMayKnow("a", projection="tuple") == [(("c", "Cid"), 1.0), (("e", "Eve"), 1.0)]
+    assert api.getPeopleYouMayKnow("acme") == []
+
+
+def testFeedPagesNewestFirst(api):
+    postIds = [api.createPost("b", f"t{day}", "hello", f"2024-01-0{day}T00:00:00") for day in range(1, 4)]
+    posts, cursor = api.getFeed("a", 2)
+    assert [post.postId for post in posts] == postIds[:0:-1]
+    posts, cursor = api.getFeed("a", 2, before=cursor)
+    assert ([post.postId for post in posts], cursor) == ([postIds[0]], None)
+
+
+def testUsersAddedAfterAReadAreCovered(api):
+    api.getFriendsAndFamily("a")
+    api.createUser("f", "Fay")
+    assert api.getFriendsAndFamily("f", "tuple") == []
+    assert api.findConnectionsByHops("f", 2) == []
+    api.createConnection("f", "a", "friend")
+    assert api.getFriendsAndFamily("f", "tuple") == [("a", "Ann")]
+
+
+def testFanOutIsCappedAtEachNode():
+    api = InMemorySocialNetworkAPI()
+    api.createUsers({userId: userId.upper() for userId in ("a", "hub", "x0", "x1", "x2", "x3")})
+    api.createConnections([("a", "hub", "friend")] + [("hub", f"x{index}", "friend") for index in range(4)])
+    assert len(api.findConnectionsByHops("a", 2)) == 4
+    assert api.findConnectionsByHops("a", 2, maxFanOut=2, projection="tuple") == [(("x0", "X0"), 2)]
@@ -0,0 +1,32 @@
+from inMemoryGraph import InMemorySocialNetworkAPI
+from mentions import parseMentions
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def testMentionsAreParsedOnceInOrderWithoutTrailingPunctuation():
+    assert parseMentions("@b, @c.d. and @b again; mail a@b.com") == ["b", "c.d"]
+    assert parseMentions(None) == []
+
+
+def testPostsWriteMentionEdgesFromTheParsedIds(fakeDriver):
+    fakeDriver.respond = lambda query, parameters: [{"matched": len(parameters["rows"])}]
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    api.createPost("a", "Hello", "hi @b and @c", "2024-01-01T00:00:00")
+    query, parameters = fakeDriver.statements[-1]
+    assert parameters["mentions"] == ["b", "c"] and "CREATE (post)-[:MENTIONS]->(mentioned)" in query
+    counters = api.createPosts([("a", "One", "@b", "2024-01-01T00:00:00"), ("b", "Two", "none", "2024-01-02T00:00:00")])
+    rows = fakeDriver.statements[-1][1]["rows"]
+    assert [row["mentions"] for row in rows] == [["b"], []]
+    assert all(row["postId"] for row in rows)
+    assert counters == [{"rows": 2, "created": 2, "merged": 0, "failed": 0, "batch": 0}]
+
+
+def testMentionedUsersAreFilteredToColleaguesAndCompanyPeers():
+    api = InMemorySocialNetworkAPI()
+    api.createUsers({"a": "A", "b": "B", "c": "C", "d": "D"})
+    api.createCompanies({"acme": "Acme"})
+    api.createConnections([("a", "b", "work"), ("a", "acme", "work"), ("acme", "c", "work"), ("a", "d", "friend")])
+    api.createPosts([("a", "One", "@b @c @d @nobody", "2024-01-01T00:00:00"),
+                     ("a", "Two", "@b again", "2024-01-02T00:00:00")])
+    assert api.getUsersMentionedWithWorkRelation("a", "tuple") == [("b", "B"), ("c", "C")]
+    assert api.getUsersMentionedWithWorkRelation("missing", "tuple") == []
@@ -0,0 +1,69 @@
+from inMemoryGraph import InMemorySocialNetworkAPI
+from messageIds import messageIdMillis, newMessageId, timestampMillis
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def testIdsSortInTimestampOrderAndKeepTheirTime():
+    timestamps = ["2024-01-01T00:00:00", "2024-01-01T00:00:00.001", "2024-06-01T12:00:00", "2030-01-01T00:00:00"]
+    ids = [newMessageId(timestamp) for timestamp in timestamps]
+    assert sorted(ids) == ids and all(len(messageId) == 26 for messageId in ids)
+    assert [messageIdMillis(messageId) for messageId in ids] == [timestampMillis(timestamp) for timestamp in timestamps]
+
+
+def testIdsMintedForTheSameInstantKeepCreationOrder():
+    ids = [newMessageId("2024-01-01T00:00:00") for _ in range(50)]
+    assert sorted(ids) == ids and len(set(ids)) == 50
+
+
+def testBackfillRunsUntilAShortBatch(fakeDriver):
+    missing = [f"m{index}" for index in range(5)]
+
+    def respond(query, parameters):
+        if "message.messageId IS NULL" in query:
+            return [{"key": key, "timestamp": "2024-01-01T00:00:00"} for key in missing[:parameters["batchSize"]]]
+        for row in parameters["rows"]:
+            missing.remove(row["key"])
+        return []
+
+    fakeDriver.respond = respond
+    progress = []
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.backfillMessageIds(batchSize=2, progress=lambda *args: progress.append(args)) == 5
+    assert progress == [("messageIds", 2), ("messageIds", 4), ("messageIds", 5)]
+    assert missing == []
+
+
+def testDeleteMessageReportsWhetherTheIdExisted(fakeDriver):
+    fakeDriver.respond = lambda query, parameters: ([], {"nodes_deleted": int(parameters["messageId"] == "m1")})
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.deleteMessage("m1") is True
+    assert api.deleteMessage("gone") is False
+    assert "SET messaged.count = messaged.count - 1" in fakeDriver.queries()[0]
+
+
+def testPurgeDeletesOnlyOlderMessages():
+    api = InMemorySocialNetworkAPI()
+    api.createUsers({"a": "A", "b": "B"})
+    oldId = api.createMessage("a", "b", "old", "2023-01-01T00:00:00")
+    newId = api.createMessage("a", "b", "new", "2024-01-01T00:00:00")
+    progress = []
+    assert api.purgeMessagesBefore("2023-06-01T00:00:00", progress=lambda *args: progress.append(args)) == 1
+    assert progress == [("messages", 1)]
+    assert api.deleteMessage(oldId) is False
+    assert [message.messageId for message in api.getFullConversation("a", "b")] == [newId]
+    assert api.deleteMessage(newId) is True
+
+
+def testPurgeRunsCommittedBatchesUntilNothingIsLeft(fakeDriver):
+    remaining = [5]
+
+    def respond(query, parameters):
+        deleted = min(parameters["batchSize"], remaining[0])
+        remaining[0] -= deleted
+        return [], {"nodes_deleted": deleted}
+
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.purgeMessagesBefore("2024-01-01T00:00:00", batchSize=2) == 5
+    assert len(fakeDriver.statements) == 3
+    assert "ORDER BY message.timestamp LIMIT $batchSize" in fakeDriver.queries()[0]
@@ -0,0 +1,50 @@
+from inMemoryGraph import InMemorySocialNetworkAPI
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def testCandidatesAreCountedFromReachableSendersWithinMaxDepth():
+    # a - b - c - d in a line; b and c both message e, d messages f, a messages its own friend b.
+    api = InMemorySocialNetworkAPI()
+    api.createUsers({userId: userId.upper() for userId in "abcdef"})
+    api.createConnections([("a", "b", "friend"), ("b", "c", "friend"), ("c", "d", "friend")])
+    for senderId, receiverId in (("b", "e"), ("c", "e"), ("c", "e"), ("d", "f"), ("a", "b")):
+        api.createMessage(senderId, receiverId, "hi", "2024-01-01T00:00:00")
+    assert api.findConnectionsByMessages("a", 1, projection="tuple") == [(("e", "E"), 2), (("f", "F"), 1)]
+    assert api.findConnectionsByMessages("a", 2, projection="tuple") == [(("e", "E"), 2)]
+    assert api.findConnectionsByMessages("a", 1, maxDepth=1, projection="tuple") == [(("e", "E"), 1)]
+
+
+def testTheCypherEngineExpandsAtMostMaxDepthLevels(fakeDriver):
+    def respond(query, parameters):
+        if "neighbourId" in query:
+            return [{"sourceId": sourceId, "neighbourId": sourceId + "x"} for sourceId in parameters["frontier"]]
+        return [{"userId": "z", "name": "Z", "message_count": 3}]
+
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.findConnectionsByMessages("a", 2, maxDepth=2, projection="tuple") == [(("z", "Z"), 3)]
+    expansions = [query for query in fakeDriver.queries() if "neighbourId" in query]
+    assert len(expansions) == 2
+    assert fakeDriver.statements[-1][1] == {"userId": "a", "senderIds": ["ax", "axx"], "minMessages": 2}
+    assert "[:MESSAGED]" in fakeDriver.statements[-1][0] and ":Message" not in fakeDriver.statements[-1][0]
+
+
+def testCreateMessageMaintainsTheMessagedAggregate(fakeDriver):
+    SocialNetworkAPI("bolt://test", "user", "password").createMessage("a", "b", "hi", "2024-01-01T00:00:00")
+    query = fakeDriver.queries()[-1]
+    assert "MERGE (sender)-[messaged:MESSAGED]->(receiver)" in query
+    assert "messaged.count = coalesce(messaged.count, 0) + 1" in query
+
+
+def testBackfillPagesThroughSendersAndReturnsTheCursor(fakeDriver):
+    def respond(query, parameters):
+        if "RETURN user.userId AS userId" in query:
+            return [{"userId": userId} for userId in "abc" if userId > parameters["cursor"]][:parameters["pageSize"]]
+        return [{"pairs": len(parameters["senderIds"])}]
+
+    fakeDriver.respond = respond
+    progress = []
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.backfillMessagedEdges(batchSize=2, progress=lambda *args: progress.append(args)) == "c"
+    assert progress == [("b", 2), ("c", 1)]
+    assert api.backfillMessagedEdges(batchSize=2, startAfter="c") == "c"
@@ -0,0 +1,125 @@
+import sys
+import threading
+
+from neighbourhoodCache import MISSING, NeighbourhoodCache
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def respond(query, parameters):
+    if "AS connections" in query:
+        return [{"userId": userId, "connections": [["b", "Bob"]]} for userId in parameters["userIds"]]
+    return [{"userId": "b", "name": "Bob"}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def testLeastRecentlyUsedEntryIsEvicted():
+    cache = NeighbourhoodCache(maxSize=2)
+    cache.put("a", 1, {"a"}, ())
+    cache.put("b", 2, {"b"}, ())
+    cache.get("a")
+    cache.put("c", 3, {"c"}, ())
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def testEntriesExpire():
+    clock = Clock()
+    cache = NeighbourhoodCache(ttl=10.0, clock=clock)
+    cache.put("a", 1, {"a"}, ())
+    clock.now = 9.0
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a") is MISSING
+    assert cache.stats()["expirations"] == 1
+
+
+def testConnectionInvalidatesEdgeDependentsOfTheMatchingType():
+    cache = NeighbourhoodCache()
+    cache.put("family", 1, {"a"}, {"b"}, connectionTypes={"family"})
+    cache.put("any", 2, {"a"}, {"b"})
+    cache.invalidateConnection("a", "x", "friend")
+    assert cache.get("family") == 1
+    assert cache.get("any") is MISSING
+    cache.invalidateConnection("x", "a")
+    assert cache.get("family") is MISSING
+
+
+def testConnectionBetweenListedUsersKeepsTheEntry():
+    # b only appears in the result; an edge at b does not change a's neighbourhood.
+    cache = NeighbourhoodCache()
+    cache.put("a", 1, {"a"}, {"b"})
+    cache.invalidateConnection("b", "c")
+    assert cache.get("a") == 1
+
+
+def testUserInvalidatesEveryEntryItAppearsIn():
+    cache = NeighbourhoodCache()
+    cache.put("a", 1, {"a"}, {"b"})
+    cache.put("c", 2, {"c"}, {"b"})
+    cache.put("d", 3, {"d"}, {"e"})
+    cache.invalidateUser("b")
+    assert [cache.get(key) for key in ("a", "c", "d")] == [MISSING, MISSING, 3]
+    cache.clear()
+    assert len(cache) == 0
+
+
+def testConcurrentInvalidationKeepsTheBookkeepingConsistent():
+    cache = NeighbourhoodCache(maxSize=50)
+    errors = []
+
+    def invalidate():
+        try:
+            for index in range(5000):
+                cache.invalidateConnection(f"u{index % 20}", f"u{(index + 1) % 20}", "friend")
+        except Exception as e:
+            errors.append(e)
+
+    # Switching threads as often as possible makes a racy interleaving likely.
+    switchInterval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        thread = threading.Thread(target=invalidate)
+        thread.start()
+        for index in range(5000):
+            userId = f"u{index % 20}"
+            cache.put((userId, index % 3), index, {userId}, {f"u{(index + 7) % 20}"}, connectionTypes={"friend"})
+            cache.get((userId, (index + 1) % 3))
+        thread.join()
+    finally:
+        sys.setswitchinterval(switchInterval)
+    assert errors == []
+    cache.invalidateUser("u0")
+    for index in range(20):
+        cache.invalidateConnection(f"u{index}", "x")
+    assert len(cache) == 0
+    assert cache._edgeDependents == {} and cache._nodeDependents == {}
+
+
+def testApiServesCopiesOnMissesAndHits(fakeDriver):
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password", cacheSize=10)
+    api.getFriendsAndFamily("a", "tuple").append(("x", "X"))
+    api.getFriendsAndFamily("a", "tuple").append(("y", "Y"))
+    assert api.getFriendsAndFamily("a", "tuple") == [("b", "Bob")]
+    api.getFriendsAndFamilyMany(["c"], "tuple")["c"].append(("x", "X"))
+    assert api.getFriendsAndFamily("c", "tuple") == [("b", "Bob")]
+    assert len(fakeDriver.statements) == 2
+
+
+def testApiWritesInvalidate(fakeDriver):
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password", cacheSize=10)
+    api.getFriendsAndFamily("a", "tuple")
+    api.createConnection("a", "c", "friend")
+    api.getFriendsAndFamily("a", "tuple")
+    api.deleteUser("b")
+    api.getFriendsAndFamily("a", "tuple")
+    assert sum("RETURN connection.userId" in query for query in fakeDriver.queries()) == 3
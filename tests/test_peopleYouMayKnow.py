@@ -0,0 +1,80 @@
+from math import log
+
+import pytest
+
+from inMemoryGraph import InMemorySocialNetworkAPI
+from recommendations import PymkConfig
+from socialNetworkLegacy import SocialNetworkAPI
+
+
+def neighbourhood(pymk):
+    # a knows b and c; d shares both of them with a, e only the busy b, f only a's employer acme.
+    api = InMemorySocialNetworkAPI(pymk=pymk)
+    api.createUsers({userId: userId.upper() for userId in "abcdefg"})
+    api.createCompanies({"acme": "Acme"})
+    api.createConnections([("a", "b", "friend"), ("a", "c", "friend"), ("b", "d", "friend"), ("c", "d", "family"),
+                           ("b", "e", "friend"), ("b", "g", "friend"), ("a", "acme", "work"), ("f", "acme", "work")])
+    return api
+
+
+def scores(api, userId="a", limit=None):
+    return {user[0]: round(score, 6) for user, score in api.getPeopleYouMayKnow(userId, limit, "tuple")}
+
+
+def testCommonNeighboursCountSharedConnectionsAndSkipKnownUsers():
+    api = neighbourhood(PymkConfig())
+    assert scores(api) == {"d": 2.0, "e": 1.0, "g": 1.0, "f": 1.0}
+    assert [user[0] for user, _ in api.getPeopleYouMayKnow("a", 2, "tuple")] == ["d", "e"]
+    assert scores(api, "acme") == {}
+
+
+def testAdamicAdarDiscountsBusyMiddles():
+    api = neighbourhood(PymkConfig(scoring="adamicAdar"))
+    assert scores(api) == {"d": round(1 / log(4) + 1 / log(2), 6), "e": round(1 / log(4), 6),
+                           "g": round(1 / log(4), 6), "f": round(1 / log(2), 6)}
+
+
+def testMessagesAddCandidatesAndWeight():
+    api = neighbourhood(PymkConfig(topK=2, messageWeight=2.0))
+    api.createUser("h", "H")
+    for _ in range(3):
+        api.createMessage("h", "a", "hi", "2024-01-01T00:00:00")
+    api.createMessage("a", "e", "hi", "2024-01-01T00:00:00")
+    assert scores(api) == {"h": round(2.0 * log(4), 6), "e": round(1.0 + 2.0 * log(2), 6)}
+
+
+def testInvalidConfigsAreRejected():
+    with pytest.raises(ValueError, match="Unknown scoring"):
+        PymkConfig(scoring="jaccard")
+    with pytest.raises(ValueError, match="topK"):
+        PymkConfig(topK=0)
+
+
+def testConnectionWritesRefreshTheAffectedUsersWithTheConfig(fakeDriver):
+    def respond(query, parameters):
+        if "RETURN DISTINCT userId" in query:
+            return [{"userId": userId} for userId in parameters["userIds"] + ["n"]]
+        if "AS refreshed" in query:
+            return [{"refreshed": len(parameters["userIds"])}]
+        return []
+
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password",
+                           pymk=PymkConfig(topK=5, scoring="adamicAdar", messageWeight=0.5))
+    api.createConnection("a", "b", "friend")
+    query, parameters = fakeDriver.statements[-1]
+    assert "SET user.pymkIds = candidateIds, user.pymkScores = scores" in query
+    assert parameters == {"userIds": ["a", "b", "n"], "topK": 5, "adamicAdar": True, "messageWeight": 0.5}
+
+
+def testWithoutAConfigWritesDoNotRefresh(fakeDriver):
+    SocialNetworkAPI("bolt://test", "user", "password").createConnection("a", "b", "friend")
+    assert len(fakeDriver.statements) == 1
+
+
+def testTheStoredTopKIsReadBackInOrder(fakeDriver):
+    fakeDriver.respond = lambda query, parameters: [{"userId": "d", "name": "D", "score": 2.0},
+                                                    {"userId": "e", "name": "E", "score": 1.0}]
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.getPeopleYouMayKnow("a", 1, "tuple") == [(("d", "D"), 2.0)]
+    assert "ORDER BY position" in fakeDriver.queries()[0]
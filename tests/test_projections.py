@@ -0,0 +1,46 @@
+import pytest
+
+from projections import UserSummary, checkProjection, copyResult, fieldValues, shape, shapePairs
+
+ROWS = [("a", "Ann"), ("b", "Bob")]
+
+
+def testCheckProjection():
+    assert checkProjection("columns") == "columns"
+    with pytest.raises(ValueError):
+        checkProjection("dict")
+
+
+def testShape():
+    assert shape(ROWS, "tuple", UserSummary) == ROWS
+    assert shape(ROWS, "record", UserSummary) == [UserSummary("a", "Ann"), UserSummary("b", "Bob")]
+    assert shape(ROWS, "columns", UserSummary) == {"userId": ["a", "b"], "name": ["Ann", "Bob"]}
+    assert shape([], "columns", UserSummary) == {"userId": [], "name": []}
+
+
+def testShapePairs():
+    pairs = list(zip(ROWS, (2, 3)))
+    assert shapePairs(pairs, "tuple", UserSummary, "hops") == pairs
+    assert shapePairs(pairs, "record", UserSummary, "hops") == [(UserSummary("a", "Ann"), 2),
+                                                               (UserSummary("b", "Bob"), 3)]
+    assert shapePairs(pairs, "columns", UserSummary, "hops") == {"userId": ["a", "b"], "name": ["Ann", "Bob"],
+                                                                "hops": [2, 3]}
+
+
+@pytest.mark.parametrize("projection", [None, "tuple", "record", "columns"])
+def testFieldValues(projection):
+    result = [{"userId": "a"}, {"userId": "b"}] if projection is None else shape(ROWS, projection, UserSummary)
+    assert fieldValues(result, projection, UserSummary, "userId") == ["a", "b"]
+
+
+@pytest.mark.parametrize("projection", ["tuple", "columns"])
+def testCopyResultIsIndependentOfTheOriginal(projection):
+    original = shape(ROWS, projection, UserSummary)
+    copy = copyResult(original)
+    assert copy == original
+    if projection == "columns":
+        copy["userId"].append("c")
+        assert original["userId"] == ["a", "b"]
+    else:
+        copy.append(("c", "Cid"))
+        assert original == ROWS
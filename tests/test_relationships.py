@@ -0,0 +1,55 @@
+import pytest
+
+from relationships import RelationshipModel
+from socialNetworkLegacy import SocialNetworkAPI
+
+PROPERTY = RelationshipModel()
+TYPED = RelationshipModel("typed")
+
+
+def testPatternsForBothModels():
+    assert PROPERTY.connected("r") == "[r:CONNECTED_TO]"
+    assert PROPERTY.connected("", "family") == "[:CONNECTED_TO {type: 'family'}]"
+    assert TYPED.connected("r") == "[r:FRIEND|FAMILY|WORK|ACADEMIC]"
+    assert TYPED.connected("", "family") == "[:FAMILY]"
+    assert (PROPERTY.typeOf("r"), TYPED.typeOf("r")) == ("r.type", "toLower(type(r))")
+    assert PROPERTY.merge("a", "b", "$type") == "MERGE (a)-[:CONNECTED_TO {type: $type}]->(b)"
+    assert TYPED.merge("a", "b", "$type").count("FOREACH") == 4
+
+
+def testOnlyTheTypedModelRestrictsConnectionTypes():
+    PROPERTY.checkTypes(["mentor"])
+    with pytest.raises(ValueError, match="Unknown connection type 'mentor'"):
+        TYPED.checkTypes(["friend", "mentor"])
+    with pytest.raises(ValueError, match="Unknown relationship model"):
+        RelationshipModel("labels")
+
+
+def testTheTypedModelRejectsUnknownTypesBeforeWriting(fakeDriver, capsys):
+    api = SocialNetworkAPI("bolt://test", "user", "password", relationships=TYPED)
+    api.createConnection("a", "b", "mentor")
+    assert fakeDriver.statements == []
+    assert "Unknown connection type 'mentor'" in capsys.readouterr().out
+    api.createConnection("a", "b", "family")
+    assert "MERGE (u1)-[:FAMILY]->(u2)" in fakeDriver.queries()[0]
+
+
+@pytest.mark.parametrize("target, source, written", [(TYPED, "-[old:CONNECTED_TO]->", "MERGE (u1)-[:WORK]->(u2)"),
+                                                     (PROPERTY, "-[old:FRIEND|FAMILY|WORK|ACADEMIC]->",
+                                                      "MERGE (u1)-[:CONNECTED_TO {type: connectionType}]->(u2)")])
+def testMigrationRewritesEdgesInBatchesUntilNoneAreLeft(fakeDriver, target, source, written):
+    remaining = [5]
+
+    def respond(query, parameters):
+        migrated = min(parameters["batchSize"], remaining[0])
+        remaining[0] -= migrated
+        return [{"migrated": migrated}]
+
+    fakeDriver.respond = respond
+    progress = []
+    api = SocialNetworkAPI("bolt://test", "user", "password", relationships=target)
+    assert api.migrateRelationships(batchSize=2, progress=lambda *args: progress.append(args)) == 5
+    assert progress == [("relationships", 2), ("relationships", 4), ("relationships", 5)]
+    query, parameters = fakeDriver.statements[0]
+    assert source in query and written in query and "DELETE old" in query
+    assert parameters == {"connectionTypes": ["friend", "family", "work", "academic"], "batchSize": 2}
@@ -0,0 +1,34 @@
+from socialNetworkLegacy import SCHEMA_STATEMENTS, SocialNetworkAPI
+
+POPULATING = [{"name": "message_timestamp", "state": "POPULATING", "populationPercent": 40.0}]
+
+
+def respond(query, parameters):
+    return POPULATING if query.startswith("SHOW INDEXES") else []
+
+
+def testEveryStatementIsIdempotentAndRunsOnConstruction(fakeDriver):
+    fakeDriver.respond = respond
+    SocialNetworkAPI("bolt://test", "user", "password", ensureSchema=True)
+    queries = fakeDriver.queries()
+    assert queries[:len(SCHEMA_STATEMENTS)] == SCHEMA_STATEMENTS
+    assert all("IF NOT EXISTS" in statement for statement in SCHEMA_STATEMENTS)
+    assert queries[-1].startswith("SHOW INDEXES")
+
+
+def testEnsureSchemaReturnsTheIndexesStillPopulating(fakeDriver):
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.ensureSchema() == [("message_timestamp", "POPULATING", 40.0)]
+    assert not any("awaitIndexes" in query for query in fakeDriver.queries())
+    api.ensureSchema(wait=True, timeout=5)
+    assert ("CALL db.awaitIndexes($timeout)", {"timeout": 5}) in fakeDriver.statements
+
+
+def testSchemaErrorsAreReported(fakeDriver, capsys):
+    def refuse(query, parameters):
+        raise RuntimeError("not allowed")
+
+    fakeDriver.respond = refuse
+    assert SocialNetworkAPI("bolt://test", "user", "password").ensureSchema() is None
+    assert "Error ensuring database schema: not allowed" in capsys.readouterr().out
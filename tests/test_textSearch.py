@@ -0,0 +1,53 @@
+import pytest
+
+from inMemoryGraph import InMemorySocialNetworkAPI
+from socialNetworkLegacy import SocialNetworkAPI
+from textSearch import escapeQuery
+
+
+def testUserTextIsSearchedAsPlainTerms():
+    assert escapeQuery("C++ (beta) AND title:x") == r"c\+\+ \(beta\) and title\:x"
+    with pytest.raises(ValueError, match="no terms"):
+        escapeQuery("   ")
+
+
+def testPagesFollowTheScoreCursorWithoutGapsOrRepeats():
+    api = InMemorySocialNetworkAPI()
+    api.createUsers({"a": "A", "b": "B", "c": "C"})
+    for senderId, content in (("a", "lunch lunch today"), ("b", "lunch?"), ("a", "lunch plan"), ("c", "nothing"),
+                              ("b", "LUNCH")):
+        api.createMessage(senderId, "c", content, "2024-01-01T00:00:00")
+    seen, after = [], None
+    while True:
+        page, after = api.searchMessages(None, "lunch", limit=2, after=after, projection="tuple")
+        seen.extend((message[3], score) for message, score in page)
+        if after is None:
+            break
+    assert seen[0] == ("lunch lunch today", 2.0)
+    assert sorted(content for content, _ in seen[1:]) == ["LUNCH", "lunch plan", "lunch?"]
+    assert sorted(message[3] for message, _ in api.searchMessages("b", "lunch", projection="tuple")[0]) == [
+        "LUNCH", "lunch?"]
+    assert len(api.searchMessages("c", "lunch", projection="tuple")[0]) == 4
+
+
+def testTheCypherSearchEscapesAndCarriesTheCursor(fakeDriver):
+    fakeDriver.respond = lambda query, parameters: [
+        {"messageId": f"m{index}", "senderId": "a", "receiverId": "b", "content": "x", "timestamp": None,
+         "score": 1.5, "key": f"m{index}"} for index in range(parameters["limit"])]
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    page, after = api.searchMessages("a", "C++ OR x", limit=2, projection="tuple")
+    assert after == (1.5, "m1") and len(page) == 2
+    api.searchMessages("a", "C++ OR x", limit=2, after=after)
+    parameters = fakeDriver.statements[-1][1]
+    assert (parameters["index"], parameters["query"]) == ("message_content", r"c\+\+ or x")
+    assert (parameters["afterScore"], parameters["afterKey"]) == (1.5, "m1")
+
+
+def testASearchFailureReturnsAnEmptyPage(fakeDriver, capsys):
+    def respond(query, parameters):
+        raise RuntimeError("no such index")
+
+    fakeDriver.respond = respond
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.searchPosts("news") == ([], None)
+    assert "Error searching posts: no such index" in capsys.readouterr().out
@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from inMemoryGraph import InMemorySocialNetworkAPI
+from socialNetworkLegacy import SocialNetworkAPI
+from timestamps import checkBucket, toDateTime, truncate
+
+
+def testMigrationMovesUnparseableTimestampsAside(fakeDriver):
+    # Two string timestamps on Message nodes, the unparseable one first in every scan.
+    store = {"bad": {"timestamp": "yesterday"}, "good": {"timestamp": "2024-01-01T12:00:00+02:00"}}
+
+    def respond(query, parameters):
+        if "(n:Message) WHERE n.timestamp IS :: STRING" in query:
+            keys = [key for key, node in store.items() if isinstance(node.get("timestamp"), str)]
+            return [{"key": key, "timestamp": store[key]["timestamp"]} for key in keys[:parameters["batchSize"]]]
+        if "(n:Message) WHERE elementId(n) = row.key" in query:
+            for row in parameters["rows"]:
+                store[row["key"]]["timestamp"] = row["timestamp"]
+        if "(n:Message) WHERE elementId(n) = key" in query:
+            for key in parameters["keys"]:
+                store[key]["timestampRaw"] = store[key].pop("timestamp")
+        if "AS updated" in query:
+            return [{"updated": 0}]
+        return []
+
+    fakeDriver.respond = respond
+    migrated = SocialNetworkAPI("bolt://test", "user", "password").migrateTimestamps(batchSize=1)
+    assert migrated["Message"] == 2
+    assert store == {"bad": {"timestampRaw": "yesterday"},
+                     "good": {"timestamp": datetime(2024, 1, 1, 10, tzinfo=timezone.utc)}}
+
+
+def testTimestampsAreNormalisedToUtc():
+    assert toDateTime("2024-01-01T12:00:00+02:00") == datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+    assert toDateTime("2024-01-01T12:00:00").tzinfo is timezone.utc
+    assert truncate("2024-01-01T12:34:56", "hour") == datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+    with pytest.raises(ValueError, match="Unknown activity bucket"):
+        checkBucket("week")
+
+
+def testWindowsAreHalfOpenAndScopedToTheParticipant():
+    api = InMemorySocialNetworkAPI()
+    api.createUsers({"a": "A", "b": "B", "c": "C"})
+    for senderId, receiverId, timestamp in (("a", "b", "2024-01-01T09:00:00"), ("b", "a", "2024-01-01T10:00:00"),
+                                            ("b", "c", "2024-01-01T10:30:00"), ("c", "a", "2024-01-02T00:00:00")):
+        api.createMessage(senderId, receiverId, timestamp, timestamp)
+    window = ("2024-01-01T09:00:00", "2024-01-02T00:00:00")
+    assert [message.content for message in api.getMessagesBetween(*window)] == [
+        "2024-01-01T09:00:00", "2024-01-01T10:00:00", "2024-01-01T10:30:00"]
+    assert [message.content for message in api.getMessagesBetween(*window, userId="a")] == [
+        "2024-01-01T09:00:00", "2024-01-01T10:00:00"]
+    assert api.getActivityCounts("a", "2024-01-01T00:00:00", "2024-01-03T00:00:00") == [
+        (datetime(2024, 1, 1, tzinfo=timezone.utc), 1, 1), (datetime(2024, 1, 2, tzinfo=timezone.utc), 0, 1)]
+
+
+def testTheCypherWindowBindsDatetimesAndUsesThePerUserIndexes(fakeDriver):
+    api = SocialNetworkAPI("bolt://test", "user", "password")
+    api.getMessagesBetween("2024-01-01T02:00:00+02:00", "2024-01-02T00:00:00", userId="a")
+    query, parameters = fakeDriver.statements[-1]
+    assert parameters == {"start": datetime(2024, 1, 1, tzinfo=timezone.utc),
+                          "end": datetime(2024, 1, 2, tzinfo=timezone.utc), "userId": "a"}
+    assert "message.senderId = $userId" in query and "message.receiverId = $userId" in query
+    assert "message.timestamp >= $start AND message.timestamp < $end" in query
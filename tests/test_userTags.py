@@ -0,0 +1,80 @@
+import importlib.util
+import os
+
+import pytest
+
+PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "optimizes", "userbyTags .py")
+spec = importlib.util.spec_from_file_location("userbyTags", PATH)
+userbyTags = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(userbyTags)
+
+COUNTS = {"python": 40, "neo4j": 3, "rust": 12}
+
+
+def respond(query, parameters):
+    if "RETURN t.name AS name" in query:
+        return [{"name": name, "userCount": count} for name, count in COUNTS.items() if name in parameters["tags"]]
+    return [{"u": "user"}]
+
+
+def testAllTagsStartFromTheRarestAndCarryAnyAndNone(fakeDriver):
+    fakeDriver.respond = respond
+    api = userbyTags.SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.getUsersByTags(all=["python", " neo4j ", "rust"], any=["go"], none=["spam", "spam"]) == ["user"]
+    query, parameters = fakeDriver.statements[-1]
+    assert "MATCH (:Tag {name: $seed})" in query
+    assert parameters == {"seed": "neo4j", "rest": ["rust", "python"], "any": ["go"], "none": ["spam"]}
+
+
+def testAnUnusedRequiredTagShortCircuits(fakeDriver):
+    fakeDriver.respond = respond
+    api = userbyTags.SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.getUsersByTags(all=["python", "cobol"]) == []
+    assert len(fakeDriver.statements) == 1
+
+
+def testAnyTagsAloneMatchEveryTaggedUserOnce(fakeDriver):
+    fakeDriver.respond = respond
+    api = userbyTags.SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.getUsersByTags(any=["python", "rust"], none=["neo4j"]) == ["user"]
+    query, parameters = fakeDriver.statements[-1]
+    assert "WITH DISTINCT u" in query and parameters == {"any": ["python", "rust"], "none": ["neo4j"]}
+    assert api.getUsersByTag("rust") == ["user"]
+    assert fakeDriver.statements[-1][1]["seed"] == "rust"
+
+
+def testTagsAreValidatedBeforeAnyQuery(fakeDriver):
+    api = userbyTags.SocialNetworkAPI("bolt://test", "user", "password")
+    with pytest.raises(ValueError, match="at least one"):
+        api.getUsersByTags(none=["spam"])
+    with pytest.raises(ValueError, match="Invalid tag"):
+        api.addTagsToUser("a", ["ok", " "])
+    with pytest.raises(ValueError, match="Invalid tag"):
+        api.getUsersByTags(all=[3])
+    assert fakeDriver.statements == []
+
+
+def testTagValuesAreParametersNotQueryText(fakeDriver):
+    api = userbyTags.SocialNetworkAPI("bolt://test", "user", "password")
+    api.addTagsToUser("a", ["x`) DETACH DELETE (n"])
+    query, parameters = fakeDriver.statements[-1]
+    assert "DETACH" not in query and parameters["tags"] == ["x`) DETACH DELETE (n"]
+
+
+def testBulkTaggingCountsCreatedEdgesPerBatch(fakeDriver):
+    fakeDriver.respond = lambda query, parameters: ([], {"relationships_created": len(parameters["rows"])})
+    api = userbyTags.SocialNetworkAPI("bolt://test", "user", "password")
+    assert api.bulkTagUsers({"a": ["x"], "b": ["y"], "c": ["z"]}, batchSize=2) == 3
+    assert [len(parameters["rows"]) for _, parameters in fakeDriver.statements] == [2, 1]
+
+
+def testMigrateLabelTagsSplicesOnlyPlainNonReservedLabels(fakeDriver):
+    api = userbyTags.SocialNetworkAPI("bolt://test", "user", "password")
+    api.migrateLabelTags(["Python", "Rust"])
+    assert [parameters["tag"] for _, parameters in fakeDriver.statements] == ["Python", "Rust"]
+    assert "MATCH (u:User:`Python`)" in fakeDriver.statements[0][0]
+    assert "REMOVE u:`Python`" in fakeDriver.statements[0][0]
+    for tag in ("Company", "bad-label", "x` DETACH DELETE u //"):
+        with pytest.raises(ValueError, match="Not a migratable tag label"):
+            api.migrateLabelTags([tag])
+    assert len(fakeDriver.statements) == 2
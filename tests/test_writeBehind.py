@@ -0,0 +1,89 @@
+import pytest
+
+from socialNetworkLegacy import SocialNetworkAPI
+
+USERS = {"a", "b", "c"}
+
+
+def respond(query, parameters):
+    # Rows whose users all exist are matched, as the MATCH in the batch writes would.
+    rows = parameters["rows"]
+    matched = [index for index, row in enumerate(rows)
+               if {row.get("userId1", row.get("senderId")), row.get("userId2", row.get("receiverId"))} <= USERS]
+    return [{"matched": matched}], {"relationships_created": len(matched)}
+
+
+@pytest.fixture
+def api(fakeDriver):
+    fakeDriver.respond = respond
+    return SocialNetworkAPI("bolt://test", "user", "password")
+
+
+def testFuturesResolvePerRow(api):
+    with api.writeBehind(flushInterval=60) as writer:
+        message = writer.createMessage("a", "b", "hi", "2024-01-01T00:00:00")
+        lost = writer.createMessage("a", "missing", "hi", "2024-01-01T00:00:00")
+        connection = writer.createConnection("a", "c", "friend")
+        writer.flush()
+        assert message.result(1) is not None
+        assert lost.result(1) is None
+        assert connection.result(1) is True
+
+
+def testDuplicateConnectionsAreWrittenOnce(api, fakeDriver):
+    with api.writeBehind(flushSize=3, flushInterval=60) as writer:
+        futures = [writer.createConnection("a", "b", "friend") for _ in range(3)]
+        assert [future.result(1) for future in futures] == [True, True, True]
+    assert [len(parameters["rows"]) for _, parameters in fakeDriver.statements] == [1]
+    assert (writer.flushes, writer.coalesced) == (1, 2)
+
+
+def testFailedInvalidationFailsNoFuture(api, monkeypatch, capsys):
+    def failInvalidation(rows):
+        raise RuntimeError("invalidation failed")
+
+    monkeypatch.setattr(api, "_invalidateConnections", failInvalidation)
+    with api.writeBehind(flushInterval=60) as writer:
+        connection = writer.createConnection("a", "b", "friend")
+        message = writer.createMessage("a", "b", "hi", "2024-01-01T00:00:00")
+        writer.flush(1)
+        assert connection.result(1) is True
+        assert message.result(1) is not None
+    assert "invalidation failed" in capsys.readouterr().out
+
+
+def testMessagesAreWrittenWhenTheConnectionsFail(api, monkeypatch):
+    def failConnections(entries):
+        raise RuntimeError("connections failed")
+
+    with api.writeBehind(flushInterval=60) as writer:
+        monkeypatch.setattr(writer, "_writeConnections", failConnections)
+        connection = writer.createConnection("a", "b", "friend")
+        message = writer.createMessage("a", "b", "hi", "2024-01-01T00:00:00")
+        writer.flush(1)
+        assert message.result(1) is not None
+        with pytest.raises(RuntimeError, match="connections failed"):
+            connection.result(1)
+
+
+def testWriterSurvivesAFailedFlush(api, monkeypatch):
+    def failFlush(pending):
+        raise RuntimeError("flush failed")
+
+    with api.writeBehind(flushInterval=60) as writer:
+        monkeypatch.setattr(writer, "_flush", failFlush)
+        failed = writer.createConnection("a", "b", "friend")
+        writer.flush()
+        with pytest.raises(RuntimeError, match="flush failed"):
+            failed.result(1)
+        monkeypatch.undo()
+        later = writer.createMessage("a", "b", "hi", "2024-01-01T00:00:00")
+        writer.flush(1)
+        assert later.result(1) is not None
+
+
+def testClosedWriterRefusesWrites(api):
+    writer = api.writeBehind()
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.createMessage("a", "b", "hi", "2024-01-01T00:00:00")
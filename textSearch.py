@@ -0,0 +1,37 @@
+"""
+Full-text search over message and post text. Searches are answered by the message_content and post_text
+full-text (Lucene) indexes instead of scanning content properties. The caller's text is searched as
+plain terms: lower-casing turns AND / OR / NOT into ordinary words and every Lucene special character
+is escaped, so input like "C++ (beta)" can neither break nor widen the query. Hits come best first as
+(item, score) pairs. Pages are cut with a (score, key) cursor, where the key breaks ties between equal
+scores, so no hit is dropped or repeated at a page boundary while the index is unchanged.
+"""
+
+import re
+
+MESSAGE_INDEX = "message_content"
+POST_INDEX = "post_text"
+DEFAULT_SEARCH_LIMIT = 20
+
+_SPECIAL = re.compile(r'([+\-&|!(){}\[\]^"~*?:\\/])')
+_WORD = re.compile(r"\w+")
+
+
+def escapeQuery(text):
+    terms = _SPECIAL.sub(r"\\\1", str(text).lower()).split()
+    if not terms:
+        raise ValueError("Search text has no terms")
+    return " ".join(terms)
+
+
+def searchTerms(text):
+    # Word tokens as a simple analyzer sees them; the in-memory backend scores with these.
+    return _WORD.findall(str(text).lower())
+
+
+def splitCursor(after):
+    # A cursor is the (score, key) pair returned with the previous page, or None for the first page.
+    if after is None:
+        return None, None
+    score, key = after
+    return score, key
@@ -0,0 +1,36 @@
+"""
+Message and post timestamps are stored as native DATETIME values. Callers may pass ISO strings,
+datetimes or driver temporals; they are converted here, client-side, to UTC (naive values are read as
+UTC), so every stored timestamp is on one timeline and range predicates can use the timestamp indexes.
+"""
+
+from datetime import datetime, timezone
+
+ACTIVITY_BUCKETS = ("day", "hour")
+
+
+def toDateTime(timestamp):
+    if isinstance(timestamp, datetime):
+        value = timestamp
+    elif hasattr(timestamp, "to_native"):
+        value = timestamp.to_native()
+    else:
+        value = datetime.fromisoformat(str(timestamp))
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def checkBucket(bucket):
+    if bucket not in ACTIVITY_BUCKETS:
+        raise ValueError(f"Unknown activity bucket {bucket!r}, expected one of {ACTIVITY_BUCKETS}")
+    return bucket
+
+
+def truncate(value, bucket):
+    # Python twin of Cypher's datetime.truncate(bucket, value) for the UTC-normalised values stored here.
+    value = toDateTime(value)
+    if bucket == "day":
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(minute=0, second=0, microsecond=0)
+
@@ -0,0 +1,45 @@
+"""
+Transaction bodies written once for the sync and the async driver. A body is a generator that yields
+(query, parameters) statements and is sent back (records, counters) for each one, the way the frontier
+searches yield frontiers; only the two small drivers below touch the driver API.
+"""
+
+from functools import wraps
+
+
+def transaction(steps):
+    # Turns a body into a sync tx function, tx first as the driver calls it. The async twin is .runAsync and the
+    # bare body is .steps, so one body can run another with yield from.
+    @wraps(steps)
+    def run(tx, *args, **kwargs):
+        return runSteps(tx, steps(*args, **kwargs))
+
+    @wraps(steps)
+    async def runAsync(tx, *args, **kwargs):
+        return await runStepsAsync(tx, steps(*args, **kwargs))
+
+    run.runAsync = runAsync
+    run.steps = steps
+    return run
+
+
+def runSteps(tx, steps):
+    try:
+        statement = next(steps)
+        while True:
+            result = tx.run(*statement)
+            records = list(result)
+            statement = steps.send((records, result.consume().counters))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def runStepsAsync(tx, steps):
+    try:
+        statement = next(steps)
+        while True:
+            result = await tx.run(*statement)
+            records = [record async for record in result]
+            statement = steps.send((records, (await result.consume()).counters))
+    except StopIteration as stop:
+        return stop.value
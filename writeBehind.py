@@ -0,0 +1,183 @@
+"""
+Write-behind buffer for SocialNetworkAPI. createMessage and createConnection calls are queued and a
+background thread writes them as UNWIND batches once flushSize writes are pending or flushInterval
+seconds have passed since the oldest one. A full queue blocks the caller (backpressure), every call
+returns a Future, duplicate connections within one flush are merged once, and close() drains the queue.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from messageIds import newMessageId
+from metrics import measure
+from timestamps import toDateTime
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_FLUSH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 0.05
+
+_MESSAGE = "message"
+_CONNECTION = "connection"
+_FLUSH = "flush"
+_STOP = "stop"
+
+
+class WriteBehindWriter:
+    def __init__(self, api, maxQueueSize=DEFAULT_QUEUE_SIZE, flushSize=DEFAULT_FLUSH_SIZE,
+                 flushInterval=DEFAULT_FLUSH_INTERVAL, putTimeout=None):
+        self.api = api
+        self.flushSize = flushSize
+        self.flushInterval = flushInterval
+        self.putTimeout = putTimeout
+        self.flushes = 0
+        self.coalesced = 0
+        self._queue = queue.Queue(maxQueueSize)
+        self._closed = False
+        self._closeLock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="WriteBehindWriter", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, traceback):
+        self.close()
+        return False
+
+    def createMessage(self, senderId, receiverId, content, timestamp):
+        # The Future resolves to the messageId, or None when either user does not exist.
+        timestamp = toDateTime(timestamp)
+        messageId = newMessageId(timestamp)
+        row = {"senderId": senderId, "receiverId": receiverId, "content": content, "timestamp": timestamp,
+               "messageId": messageId}
+        return self._put(_MESSAGE, row)
+
+    def createConnection(self, userId1, userId2, connectionType):
+        # The Future resolves to True once merged, or None when either user does not exist. Types the relationship
+        # model cannot store raise here rather than failing the whole flush they would land in.
+        self.api.relationships.checkTypes([connectionType])
+        return self._put(_CONNECTION, {"userId1": userId1, "userId2": userId2, "connectionType": connectionType})
+
+    def flush(self, timeout=None):
+        # Blocks until every write queued before this call has been written.
+        self._put(_FLUSH, None).result(timeout)
+
+    def close(self, timeout=None):
+        with self._closeLock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put((_STOP, None, None))
+        self._thread.join(timeout)
+        # Writes that raced with close() and landed behind the stop marker are failed, not dropped silently.
+        while True:
+            try:
+                _, _, future = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if future is not None:
+                future.set_exception(RuntimeError("WriteBehindWriter is closed"))
+
+    def _put(self, kind, row):
+        if self._closed:
+            raise RuntimeError("WriteBehindWriter is closed")
+        future = Future()
+        # Blocks while the queue is full; raises queue.Full if putTimeout expires first.
+        self._queue.put((kind, row, future), timeout=self.putTimeout)
+        return future
+
+    def _run(self):
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is not None and item[0] in (_MESSAGE, _CONNECTION):
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flushInterval
+                if len(pending) < self.flushSize:
+                    continue
+            if pending:
+                try:
+                    self._flush(pending)
+                except Exception as e:
+                    # Keeps the thread alive: a dead writer would leave every later Future, and close(), hanging.
+                    self.api._reportError("Error flushing buffered writes", e)
+                    for _, _, future in pending:
+                        if not future.done():
+                            future.set_exception(e)
+                pending, deadline = [], None
+            if item is not None and item[0] == _FLUSH:
+                item[2].set_result(True)
+            elif item is not None and item[0] == _STOP:
+                return
+
+    def _flush(self, pending):
+        self.flushes += 1
+        connections = {}
+        messages = []
+        for kind, row, future in pending:
+            if kind == _MESSAGE:
+                messages.append((row, future))
+            else:
+                key = (row["userId1"], row["userId2"], row["connectionType"])
+                if key in connections:
+                    self.coalesced += 1
+                connections.setdefault(key, (row, []))[1].append(future)
+        if self.api.metrics is None:
+            self._writeAll(list(connections.values()), messages)
+            return
+        with measure(self.api.metrics, "writeBehindFlush"):
+            self._writeAll(list(connections.values()), messages)
+
+    def _writeAll(self, connections, messages):
+        # The messages are written whatever happens to the connections.
+        try:
+            self._writeConnections(connections)
+        finally:
+            self._writeMessages(messages)
+
+    def _writeConnections(self, entries):
+        if not entries:
+            return
+        rows = [row for row, _ in entries]
+        try:
+            with self.api._session() as session:
+                matched, _ = session.execute_write(self.api._writeConnectionsBatch, rows,
+                                                   relationships=self.api.relationships)
+        except Exception as e:
+            self.api._reportError("Error writing buffered connections", e)
+            for _, futures in entries:
+                for future in futures:
+                    future.set_exception(e)
+            return
+        matched = set(matched)
+        for index, (_, futures) in enumerate(entries):
+            for future in futures:
+                future.set_result(True if index in matched else None)
+        # The rows are committed whether or not the cache can be told, so a failure here fails no Future.
+        try:
+            self.api._invalidateConnections(rows)
+        except Exception as e:
+            self.api._reportError("Error invalidating cached neighbourhoods after buffered connections", e)
+
+    def _writeMessages(self, entries):
+        if not entries:
+            return
+        rows = [row for row, _ in entries]
+        try:
+            with self.api._session() as session:
+                matched = set(session.execute_write(self.api._writeMessagesBatch, rows))
+        except Exception as e:
+            self.api._reportError("Error writing buffered messages", e)
+            for _, future in entries:
+                future.set_exception(e)
+            return
+        for index, (row, future) in enumerate(entries):
+            future.set_result(row["messageId"] if index in matched else None)